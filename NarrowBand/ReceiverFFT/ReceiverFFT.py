@@ -31,22 +31,30 @@
 		The purpose of this module is to provide FFT of collected data with PScope compatible window formats
 		and also provide a plot function that allows the use of other types of FFT windowing.
 		In addition to adding new FFT based functions, it replaces the functions.plot function.
+		The FFT is computed by the cached engines of the fft_engine module (window, gains and buffers computed once
+		per capture size), with the values of the former computation bit for bit.
 """
 import sys
 import os
 # checks proper folder for Linear Lab Tools and adds to path
-lltpath = '{}/Documents/Analog Devices/linear_lab_tools64/python/'.format(os.environ['USERPROFILE'])
+lltpath = '{}/Documents/Analog Devices/linear_lab_tools64/python/'.format(os.environ.get('USERPROFILE', os.path.expanduser('~')))
 if not os.path.exists(os.path.dirname(lltpath)):
-    lltpath = '{}/Documents/linear_technology/linear_lab_tools64/python/'.format(os.environ['USERPROFILE'])
+    lltpath = '{}/Documents/linear_technology/linear_lab_tools64/python/'.format(os.environ.get('USERPROFILE', os.path.expanduser('~')))
 sys.path.insert(1,lltpath)
 
 #import llt.common.exceptions as err
 #import llt.common.ltc_controller_comm as comm
 import math as m
 import time
-import llt.utils.sin_params as sp
+try:
+    import llt.utils.sin_params as sp
+except ImportError: # Linear Lab Tools not installed, plot() shows spectra without the sine parameters
+    sp = None
 import numpy as np
-import fft_window
+from fft_window import fft_window
+from fft_engine import get_engine
+
+ROWS_PER_WRITE = 16384 # rows of a PScope file formatted and written at once
 
 def make_vprint(verbose):
 	if verbose:
@@ -60,21 +68,10 @@ def make_vprint(verbose):
 def ReceiverFFT(num_bits, data, channel = 0, wind = 'hann'):
     """Calculate FFT magnitude in dBFS for data collected from a specified channel, using a selected FFT window type.
 
-	Uses the Linear Technology functions.plot.py way of calculating the FFT.
+	Uses the Linear Technology functions.plot.py way of calculating the FFT, with the cached window and buffers of
+	fft_engine.get_engine.
 	"""
-    num_samples = len(data)
-    adc_amplitude = 2.0**(num_bits-1)
-    data_no_dc = data - np.average(data) # Remove DC to avoid leakage when windowing
-
-
-    windowed_data = data_no_dc * fft_window(num_samples, wind)# Apply window (Hann is default)
-    freq_domain = np.fft.fft(windowed_data)/(num_samples) # FFT
-    freq_domain = freq_domain[0:num_samples/2+1]
-    freq_domain_magnitude = np.abs(freq_domain) # Extract magnitude
-    freq_domain_magnitude[1:num_samples/2] *= 2
-    freq_domain_magnitude_db = 20 * np.log10(freq_domain_magnitude/adc_amplitude)
-
-    return freq_domain_magnitude_db
+    return get_engine(len(data), wind, num_bits).spectrum(data)
 
 
 
@@ -102,16 +99,7 @@ def plot(num_bits, data, channel = 0, wind = 'hann', verbose = False):
 
 	vprint("FFT'ing channel " + str(channel) + " data.")
 
-	adc_amplitude = 2.0**(num_bits-1)
-
-	data_no_dc = data - np.average(data) # Remove DC to avoid leakage when windowing
-
-	windowed_data = data_no_dc * fft_window(num_samples, wind)# Apply window (Hann is default)
-	freq_domain = np.fft.fft(windowed_data)/(num_samples) # FFT
-	freq_domain = freq_domain[0:num_samples/2+1]
-	freq_domain_magnitude = np.abs(freq_domain) # Extract magnitude
-	freq_domain_magnitude[1:num_samples/2] *= 2
-	freq_domain_magnitude_db = 20 * np.log10(freq_domain_magnitude/adc_amplitude)
+	freq_domain_magnitude_db = ReceiverFFT(num_bits, data, channel, wind)
 
 	vprint("Plotting channel " + str(channel) + " frequency domain.")
 
@@ -197,13 +185,8 @@ def plot_channels(num_bits = 14, window = 'hann', *channels, **verbose_kw):
 		plot(num_bits, channel_data, channel_num, window, verbose)
 
 def fft_channels(num_bits,num_samples, window = 'hann', *channels, **verbose_kw): #not clear what this function does, need to add return statement
-    verbose = verbose_kw.get("verbose", False)
-    tmp1 = int(num_samples*0.5 +1)
-    tmp2 = int(len(channels))
-    out = np.zeros((tmp2,tmp1))
-    for channel_num, channel_data in enumerate(channels):
-        out[channel_num,:]= ReceiverFFT(num_bits, channel_data, channel_num, window)
-    return out
+    """Return the FFT magnitude in dBFS of each channel, [channels, num_samples/2 + 1] (see ReceiverFFT)."""
+    return get_engine(num_samples, window, num_bits).channels(channels)
 
 def save_for_pscope(out_path = 'data.adc', num_bits = 14, is_bipolar = True, num_samples = 1*1024, dc_num = 'DC_1513B-AA',
 						 ltc_num = 'LTM9004', *data):
@@ -245,11 +228,7 @@ def save_for_pscope(out_path = 'data.adc', num_bits = 14, is_bipolar = True, num
 			out_file.write(
 				'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
 					i+1, num_samples, num_bits, min_val, max_val, sample_rate ))
-		for samp in xrange(num_samples):
-			out_file.write(str(data[0][samp]))
-			for ch in range(1, num_channels):
-				out_file.write(', ,' + str(data[ch][samp]))
-			out_file.write('\n')
+		_write_rows(out_file, num_samples, *data)
 		out_file.write('End\n')
 
 def save_for_pscope_fft(out_path = 'data.fft', num_bits = 14, is_bipolar = True, num_samples = 1*1024, dc_num = 'DC_1513B-AA',
@@ -288,6 +267,22 @@ def save_for_pscope_fft(out_path = 'data.fft', num_bits = 14, is_bipolar = True,
 
 	fft_data = fft_channels(num_bits, num_samples, window, *data)
 
+	save_fft_for_pscope(out_path, num_samples, *fft_data)
+
+def save_fft_for_pscope(out_path = 'data.fft', num_samples = 1*1024, *fft_data):
+	"""Save FFT magnitude data already converted to dBFS in PScope .fft format (csv type file).
+
+	Used by save_for_pscope_fft and by callers that computed the FFT elsewhere (e.g. the dsp_offload module).
+
+	Keyword arguments (all optional except for fft_data)::
+		out-path -- file path in string format
+		num_samples -- integer number of time domain samples used for the FFT (each channel has num_samples/2 + 1 values)
+		*fft_data -- array with FFT magnitude in dBFS, each column representing a channel
+	"""
+	num_channels = len(fft_data)
+	if num_channels < 0 or num_channels > 16:
+		raise ValueError("pass in a list for each channel (between 1 and 16)")
+
 	sample_rate = 125.0
 	with open(out_path, 'w') as out_file:
 		out_file.write('Version,115\n')
@@ -298,13 +293,30 @@ def save_for_pscope_fft(out_path = 'data.fft', num_bits = 14, is_bipolar = True,
 			out_file.write(
 				'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
 					i+1, num_samples, num_bits, min_val, max_val, sample_rate ))"""
-		for samp in xrange(num_samples/2+1):
-			out_file.write(str(fft_data[0][samp]))
-			for ch in range(1, num_channels):
-				out_file.write(', ,' + str(fft_data[ch][samp]))
-			out_file.write('\n')
+		_write_rows(out_file, num_samples/2+1, *fft_data)
 		out_file.write('End\n')
 
+def _write_rows(out_file, num_rows, *channels):
+	"""Write num_rows rows of the PScope body, the str() of each value of the channels separated by ', ,'.
+
+	The rows are formatted and written ROWS_PER_WRITE at a time, instead of one write per value.
+	"""
+	if num_rows > 0 and (not channels or min(len(channel) for channel in channels) < num_rows):
+		raise IndexError("each channel needs {0:d} values".format(num_rows))
+	for start in xrange(0, num_rows, ROWS_PER_WRITE):
+		stop = min(start + ROWS_PER_WRITE, num_rows)
+		columns = [_column_strings(channel[start:stop]) for channel in channels]
+		out_file.write('\n'.join(map(', ,'.join, zip(*columns))) + '\n')
+
+def _column_strings(values):
+	"""Return the str() of each value, converted at once for integer and float64 arrays."""
+	if isinstance(values, np.ndarray) and values.ndim == 1:
+		if values.dtype.kind in 'iub':
+			return map(str, values.tolist())
+		if values.dtype == np.float64:
+			return map(repr, values.tolist()) # str of a numpy float64 is the repr of the Python float
+	return [str(value) for value in values]
+
 if __name__ == '__main__':
 
 	num_bits = 14
@@ -313,6 +325,38 @@ if __name__ == '__main__':
 	channel_2 = [int(8192 * m.cos(0.034 * d)) for d in range(num_samples)]
 	save_for_pscope('test.adc', num_bits, True, num_samples, 'DC9876A-A', 'LTC9999',channel_1, channel_2)
 	save_for_pscope_fft('test.fft', num_bits, True, num_samples, 'DC9876A-A', 'LTC9999','hann',channel_1, channel_2)
+
+	# Old (one write per value) and vectorised PScope writers, at each supported num_samples.
+
+	import tempfile
+	from timeit import default_timer as timer
+
+	def write_rows_per_value(out_file, num_rows, *channels):
+		for samp in xrange(num_rows):
+			out_file.write(str(channels[0][samp]))
+			for ch in range(1, len(channels)):
+				out_file.write(', ,' + str(channels[ch][samp]))
+			out_file.write('\n')
+
+	folder = tempfile.mkdtemp()
+	print("{0:>7} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format("samples", "adc old", "adc new", "fft old", "fft new", "identical"))
+	for size in [1024 * 2**k for k in range(7)]:
+		adc = (8000 * np.sin(0.05 * np.arange(size)) + np.random.normal(0, 20, (2, size))).astype(np.int16)
+		fft = fft_channels(num_bits, size, 'hann', *adc)
+		durations = []
+		files = []
+		for data, num_rows in ((adc, size), (fft, size/2+1)):
+			for rows_writer in (write_rows_per_value, _write_rows):
+				path = os.path.join(folder, "{0} {1}.txt".format(rows_writer.__name__, num_rows))
+				start = timer()
+				with open(path, 'w') as out_file:
+					rows_writer(out_file, num_rows, *data)
+				durations.append(timer() - start)
+				files.append(open(path).read())
+				os.remove(path)
+		print("{0:>7d} {1:>8.1f} ms {2:>8.1f} ms {3:>8.1f} ms {4:>8.1f} ms {5:>10}".format(size,
+				*([1e3 * duration for duration in durations] + [str(files[0] == files[1] and files[2] == files[3])])))
+	os.rmdir(folder)
 	#out = fft_channels(num_bits,num_samples,'hann', channel_1,channel_2)
 	#print("Channel 0:")
 	#print(out[0,:])
@@ -0,0 +1,314 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module computing the FFT magnitude in dBFS of receiver captures, as ReceiverFFT.ReceiverFFT, with the window,
+        its gains and the work buffers cached per (num_samples, window, num_bits, dtype) instead of recomputed on every
+        capture.
+
+        An FFTEngine:
+            - keeps the fft_window of its size and type (shared by every engine, read-only), with its coherent gain
+              (mean) and noise gain (mean square, the equivalent noise bandwidth being noise_gain / coherent_gain**2);
+            - removes the DC level and applies the window in a preallocated buffer, and converts to dBFS in place;
+            - uses the complex FFT of ReceiverFFT by default, which reproduces the values of the former ReceiverFFT
+              computation (and of the .fft files) bit for bit, or with real = True a real-input FFT (np.fft.rfft, half
+              the work, for analysis not requiring byte-compatible files: it differs in the last digits, below 1e-9 dB);
+            - computes in float32 with dtype = np.float32, with scipy.fftpack single precision FFT when scipy is
+              installed (numpy FFTs compute in float64).
+        The buffers of an engine are reused from call to call, so get_engine returns one engine per thread (e.g. the
+        writer threads of capture_writer.CaptureWriter).
+
+        For offline analysis, cube_spectra computes the spectra of a whole stack of captures, e.g. [captures, channels,
+        samples], with one vectorised call per operation (DC removal, window, FFT, dBFS conversion) on chunks of
+        captures bounding the work memory, optionally on a thread pool (the numpy FFT releases the GIL). Its values are
+        those of FFTEngine.spectrum (and of the .fft files) bit for bit.
+
+        Main usage:
+
+        $ engine = get_engine(num_samples = 16384, window = 'hann', num_bits = 14)
+        $ ch0_db = engine.spectrum(ch0)                         # new array, as ReceiverFFT.ReceiverFFT(14, ch0)
+        $ engine.spectrum(ch1, out = spectra[1])                # written to a preallocated array
+        $ spectra = engine.channels([ch0, ch1])                 # [channels, num_samples/2 + 1], as ReceiverFFT.fft_channels
+        $ spectra = cube_spectra(cube, num_bits = 14, num_threads = 4)   # [captures, channels, num_samples/2 + 1]
+
+Class::
+        FFTEngine : cached window, gains and buffers of a capture size, window and ADC resolution.
+
+Functions::
+        get_engine : memoised FFTEngine of the calling thread.
+
+        window_gains : cached window with its coherent and noise gains.
+
+        cube_spectra : spectra of a stack of captures, chunked and optionally threaded.
+"""
+# Standard library imports
+from multiprocessing.pool import ThreadPool
+import threading
+
+# Third-party imports
+import numpy as np
+try:
+    import scipy.fftpack as scipy_fft
+except ImportError: # scipy not installed, float32 engines compute the FFT in float64 with numpy
+    scipy_fft = None
+
+# Local application imports
+from fft_window import fft_window
+
+_windows = {}
+_windows_lock = threading.Lock()
+_engines = threading.local()
+DEFAULT_CHUNK_BYTES = 64 * 2**20 # work memory per chunk of cube_spectra
+
+
+def window_gains(num_samples, window = 'hann', dtype = np.float64):
+    """Return (window, coherent_gain, noise_gain) of fft_window(num_samples, window) in dtype, computed once (read-only
+    window array)."""
+    key = (num_samples, window.lower(), np.dtype(dtype).str)
+    with _windows_lock:
+        if key not in _windows:
+            win = fft_window(num_samples, window)
+            if np.dtype(dtype) == np.float32:
+                win = win.astype(np.float32)
+            win.flags.writeable = False
+            _windows[key] = (win, float(np.mean(win, dtype = np.float64)), float(np.mean(np.square(win, dtype = np.float64))))
+        return _windows[key]
+
+
+class FFTEngine(object):
+    """FFT magnitude in dBFS of captures of num_samples samples, as ReceiverFFT.ReceiverFFT.
+
+    Not thread-safe (shared work buffers): use one engine per thread, see get_engine.
+
+    Parameters
+    ----------
+    num_samples : int
+        number of samples per capture
+    window : str, optional
+        FFT window type (see fft_window module), by default 'hann'
+    num_bits : int, optional
+        ADC resolution setting the full scale, by default 14
+    dtype : numpy dtype, optional
+        np.float64 or np.float32 computations, by default np.float64
+    real : bool, optional
+        set True for the real-input FFT, False for the complex FFT of ReceiverFFT (same values bit for bit),
+        by default False
+
+    Attributes
+    ----------
+    window : numpy.ndarray
+        FFT window (read-only)
+    coherent_gain : float
+        mean of the window
+    noise_gain : float
+        mean square of the window
+    num_bins : int
+        number of spectrum values, num_samples/2 + 1
+    """
+
+    def __init__(self, num_samples, window = 'hann', num_bits = 14, dtype = np.float64, real = False):
+        self.num_samples = num_samples
+        self.num_bits = num_bits
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError("dtype must be numpy.float64 or numpy.float32, got {}.".format(self.dtype))
+        self.real = real
+        self.window, self.coherent_gain, self.noise_gain = window_gains(num_samples, window, self.dtype)
+        self.window_type = window
+        self.num_bins = num_samples//2 + 1
+        self.adc_amplitude = 2.0**(num_bits-1)
+        self._buffers = {}
+
+    @property
+    def enbw(self):
+        """Equivalent noise bandwidth of the window, in bins."""
+        return self.noise_gain / self.coherent_gain**2
+
+    def spectrum(self, data, out = None):
+        """Return the FFT magnitude in dBFS of the capture data (num_samples values), num_samples/2 + 1 values.
+
+        Parameters
+        ----------
+        data : array_like
+            time domain samples
+        out : numpy.ndarray or None, optional
+            array of num_samples/2 + 1 values receiving the result, by default None for a new array
+        """
+        data = np.asarray(data)
+        if data.shape != (self.num_samples,):
+            raise ValueError("Expected {:d} samples, got shape {}.".format(self.num_samples, data.shape))
+        if out is None:
+            out = np.empty(self.num_bins, self.dtype)
+        _spectra_rows(data[np.newaxis], self.window, self.adc_amplitude, self.real, out[np.newaxis], self._buffer(1))
+        return out
+
+    def channels(self, channels, out = None):
+        """Return the FFT magnitude in dBFS of each channel, [channels, num_samples/2 + 1], as ReceiverFFT.fft_channels.
+
+        Parameters
+        ----------
+        channels : sequence of array_like
+            time domain samples of each channel
+        out : numpy.ndarray or None, optional
+            [channels, num_samples/2 + 1] array receiving the result, by default None for a new array
+        """
+        channels = np.asarray(channels)
+        if channels.ndim != 2 or channels.shape[1] != self.num_samples:
+            raise ValueError("Expected channels of {:d} samples, got shape {}.".format(self.num_samples, channels.shape))
+        if out is None:
+            out = np.empty((len(channels), self.num_bins), self.dtype)
+        _spectra_rows(channels, self.window, self.adc_amplitude, self.real, out, self._buffer(len(channels)))
+        return out
+
+    def _buffer(self, rows):
+        """Return the work buffer of rows captures, allocated once."""
+        if rows not in self._buffers:
+            self._buffers[rows] = np.empty((rows, self.num_samples), self.dtype)
+        return self._buffers[rows]
+
+
+def cube_spectra(cube, num_bits = 14, window = 'hann', dtype = np.float64, real = False, out = None,
+                    chunk_bytes = DEFAULT_CHUNK_BYTES, num_threads = 0):
+    """Return the FFT magnitude in dBFS of every capture of cube, as FFTEngine.spectrum of each one (bit for bit).
+
+    Parameters
+    ----------
+    cube : array_like
+        time domain samples, [..., samples], e.g. [captures, channels, samples]
+    num_bits : int, optional
+        ADC resolution setting the full scale, by default 14
+    window : str, optional
+        FFT window type (see fft_window module), by default 'hann'
+    dtype : numpy dtype, optional
+        np.float64 or np.float32 computations, by default np.float64
+    real : bool, optional
+        set True for the real-input FFT, False for the complex FFT, by default False
+    out : numpy.ndarray or None, optional
+        C-contiguous [..., samples/2 + 1] array receiving the result, by default None for a new array
+    chunk_bytes : int, optional
+        work memory of each chunk of captures, by default DEFAULT_CHUNK_BYTES (64 MiB)
+    num_threads : int, optional
+        number of threads computing the chunks, by default 0 (calling thread)
+
+    Returns
+    ----------
+    numpy.ndarray
+        [..., samples/2 + 1] spectra
+    """
+    cube = np.asarray(cube)
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float64, np.float32):
+        raise ValueError("dtype must be numpy.float64 or numpy.float32, got {}.".format(dtype))
+    num_samples = cube.shape[-1]
+    num_bins = num_samples//2 + 1
+    if out is None:
+        out = np.empty(cube.shape[:-1] + (num_bins,), dtype)
+    elif out.shape != cube.shape[:-1] + (num_bins,) or not out.flags.c_contiguous:
+        raise ValueError("out must be a C-contiguous array of shape {}.".format(cube.shape[:-1] + (num_bins,)))
+    rows = cube.reshape(-1, num_samples)
+    out_rows = out.reshape(-1, num_bins)
+    window = window_gains(num_samples, window, dtype)[0]
+    adc_amplitude = 2.0**(num_bits-1)
+
+    chunk = max(1, chunk_bytes // (num_samples * (dtype.itemsize + 16))) # work buffer and complex spectrum
+    chunks = [slice(start, min(start + chunk, len(rows))) for start in range(0, len(rows), chunk)]
+    compute = lambda rows_slice: _spectra_rows(rows[rows_slice], window, adc_amplitude, real, out_rows[rows_slice])
+    if num_threads > 1 and len(chunks) > 1:
+        pool = ThreadPool(num_threads)
+        try:
+            pool.map(compute, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for rows_slice in chunks:
+            compute(rows_slice)
+    return out
+
+def _spectra_rows(rows, window, adc_amplitude, real, out, buffer = None):
+    """Write the FFT magnitude in dBFS of each capture of rows [captures, samples] to out [captures, samples/2 + 1],
+    as ReceiverFFT computed it, using buffer [captures, samples] (of the out dtype) as work memory."""
+    num_samples = rows.shape[1]
+    half = num_samples//2
+    if buffer is None:
+        buffer = np.empty(rows.shape, out.dtype)
+    np.subtract(rows, np.mean(rows, axis = 1)[:, np.newaxis], out = buffer, casting = "unsafe") # Remove DC to avoid leakage when windowing
+    np.multiply(buffer, window, out = buffer) # Apply window
+    if out.dtype == np.float32 and scipy_fft is not None and num_samples % 2 == 0:
+        packed = scipy_fft.rfft(buffer, axis = 1, overwrite_x = True) # single precision, [y0, Re y1, Im y1, ..., Re yN/2]
+        np.absolute(packed[:, 0], out = out[:, 0])
+        np.hypot(packed[:, 1:-1:2], packed[:, 2:-1:2], out = out[:, 1:half])
+        np.absolute(packed[:, -1], out = out[:, half])
+        out /= num_samples
+    else:
+        freq_domain = np.fft.rfft(buffer, axis = 1) if real else np.fft.fft(buffer, axis = 1)[:, 0:half+1]
+        freq_domain /= num_samples
+        np.abs(freq_domain, out = out, casting = "unsafe")
+    out[:, 1:half] *= 2
+    out /= adc_amplitude
+    np.log10(out, out = out)
+    out *= 20
+
+def get_engine(num_samples, window = 'hann', num_bits = 14, dtype = np.float64, real = False):
+    """Return the FFTEngine of the calling thread for (num_samples, window, num_bits, dtype, real), created once."""
+    engines = getattr(_engines, "engines", None)
+    if engines is None:
+        engines = _engines.engines = {}
+    key = (num_samples, window.lower(), num_bits, np.dtype(dtype).str, real)
+    if key not in engines:
+        engines[key] = FFTEngine(num_samples, window, num_bits, dtype, real)
+    return engines[key]
+
+
+if __name__ == '__main__':
+
+    # Throughput per capture size of the ReceiverFFT computation and of the engines (complex, real-input, float32).
+
+    from timeit import default_timer as timer
+
+    def receiver_fft(num_bits, data, wind = 'hann'):
+        """ReceiverFFT.ReceiverFFT as it computed every capture before the engine."""
+        num_samples = len(data)
+        adc_amplitude = 2.0**(num_bits-1)
+        data_no_dc = data - np.average(data)
+        windowed_data = data_no_dc * fft_window(num_samples, wind)
+        freq_domain = np.fft.fft(windowed_data)/(num_samples)
+        freq_domain = freq_domain[0:num_samples/2+1]
+        freq_domain_magnitude = np.abs(freq_domain)
+        freq_domain_magnitude[1:num_samples/2] *= 2
+        return 20 * np.log10(freq_domain_magnitude/adc_amplitude)
+
+    rs = np.random.RandomState(0)
+    print("{0:>7} {1:>14} {2:>14} {3:>14} {4:>14} {5:>10}".format("samples", "ReceiverFFT", "complex", "real", "float32",
+            "max diff"))
+    for size in [512 * 2**k for k in range(8)]:
+        repeats = max(4, 2**21 // size)
+        data = (8000 * np.sin(0.05 * np.arange(size)) + rs.normal(0, 20, size)).astype(int)
+        reference = receiver_fft(14, data)
+        rates = []
+        for compute in (lambda: receiver_fft(14, data),
+                        lambda: get_engine(size).spectrum(data),
+                        lambda: get_engine(size, real = True).spectrum(data),
+                        lambda: get_engine(size, dtype = np.float32, real = True).spectrum(data)):
+            compute()
+            start = timer()
+            for _ in range(repeats):
+                compute()
+            rates.append(repeats / (timer() - start))
+        assert np.array_equal(get_engine(size).spectrum(data), reference)
+        difference = np.max(np.abs(get_engine(size, real = True).spectrum(data) - reference))
+        print("{0:>7d} {1:>10.0f} c/s {2:>10.0f} c/s {3:>10.0f} c/s {4:>10.0f} c/s {5:>10.1e}".format(size, *(rates + [difference])))
+
+    # Spectra of a stack of captures: one capture at a time (as the sweep writers) and batched.
+
+    cube = (8000 * np.sin(0.05 * np.arange(4096)) + rs.normal(0, 20, (2000, 2, 4096))).astype(np.int16)
+    start = timer()
+    looped = np.array([get_engine(4096).channels(capture) for capture in cube])
+    print("\n{0:d} captures x {1:d} channels x {2:d} samples".format(*cube.shape))
+    print("{0:<24} {1:>8.3f} s".format("one capture at a time", timer() - start))
+    for num_threads in (0, 2, 4):
+        start = timer()
+        batched = cube_spectra(cube, num_threads = num_threads)
+        print("{0:<24} {1:>8.3f} s, identical: {2}".format("batched, {:d} threads".format(num_threads), timer() - start,
+                np.array_equal(batched, looped)))
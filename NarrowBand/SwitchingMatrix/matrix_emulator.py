@@ -0,0 +1,236 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module emulating the switching matrix firmware on a pseudo-terminal, to test switching_matrix.SwitchingMatrix
+        (legacy and acknowledged protocols, SMC and HEF command sets, schedule upload) without the matrix.
+
+        MatrixFirmware decodes the command stream:
+            - legacy protocol (after reset): "<set>_SET_TXnn_RXnn" and "toggle_<color>_led" commands, without
+              delimiter nor answer;
+            - acknowledged protocol (after "<set>_SYNC\\n"): newline terminated commands and the one-byte
+              NEXT_COMMAND, each answered "A<sequence number>\\n" (2 hex digits) once done, or "E<sequence number>\\n"
+              for unknown commands, commands of the other command set and NEXT_COMMAND past the end of the schedule.
+        PtyMatrixEmulator runs a MatrixFirmware behind a pseudo-terminal (Linux and macOS), whose name is opened as
+        the serial port of the matrix.
+
+        Main usage:
+
+        $ with PtyMatrixEmulator(command_set = "HEF", switch_time = 2e-3) as emulator:
+        $     matrix = SwitchingMatrix(emulator.port, command_set = "HEF", acked = True)
+        $     matrix.load_schedule([(1, 2), (1, 3), (2, 3)])
+        $     seq = matrix.set_pair(1, 2, wait = False)    # one byte sent
+        $     matrix.wait_ack(seq)                         # pair (1, 2) live
+        $     print emulator.firmware.pairs                # [(1, 2)]
+
+Class::
+        MatrixFirmware : switching matrix firmware command decoder.
+
+        PtyMatrixEmulator : MatrixFirmware served on a pseudo-terminal.
+"""
+# Standard library imports
+import os
+import re
+import select
+import threading
+import time
+
+# Local application imports
+from switching_matrix import COMMAND_SETS, MAX_SCHEDULE, NEXT_COMMAND, _led_colors
+
+
+class MatrixFirmware(object):
+    """Switching matrix firmware command decoder.
+
+    Parameters
+    ----------
+    command_set : str, optional
+        "SMC" or "HEF", by default "SMC"
+    switch_time : float, optional
+        time in seconds to switch the relays before acknowledging a pair, by default 0.0
+
+    Attributes
+    ----------
+    pair : tuple or None
+        live antenna pair
+    pairs : list of tuple
+        every pair set, in order
+    schedule : list of tuple
+        uploaded pairs
+    """
+
+    _LEGACY = re.compile(r"(SMC|HEF)_SET_TX(\d\d)_RX(\d\d)|toggle_(red|blue|green|orange)_led|(SMC|HEF)_SYNC\n")
+
+    def __init__(self, command_set = "SMC", switch_time = 0.0):
+        if command_set not in COMMAND_SETS:
+            raise ValueError("command_set must be one of {}, got {}.".format(sorted(COMMAND_SETS), command_set))
+        self.command_set = command_set
+        self.switch_time = switch_time
+        self.pair = None
+        self.pairs = []
+        self.leds = []
+        self.schedule = []
+        self.position = 0
+        self.acked = False
+        self._seq = 0
+        self._buffer = ""
+        self._set = re.compile(r"%s_SET_TX(\d\d)_RX(\d\d)$" % command_set)
+        self._load = re.compile(r"%s_LOAD_(\d{3})_(\d*)$" % command_set)
+        self._toggle = re.compile(r"toggle_(%s)_led$" % "|".join(_led_colors[0:4]))
+
+    def feed(self, data):
+        """Decode the received bytes data, return the answer to send back."""
+        answer = ""
+        for char in data:
+            if self.acked:
+                if char == NEXT_COMMAND and not self._buffer:
+                    answer += self._next()
+                elif char == "\n":
+                    line, self._buffer = self._buffer, ""
+                    answer += self._line(line)
+                else:
+                    self._buffer += char
+            else:
+                self._buffer += char
+                answer += self._legacy()
+        return answer
+
+    def _legacy(self):
+        match = self._LEGACY.search(self._buffer)
+        if match is None:
+            return ""
+        self._buffer = self._buffer[match.end():]
+        if match.group(1) == self.command_set:
+            self._switch((int(match.group(2)), int(match.group(3))))
+        elif match.group(4) is not None:
+            self.leds.append(match.group(4))
+        elif match.group(5) == self.command_set:
+            self.acked = True
+            self._seq = 0
+            return "A00\n"
+        return ""
+
+    def _line(self, line):
+        if line == "%s_SYNC" % self.command_set:
+            self._seq = 0
+            return "A00\n"
+        self._seq = (self._seq + 1) % 256
+        match = self._set.match(line)
+        if match is not None:
+            self._switch((int(match.group(1)), int(match.group(2))))
+            return self._ack()
+        match = self._load.match(line)
+        if match is not None and len(match.group(2)) == 4 * int(match.group(1)):
+            digits = match.group(2)
+            self.schedule = [(int(digits[k:k+2]), int(digits[k+2:k+4])) for k in range(0, len(digits), 4)]
+            self.position = 0
+            return self._ack()
+        match = self._toggle.match(line)
+        if match is not None:
+            self.leds.append(match.group(1))
+            return self._ack()
+        return self._ack(error = True)
+
+    def _next(self):
+        self._seq = (self._seq + 1) % 256
+        if self.position >= len(self.schedule):
+            return self._ack(error = True)
+        self._switch(self.schedule[self.position])
+        self.position += 1
+        return self._ack()
+
+    def _switch(self, pair):
+        if self.switch_time > 0:
+            time.sleep(self.switch_time)
+        self.pair = pair
+        self.pairs.append(pair)
+
+    def _ack(self, error = False):
+        return "%s%02X\n" % ("E" if error else "A", self._seq)
+
+
+class PtyMatrixEmulator(object):
+    """MatrixFirmware served on a pseudo-terminal, the slave name (port attribute) being opened as the matrix port.
+
+    Parameters
+    ----------
+    command_set : str, optional
+        "SMC" or "HEF", by default "SMC"
+    switch_time : float, optional
+        relay switching time in seconds, by default 0.0
+    """
+
+    def __init__(self, command_set = "SMC", switch_time = 0.0):
+        import tty # POSIX only
+        self.firmware = MatrixFirmware(command_set, switch_time)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target = self._run, name = "matrix emulator " + self.port)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            os.close(self._master)
+            os.close(self._slave)
+
+    def _run(self):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if readable:
+                answer = self.firmware.feed(os.read(self._master, 4096))
+                if answer:
+                    os.write(self._master, answer)
+
+
+if __name__ == '__main__':
+
+    # Set the pairs of a 16 antenna sweep with full commands, then with the uploaded schedule and one-byte NEXT
+    # commands, on two emulated matrices (SMC and HEF command sets) at once.
+
+    from timeit import default_timer as timer
+
+    from switching_matrix import SwitchingMatrix
+
+    pairs = [(tx, rx) for tx in range(1, 17) for rx in range(1, 17) if tx != rx]
+    for command_set in ("SMC", "HEF"):
+        with PtyMatrixEmulator(command_set) as emulator:
+            matrix = SwitchingMatrix(emulator.port, command_set = command_set, acked = True)
+            for schedule in (False, True):
+                if schedule:
+                    matrix.load_schedule(pairs)
+                written = matrix.stats["bytes_written"]
+                start = timer()
+                for pair in pairs:
+                    matrix.set_pair(*pair)
+                duration = timer() - start
+                print("{0} - schedule: {1} - {2:d} pairs, {3:.1f} bytes/pair, {4:.3f} ms/pair, live {5}, {6}".format(command_set,
+                        schedule, len(pairs), float(matrix.stats["bytes_written"] - written) / len(pairs),
+                        1e3 * duration / len(pairs), matrix.live, emulator.firmware.pairs[-len(pairs):] == pairs))
+            matrix.close()
+
+    # Schedule longer than a LOAD command (3 digit count): 225 pairs x 17 frequencies, frequency -> pair, as a sweep
+    # with ant_sweep_alt uploads it, set with NEXT commands across the loads.
+
+    sweep_pairs = [(tx, rx) for tx, rx in pairs if tx != 13] # pairs of narrow_band_system_script
+    long_schedule = [pair for _ in range(17) for pair in sweep_pairs]
+    with PtyMatrixEmulator("SMC") as emulator:
+        matrix = SwitchingMatrix(emulator.port, acked = True)
+        loaded = matrix.load_schedule(long_schedule)
+        for pair in long_schedule:
+            matrix.set_pair(*pair)
+        assert emulator.firmware.pairs == long_schedule and matrix.stats["next"] == loaded
+        print("SMC - schedule of {0:d} pairs (at most {1:d} per load): {2:d} NEXT, {3:d} LOAD commands".format(loaded,
+                MAX_SCHEDULE, matrix.stats["next"], matrix.stats["commands"] - matrix.stats["next"]))
+        matrix.close()
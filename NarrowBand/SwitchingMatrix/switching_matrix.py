@@ -1,3 +1,5 @@
+from collections import deque
+
 import serial
 import serial.tools.list_ports
 
@@ -9,13 +11,19 @@ __set_HEF_command_str = "HEF_SET_TX%02d_RX%02d"
 __led_colors = ['red','blue','green','orange', 'all']
 __toggle_led_command = "toggle_%s_led"
 
+USB_IDS = ((0x0483, 0x5740),) # STM32 virtual COM port (VID, PID)
+DESCRIPTION = "STMicroelectronics Virtual"
+
+default_transport = serial # serial port factory, e.g. a serial_transport.RecordingTransport
+
 def locate_switching_matrix():
     ports = serial.tools.list_ports.comports()
     for p in ports:
         #if 'STMicroelectronics' or 'STMicroelectronics.' in p.manufacturer:
         #    #return p.device
         #    return p
-        if p.description.startswith("STMicroelectronics Virtual"):
+        # the description differs on Linux (e.g. "STM32 Virtual ComPort"), the USB VID/PID does not
+        if (p.vid, p.pid) in USB_IDS or (p.description or "").startswith(DESCRIPTION):
             return p
     return None
 
@@ -27,7 +35,7 @@ def init():
     #print port.description
     port =port.device
     if port:
-        __sw_com = serial.Serial(port)
+        __sw_com = default_transport.Serial(port)
     else:
         raise(Exception("Switching Matrix not found"))
     __initialized = True
@@ -53,3 +61,201 @@ def toggle_led(color='red'):
     else:
         __sw_com.write(__toggle_led_command % color)
 
+
+def is_open():
+    if not __initialized:
+        init()
+    return __sw_com.isOpen()
+
+
+# module globals starting with two underscores are name mangled inside classes, SwitchingMatrix uses these aliases
+_set_SMC_command_str = __set_SMC_command_str
+_set_HEF_command_str = __set_HEF_command_str
+_led_colors = __led_colors
+_toggle_led_command = __toggle_led_command
+
+# Acknowledged protocol: newline terminated commands, each acknowledged by "A<sequence number>\n" once done (the pair
+# live for a SET), "E<sequence number>\n" on error. "<set>_SYNC" resets the sequence number (acknowledged "A00"),
+# "<set>_LOAD_<n>_<TTRR...>" uploads n pairs (3 digits, at most MAX_SCHEDULE) and the one-byte NEXT_COMMAND sets the
+# next uploaded pair.
+COMMAND_SETS = {"SMC" : _set_SMC_command_str, "HEF" : _set_HEF_command_str}
+NEXT_COMMAND = ">"
+_sync_command = "%s_SYNC"
+_load_command = "%s_LOAD_%03d_"
+MAX_SCHEDULE = 999 # pairs per LOAD command
+ACK_SIZE = 4
+
+
+class SwitchingMatrix(object):
+    """Switching matrix on a given serial port, with the module interface (set_pair, toggle_led and is_open).
+
+    Unlike the module functions, which drive the first matrix found, several instances can be used at once, with the
+    SMC or HEF command set. The port is opened on the first command.
+
+    With acked set (firmware with the acknowledged protocol, see matrix_emulator module), every command gets a
+    sequence number and an acknowledgement: set_pair(TX, RX, wait = False) returns as soon as the command is sent,
+    wait_ack(seq) returns once the pair is live, so that switching can be pipelined with the other devices. The pair
+    sequence of a sweep can be uploaded once with load_schedule, set_pair then sends the one-byte NEXT_COMMAND for
+    the pairs following the schedule (and the full command otherwise). Schedules longer than MAX_SCHEDULE pairs are
+    uploaded in loads of MAX_SCHEDULE pairs, the next one when set_pair reaches the end of the previous one.
+
+    Parameters
+    ----------
+    port : str or None, optional
+        serial port (e.g. "COM4" or "/dev/ttyACM0"), by default None to locate the matrix as init() does
+    transport : object or None, optional
+        serial port factory (see serial_transport module), by default None for default_transport
+    command_set : str, optional
+        "SMC" or "HEF", by default "SMC"
+    acked : bool, optional
+        set True for the acknowledged protocol, by default False (commands without acknowledgement)
+    timeout : float, optional
+        acknowledgement timeout in seconds, by default 1.0
+    """
+
+    def __init__(self, port = None, transport = None, command_set = "SMC", acked = False, timeout = 1.0):
+        if command_set not in COMMAND_SETS:
+            raise ValueError("command_set must be one of {}, got {}.".format(sorted(COMMAND_SETS), command_set))
+        self.port = port
+        self.transport = transport
+        self.command_set = command_set
+        self.acked = acked
+        self.timeout = timeout
+        self.pair = None    # last pair commanded
+        self.live = None    # last pair acknowledged (acked protocol)
+        self.schedule = []  # pairs of the last load
+        self.position = 0   # index in schedule of the pair set by the next NEXT_COMMAND
+        self.queued = []    # pairs of the schedule following the last load
+        self.stats = {"commands" : 0, "next" : 0, "acks" : 0, "bytes_written" : 0}
+        self._com = None
+        self._seq = 0
+        self._pending = deque() # (sequence number, pair or None) of the commands not acknowledged yet
+
+    def open(self):
+        if self._com is None:
+            port = self.port
+            if port is None:
+                located = locate_switching_matrix()
+                if located is None:
+                    raise(Exception("Switching Matrix not found"))
+                port = located.device
+            factory = self.transport or default_transport
+            if self.acked:
+                self._com = factory.Serial(port, timeout = self.timeout)
+                self._sync()
+            else:
+                self._com = factory.Serial(port)
+        return self._com
+
+    def close(self):
+        if self._com is not None:
+            self._com.close()
+            self._com = None
+
+    def set_pair(self, TX, RX, wait = True):
+        """Set antenna pair (TX, RX), return the sequence number of the command (None without acknowledgements).
+
+        With the acknowledged protocol and wait set, return once the pair is live.
+        """
+        pair = (TX, RX)
+        if self.acked and self.position == len(self.schedule) and self.queued and self.queued[0] == pair:
+            self._load_next()
+        if self.acked and self.position < len(self.schedule) and self.schedule[self.position] == pair:
+            self.position += 1
+            self.stats["next"] += 1
+            seq = self._send(NEXT_COMMAND, pair)
+        else:
+            seq = self._send(COMMAND_SETS[self.command_set] % (TX, RX), pair)
+        self.pair = pair
+        if seq is not None and wait:
+            self.wait_ack(seq)
+        return seq
+
+    def load_schedule(self, pairs):
+        """Upload the pair sequence of a sweep (acknowledged protocol), consecutive repeats and the current pair removed,
+        return its number of pairs. The first MAX_SCHEDULE pairs are uploaded at once, the following ones by set_pair.
+
+        Raises
+        ------
+        IOError
+            without the acknowledged protocol, or if the matrix rejects the schedule
+        """
+        if not self.acked:
+            raise IOError("Schedule upload requires the acknowledged protocol.")
+        schedule = []
+        for pair in pairs:
+            pair = tuple(pair)
+            if pair != (schedule[-1] if schedule else self.pair):
+                schedule.append(pair)
+        self.queued = schedule
+        self._load_next()
+        return len(schedule)
+
+    def _load_next(self):
+        """Upload the next MAX_SCHEDULE pairs of the queued schedule (LOAD command)."""
+        schedule, self.queued = self.queued[:MAX_SCHEDULE], self.queued[MAX_SCHEDULE:]
+        self.schedule = []
+        self.position = 0
+        self.wait_ack(self._send(_load_command % (self.command_set, len(schedule))
+                                    + "".join("%02d%02d" % pair for pair in schedule)))
+        self.schedule = schedule
+
+    def wait_ack(self, seq):
+        """Read the acknowledgements up to the one of command seq (None returns at once).
+
+        Raises
+        ------
+        IOError
+            if a command is rejected or not acknowledged within timeout
+        """
+        if seq is None:
+            return
+        com = self.open()
+        while any(pending == seq for pending, _ in self._pending):
+            ack = com.read(ACK_SIZE)
+            pending, pair = self._pending.popleft()
+            if len(ack) < ACK_SIZE:
+                self._pending.clear()
+                raise IOError("Switching matrix did not acknowledge command {:d}.".format(pending))
+            if ack != "A%02X\n" % pending:
+                self._pending.clear()
+                raise IOError("Switching matrix answered {!r} to command {:d}.".format(ack, pending))
+            self.stats["acks"] += 1
+            if pair is not None:
+                self.live = pair
+
+    def toggle_led(self, color = 'red'):
+        if color not in _led_colors:
+            return
+        if color == 'all':
+            for c in _led_colors[0:4]:
+                self.wait_ack(self._send(_toggle_led_command % c))
+        else:
+            self.wait_ack(self._send(_toggle_led_command % color))
+
+    def is_open(self):
+        return self.open().isOpen()
+
+    def _send(self, command, pair = None):
+        """Write command, return its sequence number (None without acknowledgements)."""
+        com = self.open()
+        self.stats["commands"] += 1
+        if not self.acked:
+            self.stats["bytes_written"] += len(command)
+            com.write(command)
+            return None
+        if command != NEXT_COMMAND:
+            command += "\n"
+        self._seq = (self._seq + 1) % 256
+        self._pending.append((self._seq, pair))
+        self.stats["bytes_written"] += len(command)
+        com.write(command)
+        return self._seq
+
+    def _sync(self):
+        self._com.write(_sync_command % self.command_set + "\n")
+        ack = self._com.read(ACK_SIZE)
+        if ack != "A00\n":
+            raise IOError("Switching matrix on {} does not acknowledge commands (answered {!r}).".format(self.port, ack))
+        self._seq = 0
+        self._pending.clear()
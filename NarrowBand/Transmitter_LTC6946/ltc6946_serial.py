@@ -16,10 +16,30 @@ Written by: Leonardo Fortaleza
 
         $ fsynth = DC590B()           # Finds and opens DC590B COM port.
         $ fsynth.freq_set("2012_5")   # Sets known frequency (input is string for compatibility with previous modules).
+        $ fsynth2 = DC590B(port = "COM7")   # Opens the DC590B on a given port (see discovery module to find it).
+        $ fsynth.fast_hop = True      # Next freq_set calls only write the registers that change.
+        $ fsynth3 = DC590B(port = "COM7", transport = recorder)   # Records the serial traffic (see serial_transport module).
+        $ with fsynth.queue.batch():  # Burst and read-back sent in a single transfer.
+        $     fsynth.freq_set("2025")
+        $     readback = fsynth.queue.spi_read(1, 10)
+        $ readback.result()           # Reads the answer (barrier), e.g. ['04', '08', '00', '19', '1F', 'A4', ...].
 
     Class::
         DC590B: defined for communication with the DC590B demo board, containing several routines.
 
+        CommandQueue: coalesces DC590B commands into single serial transfers, with pipelined read-backs.
+
+        Reply: answer of a queued read, available after a barrier.
+
+    Functions::
+        scan: lists the serial ports.
+
+        identify: sends the ID query on an open port.
+
+        burst_registers: register values written by an SPI burst.
+
+        differential_burst: SPI burst writing only the registers that differ from a register image.
+
     Class object implementation adapted from connect_to_arduino_DC590.py module
     by Noe Quintero (Linear Technology). Disclaimer follows:
 
@@ -55,6 +75,8 @@ Written by: Leonardo Fortaleza
 """
 
 # Standard library imports
+from collections import deque
+from contextlib import contextmanager
 import time
 
 # Third-party library imports
@@ -64,26 +86,53 @@ import serial.tools.list_ports
 # Local application imports
 from register_mapping import register_values, register_values_list
 
+NUM_REGS = 11 # registers h00 (status, read only) to h0A
+N_DIV_LSB = 6 # writing register h06 starts the VCO calibration (AUTOCAL set in h07)
+MUTE_REG = 2 # register h02 holds the RF output mute bit
+MUTE_BIT = 0x02
+
+DC590_ID = "DC590"
+default_transport = serial # serial port factory of DC590B, e.g. a serial_transport.RecordingTransport
+USB_IDS = () # (VID, PID) of the DC590B boards, empty to probe every serial port (see discovery module)
+
 def scan():
-    """Scan for available ports. Return a list of tuples (num, name)."""
-    available = []
-    for i in range(256):
-        try:
-            s = serial.Serial("COM"+ str(i))
-            available.append( (i, s.portstr))
-            s.close()   # explicit close 'cause of delayed GC in java
-        except serial.SerialException:
-            pass
-    return available
+    """Scan for available ports (enumerated once, COMn and /dev/tty* names alike). Return a list of tuples (num, name)."""
+    return list(enumerate(sorted(p.device for p in serial.tools.list_ports.comports())))
+
+def identify(com, timeout = 0.5):
+    """Send the ID query on the open serial port com, return True if a DC590B answers within timeout seconds.
+
+    The answer is read line by line, so that the query returns as soon as the ID string arrives (lines sent before
+    it, e.g. the hello of the board when the port opens, are skipped).
+    """
+    com.write("i")
+    deadline = time.time() + timeout
+    answer = ""
+    while DC590_ID not in answer and time.time() < deadline:
+        line = com.readline()
+        if not line:
+            break
+        answer += line
+    return DC590_ID in answer
 
 class DC590B(object):
     """Hardware-based SPI implementation for the DC590B demo board controller with
     select frequency setting routine for the LTC6946.
 
+    The last programmed register image is kept in registers (None when unknown: after opening the port, a write
+    error, a failed register check or invalidate()). With fast_hop set, freq_set only writes the registers that
+    differ from it (e.g. the N divider h05/h06 between neighbouring frequencies) without muting the output,
+    and falls back to the full burst while the image is unknown.
+
     """
 
-    def __init__(self, verbose=False):
-        self.open(verbose)
+    def __init__(self, verbose=False, port=None, fast_hop=False, transport=None):
+        self.fast_hop = fast_hop
+        self.transport = transport
+        self.registers = None
+        self.hop_stats = {"full" : 0, "differential" : 0, "unchanged" : 0, "bytes" : 0}
+        self.queue = CommandQueue(self)
+        self.open(verbose, port)
 
     def __del__(self):
         self.close()
@@ -94,26 +143,26 @@ class DC590B(object):
     def __exit__(self, a, b, c):
         self.close()
 
-    def open(self, verbose=False):
+    def open(self, verbose=False, port=None):
         """Locates and opens DC590 COM port.
+
+        If port is given (e.g. "COM5" or "/dev/ttyACM0"), only that port is tried, so that several DC590B boards
+        can be used at once.
         """
+        self.registers = None
         if verbose:
             print "\nLooking for COM ports ..."
-        ports = scan()
+        ports = scan() if port is None else [(None, port)]
         number_of_ports = len(ports)
         if verbose:
             print "Available ports: " + str(ports)
             print "\nLooking for DC590B ..."
         for x in range(0,number_of_ports):
             # Opens the port
-            self.port = serial.Serial(ports[x][1], 9600, timeout = 0.5, write_timeout = 0.5)
+            self.port = (self.transport or default_transport).Serial(ports[x][1], 9600, timeout = 0.5, write_timeout = 0.5)
             try:
-                id_dc590 = self.port.read(50) # Remove the hello from buffer
-
                 # Get ID string
-                self.port.write("i")
-                id_dc590 = self.port.read(50)
-                if id_dc590[20:25] == "DC590":
+                if identify(self.port):
                     #DC590B = ports[x][1]
                     #print ports[x][1]
                     if verbose:
@@ -136,6 +185,11 @@ class DC590B(object):
         except Exception:
             return 0
 
+    def invalidate(self):
+        """Forget the register image, so that the next freq_set writes the full burst (e.g. after a DC1705C power cycle).
+        """
+        self.registers = None
+
     def info(self):
         """Read and print target board info.
         """
@@ -154,6 +208,7 @@ class DC590B(object):
         """"Send packet and, if return_size > 0, return read packet.
         """
         try:
+            self.queue.barrier() # answers of queued reads first
             if len(send_packet) > 0:
                 self.port.write(send_packet)                       # Send packet
             if return_size > 0:
@@ -180,7 +235,41 @@ class DC590B(object):
         else:
             return False
 
-    def check_regs(self, values=['04'].append(register_values_list('0')), all_regs=True,
+    def read_lock_flag(self):
+        """Read register h00 once and return True if the PLL Lock flag (bit 2) is up.
+
+        Unlike check_PLL_lock, reads exactly the two returned characters, so it does not wait for the port timeout
+        and can be used for polling.
+
+        Returns
+        -------
+        bool
+            True if the PLL Lock flag is up, False otherwise (or if the answer could not be read)
+        """
+        try:
+            return bool(int(self.queue.spi_read(0, 1).result()[0], 16) & 0x04)
+        except (IOError, ValueError):
+            return False
+
+    def read_registers(self, num_regs = 11):
+        """Burst SPI read of num_regs registers starting at h00, return list of byte values in string format.
+
+        Parameters
+        ----------
+        num_regs : int, optional
+            number of registers to read, by default 11 (h00 to h0A)
+
+        Returns
+        -------
+        list of str
+            register values as upper case hex strings, e.g. ['04', '04', '08', ...]
+        """
+        try:
+            return self.queue.spi_read(0, num_regs).result()
+        except IOError:
+            return []
+
+    def check_regs(self, values=None, all_regs=True,
                      addr_list = ['01','03','05','07','09','0B', '0D', '0F', '11', '13', '15']):
         """Check if register values match input 'values', return boolean.
 
@@ -190,7 +279,7 @@ class DC590B(object):
         Parameters
         ----------
         values : list of str, optional
-            list with byte values in string format, by default ['04'].append(register_values_list('0'))
+            list with byte values in string format, by default None for ['04'] + register_values_list('0')
         all_regs : bool, optional
             set to True for burst SPI read of registers h00 to h0A, by default True
         addr_list : list of str, optional
@@ -201,15 +290,17 @@ class DC590B(object):
         bool
             return True if register values match input values list, otherwise return False
         """
+        if values is None:
+            values = ['04'] + register_values_list('0')
         if all_regs: # reads 11 registers, excludes only h0B which only contains Revision and part numbers.
-            ans = self.transfer_packets('xR01', return_size=11)
-            self.port.write('X')
-        else:
-            ans = []
-            for addr in addr_list:
-                ans.append(self.transfer_packets("".join(('xR',addr)), return_size=1))
-                self.port.write('X')
-            ans = ''.join((ans))
+            replies = [self.queue.read('xS01' + 'R'*11 + 'X', 11)]
+        else: # all reads in a single transfer
+            replies = [self.queue.read('xS' + addr + 'RX', 1) for addr in addr_list]
+        self.queue.barrier()
+        try:
+            ans = ''.join(''.join(reply.result()) for reply in replies)
+        except IOError:
+            return False
         values = ''.join(values)
         if values == ans:
             return True
@@ -254,21 +345,23 @@ class DC590B(object):
             If either check_lock or check_values are True, returns 1 if check succesfull and 0 otherwise.
         """
         msg = register_values_list(freq)
+        self.registers = None
 
         if verbose:
             print "\rSetting frequency: {} MHz                         ".format(freq),
 
-        for index in range(0,len(msg)):                      #Send bytes in msg list
-            if index == 1:
-                self.port.write("xS04S0AX") # Initially keep RFOUT muted.
-            else:
-                self.port.write("xS" + addr_list[index] + "S" + msg[index] + "X")
-        self.port.write("xS" + addr_list[1] + "S" + msg[1] + "X")
+        with self.queue.batch(): # single transfer
+            for index in range(0,len(msg)):                      #Send bytes in msg list
+                if index == 1:
+                    self.queue.write("xS04S0AX") # Initially keep RFOUT muted.
+                else:
+                    self.queue.write("xS" + addr_list[index] + "S" + msg[index] + "X")
+            self.queue.write("xS" + addr_list[1] + "S" + msg[1] + "X")
         if verbose:
             print "\rFrequency Set: {} MHz                         ".format(freq)
 
         if check_values:
-            ans = self.check_regs(values=['04'].append(register_values_list(freq)), all_regs=True,
+            ans = self.check_regs(values=['04'] + register_values_list(freq), all_regs=True,
                                     addr_list=chk_addr_list)
             if ans:
                 if verbose:
@@ -289,7 +382,7 @@ class DC590B(object):
                     print "\nPLL Not Locked!\n"
                 return 0
 
-    def freq_set(self, freq, verbose=False, check_lock=False, check_values=False):
+    def freq_set(self, freq, verbose=False, check_lock=False, check_values=False, msg=None):
         """Set LTC6946 registers for input freq, using burst SPI mode.
 
         This is more efficient than setting each register at a time (freq_set_from_list function).
@@ -306,29 +399,52 @@ class DC590B(object):
         check_values : bool, optional
             set to True to perform full register values verification, by default False
             uses register_values_list(freq) to check values
+        msg : str or None, optional
+            SPI burst for freq already encoded (e.g. by a sweep_plan.SweepPlan), by default None uses register_values(freq)
+            with fast_hop, only the registers of msg that differ from the register image are written
 
         Returns
         -------
         int
             If either check_lock or check_values are True, returns 1 if check succesfull and 0 otherwise.
         """
-        msg = register_values(freq)
+        if msg is None:
+            msg = register_values(freq)
 
         if verbose:
             print "\rSetting frequency: {} MHz                         ".format(freq),
 
-        self.port.write(msg)
+        target = burst_registers(msg)
+        if self.fast_hop and self.registers is not None:
+            burst = differential_burst(self.registers, target)
+            self.hop_stats["differential" if burst else "unchanged"] += 1
+        else:
+            burst = msg
+            self.hop_stats["full"] += 1
+        try:
+            if burst:
+                self.queue.write(burst)
+                self.queue.flush()
+        except Exception:
+            self.registers = None
+            raise
+        self.hop_stats["bytes"] += len(burst)
+        registers = list(self.registers) if self.registers is not None else [None]*NUM_REGS
+        for addr, value in target:
+            registers[addr] = value
+        self.registers = tuple(registers) if None not in registers[1:] else None
 
         if verbose:
             print "\rFrequency Set: {} MHz                         ".format(freq)
 
         if check_values:
-            ans = self.check_regs(values=['04'].append(register_values_list(freq)), all_regs=True)
+            ans = self.check_regs(values=['04'] + register_values_list(freq), all_regs=True)
             if ans:
                 if verbose:
                     print "\nRegisters match!\n"
                 return 1
             else:
+                self.registers = None
                 if verbose:
                     print "\nRegisters don't match!\n"
                 return 0
@@ -344,6 +460,204 @@ class DC590B(object):
                 return 0
 
 
+class Reply(object):
+    """Answer of a read queued on a CommandQueue: num_bytes register values as upper case hex strings."""
+
+    def __init__(self, queue, num_bytes):
+        self.queue = queue
+        self.num_bytes = num_bytes
+        self.done = False
+        self._values = None
+
+    def result(self):
+        """Return the list of read values, reading the answers of the queue first if needed (barrier).
+
+        Raises
+        ------
+        IOError
+            if the DC590B returned fewer characters than expected
+        """
+        if not self.done:
+            self.queue.barrier()
+        if self._values is None:
+            raise IOError("DC590B did not return the {:d} bytes of a read.".format(self.num_bytes))
+        return self._values
+
+    def _set(self, data):
+        self.done = True
+        if len(data) == 2*self.num_bytes:
+            self._values = [data[i:i+2] for i in range(0, len(data), 2)]
+
+
+class CommandQueue(object):
+    """Coalesce DC590B commands into single serial transfers, with pipelined read-backs.
+
+    Commands are queued by write and read and sent together by flush (one port write). The answers of reads are left
+    in the DC590B output buffer until barrier (or the result of one of them) reads all of them at once, so that a
+    read-back can travel in the same transfer as the burst it checks and be collected later, e.g. right before a
+    capture. Inside a batch() block, flushes are deferred to the end of the block.
+
+    Parameters
+    ----------
+    fctrl : DC590B
+        controller with the serial port
+    max_pending : int, optional
+        number of queued characters above which the queue is flushed, by default 512
+    """
+
+    def __init__(self, fctrl, max_pending = 512):
+        self.fctrl = fctrl
+        self.max_pending = max_pending
+        self.stats = {"commands" : 0, "transfers" : 0, "reads" : 0, "barriers" : 0, "bytes_written" : 0, "bytes_read" : 0}
+        self._commands = []
+        self._pending = 0
+        self._queued = []           # replies of queued reads
+        self._in_flight = deque()   # replies of sent reads, answers not read yet
+        self._batch = 0
+
+    def write(self, command):
+        """Queue command (DC590B characters, e.g. 'xS0AS20S08X')."""
+        self._commands.append(command)
+        self._pending += len(command)
+        self.stats["commands"] += 1
+        if self._pending > self.max_pending:
+            self._send()
+
+    def read(self, command, num_bytes):
+        """Queue command returning num_bytes bytes (one 'R' each), return its Reply."""
+        reply = Reply(self, num_bytes)
+        self._queued.append(reply)
+        self.stats["reads"] += 1
+        self.write(command)
+        return reply
+
+    def spi_write(self, addr, values):
+        """Queue an auto-incremented SPI write of values (list of hex strings) from register addr."""
+        self.write('xS{0:02X}'.format(addr << 1) + ''.join('S' + value for value in values) + 'X')
+
+    def spi_read(self, addr, count):
+        """Queue an auto-incremented SPI read of count registers from register addr, return its Reply."""
+        return self.read('xS{0:02X}'.format(addr << 1 | 1) + 'R'*count + 'X', count)
+
+    def flush(self):
+        """Send the queued commands in a single transfer (deferred to the end of a batch), without reading answers."""
+        if not self._batch:
+            self._send()
+
+    def barrier(self):
+        """Send the queued commands and read the answers of all sent reads at once."""
+        self._send()
+        if not self._in_flight:
+            return
+        self.stats["barriers"] += 1
+        replies = list(self._in_flight)
+        self._in_flight.clear()
+        data = self.fctrl.port.read(sum(2*reply.num_bytes for reply in replies))
+        self.stats["bytes_read"] += len(data)
+        start = 0
+        for reply in replies:
+            reply._set(data[start:start + 2*reply.num_bytes])
+            start += 2*reply.num_bytes
+
+    @contextmanager
+    def batch(self):
+        """Defer flushes to the end of the block, so that all commands queued inside are sent in a single transfer."""
+        self._batch += 1
+        try:
+            yield self
+        finally:
+            self._batch -= 1
+        self.flush()
+
+    def _send(self):
+        if not self._commands:
+            return
+        data = ''.join(self._commands)
+        replies = self._queued
+        self._commands = []
+        self._pending = 0
+        self._queued = []
+        try:
+            self.fctrl.port.write(data)
+        except Exception:
+            for reply in replies:
+                reply._set('')
+            raise
+        self._in_flight.extend(replies)
+        self.stats["transfers"] += 1
+        self.stats["bytes_written"] += len(data)
+
+
+_burst_cache = {}
+_differential_cache = {}
+
+def burst_registers(msg):
+    """Return the ((address, value), ...) register writes of SPI burst msg, in address order (later writes win).
+
+    Parses the DC590B commands: 'x' chip select, then 'Snn' bytes, the first one being the address byte
+    (7-bit address + LSB 0 for write) followed by auto-incremented register data, 'X' end of transfer.
+    """
+    try:
+        return _burst_cache[msg]
+    except KeyError:
+        pass
+    values = {}
+    addr = None
+    index = 0
+    while index < len(msg):
+        char = msg[index]
+        if char == 'S':
+            byte = int(msg[index+1:index+3], 16)
+            index += 2
+            if addr is None:
+                addr = byte >> 1 if not byte & 1 else -1
+            elif addr >= 0:
+                values[addr] = byte
+                addr += 1
+        elif char in 'xX':
+            addr = None
+        index += 1
+    registers = tuple(sorted((addr, value) for addr, value in values.items() if 0 < addr < NUM_REGS))
+    _burst_cache[msg] = registers
+    return registers
+
+def differential_burst(registers, target):
+    """Return the SPI burst writing the registers of target that differ from the register image, '' if none differs.
+
+    Contiguous registers from the first to the last change are written in a single auto-incremented transfer,
+    always including h06 so that the VCO is calibrated for the new frequency. A change of the mute register h02
+    is written in its own transfer, before the dividers when muting and after them when unmuting.
+
+    Parameters
+    ----------
+    registers : tuple
+        current register image, registers[addr] for addresses h00 to h0A
+    target : tuple
+        ((address, value), ...) register writes, as returned by burst_registers
+    """
+    key = (registers, target)
+    try:
+        return _differential_cache[key]
+    except KeyError:
+        pass
+    image = list(registers)
+    changed = []
+    for addr, value in target:
+        if image[addr] != value:
+            changed.append(addr)
+        image[addr] = value
+    burst = ''
+    divider_changes = [addr for addr in changed if addr != MUTE_REG]
+    if divider_changes:
+        first, last = min(divider_changes + [N_DIV_LSB]), max(divider_changes + [N_DIV_LSB])
+        burst = 'xS{0:02X}'.format(first << 1) + ''.join('S{0:02X}'.format(image[addr]) for addr in range(first, last + 1)) + 'X'
+    if MUTE_REG in changed:
+        mute = 'xS{0:02X}S{1:02X}X'.format(MUTE_REG << 1, image[MUTE_REG])
+        # mute before retuning, unmute after retuning, as the full burst does
+        burst = mute + burst if image[MUTE_REG] & MUTE_BIT else burst + mute
+    _differential_cache[key] = burst
+    return burst
+
 
 if __name__ == '__main__':
 
@@ -10,9 +10,12 @@ Functions::
     register_values :       return string for burst SPI write of register settings for a given frequency.
     register_values_list:   return list of strings for register settings for a given frequency.
 
+    Frequencies missing from the tables are computed by the register_synth module.
+
 
 Written by Leonardo Fortaleza
 """
+import register_synth
 
 reg_lists = {   "1550":  ['04','08','00','19','24','54','63','FB','DB','C0'],
                 "1600":  ['04','08','00','19','25','80','63','FB','DB','C0'],
@@ -100,7 +103,8 @@ def register_values(freq):
     -------
     list of str
         string with register values in SPI format for given frequency, ready for SPI write operation.
-        if frequency not in dictionary (KeyError), prints "Not a valid frequency!".
+        if frequency not in dictionary (KeyError), computed by register_synth.burst.
+        if frequency outside the LTC6946-2 limits, prints "Not a valid frequency!".
     """
     try :
         return regs[freq]
@@ -108,7 +112,10 @@ def register_values(freq):
         try :
             return regs[_freq2str(freq)]
         except KeyError:
-            print "Not a valid frequency!"
+            try :
+                return register_synth.burst(freq)
+            except ValueError:
+                print "Not a valid frequency!"
 
 def register_values_list(freq):
     """Return list of strings with register settings for a given frequency.
@@ -124,15 +131,19 @@ def register_values_list(freq):
     -------
     list of str
         list with register values for given frequency, for register addresses from h01 to h0A.
-        if frequency not in dictionary (KeyError), prints "Not a valid frequency!".
+        if frequency not in dictionary (KeyError), computed by register_synth.register_list.
+        if frequency outside the LTC6946-2 limits, prints "Not a valid frequency!".
     """
     try :
         return reg_lists[freq]
     except KeyError:
         try :
-            return regs[_freq2str(freq)]
+            return reg_lists[_freq2str(freq)]
         except KeyError:
-            print "Not a valid frequency!"
+            try :
+                return register_synth.register_list(freq)
+            except ValueError:
+                print "Not a valid frequency!"
 
 def _freq2str(freq_num):
 	"""Convert numeric or string frequency value in MHz (freq_num) to compatible string value.
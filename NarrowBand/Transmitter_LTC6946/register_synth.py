@@ -0,0 +1,219 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module computing the LTC6946-2 register settings of any output frequency within the device limits, instead
+        of the hand-typed tables of the register_mapping module.
+
+        For an output frequency fRF (MHz):
+            - output divider O: the largest of 1 to 6 keeping the VCO frequency fVCO = O * fRF in the LTC6946-2 VCO
+              range (3080 to 4910 MHz), as in the tables;
+            - reference divider R: R_DIV (25, the 500 kHz PFD of the tables with the 12.5 MHz reference) when it gives
+              an integer N, otherwise the smallest R (1 to 1023, PFD at most 100 MHz) that does;
+            - feedback divider N = fVCO * R / fREF (32 to 65535);
+            - VCO calibration divider B: the smallest power of 2 keeping fPFD / B at most 1.25 MHz (BD = 0 for the
+              tables' 500 kHz PFD);
+            - reference filter, output power, lock window, charge pump current and mode: the DC1705C settings of the
+              tables (h07 to h0A), which depend on the board loop filter rather than on the frequency.
+        Frequency "0" gives the muted output (registers of MUTE_FREQ, output mute bit set), as in the tables.
+
+        Results are memoised as pre-encoded DC590B SPI bursts, the same strings as register_mapping.regs, and a whole
+        grid can be compiled at startup with precompute. validate() checks that the computed values match every
+        entry of the register_mapping tables byte for byte.
+
+        Main usage:
+
+        $ burst("2012_5")                       # 'xS02S04S0AS00S19S1FS72S63SFASDBSC0XxS04S08X'
+        $ register_list(2012.3)                 # ['04', '08', '00', '7D', '9D', '36', ...] (R = 125, 100 kHz PFD)
+        $ dividers("3100")                      # Dividers(r_div=25, n_div=6200, o_div=1, b_div=1, ...)
+        $ precompute(grid(2000, 2200, 2.5))     # compiles a 2.5 MHz step grid
+        $ validate()                            # [] (no frequency differs from the tables)
+
+Class::
+        Dividers : divider settings of an output frequency.
+
+Functions::
+        dividers : computes the dividers of a frequency.
+
+        register_list : register values h01 to h0A of a frequency.
+
+        burst : memoised DC590B SPI burst of a frequency.
+
+        precompute : compiles the bursts of a list of frequencies.
+
+        grid : frequency strings of a regular grid.
+
+        freq_key : frequency string of a frequency (underscore for the decimal point).
+
+        validate : frequencies of the register_mapping tables whose computed settings differ.
+"""
+# Standard library imports
+from collections import namedtuple
+from fractions import Fraction
+
+F_REF = Fraction("12.5") # MHz, DC1705C reference implied by the register tables
+R_DIV = 25               # reference divider of the register tables (500 kHz PFD)
+VCO_MIN = 3080           # MHz, LTC6946-2 VCO range
+VCO_MAX = 4910
+O_DIV_MAX = 6
+N_DIV_MIN = 32
+N_DIV_MAX = 65535
+R_DIV_MAX = 1023
+PFD_MAX = 100            # MHz
+CAL_MAX = Fraction("1.25") # MHz, maximum VCO calibration clock fPFD / B
+MUTE_FREQ = "2200"       # registers of the muted output ("0")
+
+# DC1705C settings of the register tables
+STATUS_MASK = 0x04  # h01
+POWER_DOWN = 0x08   # h02, PDFN set
+OUTPUT_MUTE = 0x02  # h02 OMUTE
+CAL_CONTROL = 0x63  # h07
+OUTPUT_BITS = 0xF8  # h08 without the output divider OD
+LOCK_CP = 0xDB      # h09
+CP_MODE = 0xC0      # h0A
+
+
+class Dividers(namedtuple("Dividers", ["r_div", "n_div", "o_div", "b_div", "f_vco", "f_pfd"])):
+    """Divider settings of an output frequency (f_vco and f_pfd in MHz, as Fraction)."""
+
+    __slots__ = ()
+
+
+def dividers(freq, f_ref = F_REF, r_div = R_DIV):
+    """Return the Dividers of output frequency freq.
+
+    Parameters
+    ----------
+    freq : str or float or int
+        output frequency in MHz, strings with underscores "_" replacing dots "." as in the register tables
+    f_ref : Fraction or str, optional
+        reference frequency in MHz, by default F_REF
+    r_div : int, optional
+        preferred reference divider, by default R_DIV
+
+    Raises
+    ------
+    ValueError
+        if freq is outside the LTC6946-2 output range or cannot be synthesized exactly
+    """
+    f_rf = _mhz(freq)
+    f_ref = Fraction(f_ref)
+    o_divs = [o_div for o_div in range(O_DIV_MAX, 0, -1) if VCO_MIN <= o_div * f_rf <= VCO_MAX]
+    if f_rf <= 0 or not o_divs:
+        raise ValueError("{} MHz is outside the LTC6946-2 output range ({:.2f} to {:d} MHz).".format(freq,
+                            float(VCO_MIN) / O_DIV_MAX, VCO_MAX))
+    o_div = o_divs[0]
+    f_vco = o_div * f_rf
+    for r in [r_div] + [r for r in range(1, R_DIV_MAX + 1) if r != r_div]:
+        f_pfd = f_ref / r
+        n_div = f_vco / f_pfd
+        if n_div.denominator == 1 and N_DIV_MIN <= n_div <= N_DIV_MAX and f_pfd <= PFD_MAX:
+            b_div = 1
+            while f_pfd / b_div > CAL_MAX:
+                b_div *= 2
+            return Dividers(r, int(n_div), o_div, b_div, f_vco, f_pfd)
+    raise ValueError("{} MHz cannot be synthesized from a {} MHz reference with an integer N divider.".format(freq, f_ref))
+
+def register_list(freq, f_ref = F_REF):
+    """Return the list of register values (upper case hex strings) of freq for addresses h01 to h0A, "0" muted."""
+    mute = freq_key(freq) == "0"
+    d = dividers(MUTE_FREQ if mute else freq, f_ref)
+    b_bits = d.b_div.bit_length() - 1
+    values = [STATUS_MASK,
+                POWER_DOWN | (OUTPUT_MUTE if mute else 0),
+                b_bits << 4 | d.r_div >> 8,
+                d.r_div & 0xFF,
+                d.n_div >> 8,
+                d.n_div & 0xFF,
+                CAL_CONTROL,
+                OUTPUT_BITS | d.o_div,
+                LOCK_CP,
+                CP_MODE]
+    return ["{:02X}".format(value) for value in values]
+
+_bursts = {}
+
+def burst(freq):
+    """Return the DC590B SPI burst setting freq (memoised): registers h01 to h0A written with the output muted,
+    then unmuted ("0" stays muted), as in register_mapping.regs.
+
+    Raises
+    ------
+    ValueError
+        for frequencies outside the LTC6946-2 limits (see dividers)
+    """
+    try:
+        return _bursts[freq]
+    except (KeyError, TypeError):
+        pass
+    key = freq_key(freq)
+    if key in _bursts:
+        return _bursts[key]
+    values = register_list(key)
+    muted = values[1]
+    values[1] = "{:02X}".format(int(muted, 16) | OUTPUT_MUTE)
+    msg = 'xS02' + ''.join('S' + value for value in values) + 'X'
+    if key != "0":
+        msg += 'xS04S{}X'.format(muted)
+    _bursts[key] = _bursts[freq] = msg # also under freq as given, for lookups without parsing
+    return msg
+
+def precompute(freqs):
+    """Compile the bursts of freqs at once, return {frequency string : burst}.
+
+    Raises
+    ------
+    ValueError
+        for the first frequency outside the LTC6946-2 limits
+    """
+    return dict((freq_key(freq), burst(freq)) for freq in freqs)
+
+def grid(start, stop, step):
+    """Return the frequency strings from start to stop (included) in MHz with step, e.g. grid(2000, 2010, 2.5)."""
+    start, stop, step = _mhz(start), _mhz(stop), _mhz(step)
+    count = int((stop - start) / step)
+    return [freq_key(start + k * step) for k in range(count + 1)]
+
+def freq_key(freq):
+    """Return the frequency string of freq in MHz, e.g. "2012_5" for 2012.5, "2000" for 2000.0 or "2000"."""
+    value = _mhz(freq)
+    if value.denominator == 1:
+        return str(value.numerator)
+    text = "{:.6f}".format(float(value)).rstrip("0")
+    return text.replace(".", "_")
+
+def validate():
+    """Return the frequencies of the register_mapping tables (reg_lists and regs) whose computed register values or
+    burst differ from the table entry (an empty list when the computation reproduces the tables byte for byte)."""
+    from register_mapping import reg_lists, regs
+    mismatched = []
+    for freq in sorted(set(reg_lists) | set(regs), key = _mhz):
+        if (freq in reg_lists and register_list(freq) != reg_lists[freq]) or (freq in regs and burst(freq) != regs[freq]):
+            mismatched.append(freq)
+    return mismatched
+
+def _mhz(freq):
+    """Return freq (number or string with underscores for the decimal point) in MHz as a Fraction."""
+    if isinstance(freq, Fraction):
+        return freq
+    if isinstance(freq, float):
+        return Fraction(repr(freq))
+    return Fraction(str(freq).replace("_", "."))
+
+
+if __name__ == '__main__':
+
+    from timeit import default_timer as timer
+
+    print("Frequencies differing from the register tables: {}".format(validate()))
+    freqs = grid(2000, 2200, 0.25)
+    start = timer()
+    precompute(freqs)
+    print("Compiled {0:d} bursts in {1:.3f} s".format(len(freqs), timer() - start))
+    start = timer()
+    for freq in freqs:
+        burst(freq)
+    print("Memoised lookups: {0:.2f} us/burst".format(1e6 * (timer() - start) / len(freqs)))
+    for freq in ("2012_5", 2012.25, "3100", "0"):
+        print("{0}: {1} {2}".format(freq, dividers(freq if freq != "0" else MUTE_FREQ), burst(freq)))
@@ -0,0 +1,173 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for averaging several consecutive captures at each (pair, frequency) point of a sweep, so that the
+        noise reduction of repeated measurements is obtained without switching and retuning the hardware again.
+
+        Frames are accumulated with Welford's running mean and variance, so no frame needs to be kept in memory.
+        Averaging modes:
+            - "time" : coherent average of the time domain samples (the .fft file is the FFT of the averaged frame).
+            - "magnitude" : average of the FFT magnitude of each frame (robust to phase drift between frames).
+            - "complex" : average of the complex FFT of each frame (coherent, without the DC of each frame).
+
+        For each point, the .adc file holds the averaged time domain frame (float values) and the .fft file the
+        averaged spectrum in dBFS. The variance is written next to them (" var.adc" per sample for "time",
+        " var.fft" per bin in linear full scale units for the spectral modes), and optionally the individual frames
+        (" frame K.adc").
+
+        Main usage:
+
+        $ averager = FrameAverager(num_frames = 8, mode = "time")
+        $ ch0, ch1 = averager.collect(controller, num_samples, TRIGGER_NONE)     # returns the last frame
+        $ averager.put(writer, adc_path, fft_path, key = (j, TX, RX, f_cur))     # queues averaged record and variance
+
+        With num_frames = 1, collect and put are equivalent to controller.collect and writer.put.
+
+Class::
+        FrameAverager : running average of the frames of one point, with sweep helpers.
+"""
+# Third-party imports
+import numpy as np
+
+# Local application imports
+from ReceiverFFT import ReceiverFFT as rfft
+from ReceiverFFT.fft_engine import window_gains
+
+MODES = ("time", "magnitude", "complex")
+
+
+class FrameAverager(object):
+    """Running mean and variance of the frames collected at one sweep point.
+
+    Parameters
+    ----------
+    num_frames : int, optional
+        number of consecutive captures per point, by default 1 (no averaging)
+    mode : str, optional
+        "time", "magnitude" or "complex" (see module description), by default "time"
+    keep_frames : bool, optional
+        set True to also write every individual frame, by default False
+    num_bits : int, optional
+        number of bits on the receiver ADC, by default 14
+    window : str, optional
+        FFT window type (see fft_window module), by default 'hann'
+    """
+
+    def __init__(self, num_frames = 1, mode = "time", keep_frames = False, num_bits = 14, window = 'hann'):
+        if mode not in MODES:
+            raise ValueError("Averaging mode must be one of {}, got {}.".format(MODES, mode))
+        if num_frames < 1:
+            raise ValueError("num_frames must be at least 1, got {}.".format(num_frames))
+        self.num_frames = num_frames
+        self.mode = mode
+        self.keep_frames = keep_frames
+        self.num_bits = num_bits
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        """Discard accumulated frames."""
+        self.count = 0
+        self.frames = []
+        self.last = None
+        self._mean = None
+        self._m2 = None
+        self._spec_mean = None
+        self._spec_m2 = None
+
+    def add(self, *channels):
+        """Accumulate one frame, one argument per channel."""
+        data = np.array(channels, dtype = np.float64)
+        self.count += 1
+        self.last = channels
+        if self.keep_frames:
+            self.frames.append(channels)
+        self._mean, self._m2 = _welford(self._mean, self._m2, data, self.count)
+        if self.mode != "time":
+            spectra = self._spectra(data)
+            if self.mode == "magnitude":
+                spectra = np.abs(spectra)
+            self._spec_mean, self._spec_m2 = _welford(self._spec_mean, self._spec_m2, spectra, self.count)
+
+    @property
+    def mean(self):
+        """Averaged time domain frame, [channels, samples]."""
+        return self._mean
+
+    @property
+    def variance(self):
+        """Unbiased per-sample variance of the time domain frames, [channels, samples] (zeros for a single frame)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self._mean)
+
+    def spectra_db(self):
+        """Averaged FFT magnitude in dBFS, [channels, samples/2 + 1], as computed by ReceiverFFT for a single frame."""
+        if self.mode == "time":
+            return rfft.fft_channels(self.num_bits, self._mean.shape[1], self.window, *self._mean)
+        with np.errstate(divide = 'ignore'):
+            return 20 * np.log10(np.abs(self._spec_mean))
+
+    def spectra_variance(self):
+        """Unbiased per-bin variance of the spectra (|X - mean|^2 for "complex"), in full scale units, or None for "time"."""
+        if self.mode == "time":
+            return None
+        return self._spec_m2 / (self.count - 1) if self.count > 1 else np.zeros(self._spec_m2.shape)
+
+    def collect(self, controller, num_samples, trigger):
+        """Collect num_frames consecutive captures with controller and accumulate them, return the last frame."""
+        self.reset()
+        for _ in range(self.num_frames):
+            self.add(*controller.collect(num_samples, trigger))
+        return self.last
+
+    def put(self, writer, adc_path, fft_path, key = None):
+        """Queue the record of the collected point on a CaptureWriter.
+
+        Parameters
+        ----------
+        writer : CaptureWriter
+            writer for the sweep files
+        adc_path : str
+            file path for the averaged .adc file
+        fft_path : str or None
+            file path for the averaged .fft file, None to skip it (the spectral modes always write it,
+            replacing ".adc" by ".fft" in adc_path)
+        key : tuple, optional
+            (iteration, Tx, Rx, frequency) recorded in the journal, by default None
+        """
+        if self.num_frames == 1:
+            writer.put(adc_path, fft_path, *self.last, key = key)
+            return
+
+        extra = []
+        if self.mode == "time":
+            spectra = None
+            extra.append((adc_path.replace(".adc", " var.adc"), False, self.variance))
+        else:
+            if fft_path is None:
+                fft_path = adc_path.replace(".adc", ".fft")
+            spectra = self.spectra_db()
+            extra.append((fft_path.replace(".fft", " var.fft"), True, self.spectra_variance()))
+        for k, frame in enumerate(self.frames):
+            extra.append((adc_path.replace(".adc", " frame {}.adc".format(k + 1)), False, frame))
+
+        writer.put(adc_path, fft_path, *self.mean, key = key, spectra = spectra, extra = extra)
+
+    def _spectra(self, data):
+        """Complex FFT of each channel, scaled as the ReceiverFFT magnitude (DC removed, window, 1/N, single sided, full scale)."""
+        num_samples = data.shape[1]
+        windowed = (data - data.mean(axis = 1)[:, np.newaxis]) * window_gains(num_samples, self.window)[0]
+        spectra = np.fft.rfft(windowed, axis = 1) / num_samples
+        spectra[:, 1:num_samples//2] *= 2
+        return spectra / 2.0**(self.num_bits - 1)
+
+
+def _welford(mean, m2, x, count):
+    """Update running mean and sum of squared deviations with sample x (count includes x)."""
+    if mean is None:
+        return x.copy(), np.zeros(x.shape)
+    delta = x - mean
+    mean = mean + delta / count
+    m2 = m2 + np.real(delta * np.conj(x - mean))
+    return mean, m2
@@ -0,0 +1,255 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for journaling completed captures of a sweep, so that an interrupted measurement can be resumed
+        without repeating the points that were already recorded.
+
+        The journal is an append-only JSON lines file. The first line is a header with the sweep parameters,
+        followed by one record per completed point (iteration, Tx, Rx, frequency) listing its output files and
+        their sizes, and their MD5 checksums if enabled (hashing reads every file back on the writer path, so it is
+        off by default). A point is recorded only after all of its files were written. Records are fsynced
+        in batches, so a crash loses at most the last unsynced batch, which is simply captured again on resume.
+
+        Main usage:
+
+        $ with CaptureJournal(journal_path, params, resume = True) as journal:
+        $     if not journal.is_done(j, TX, RX, f_cur):
+        $         ...                                          # capture and write the files
+        $         journal.record((j, TX, RX, f_cur), adc_path, fft_path)
+
+        With path None, the journal is disabled: nothing is written and no point is reported as done.
+
+Class::
+        CaptureJournal : append-only journal of completed sweep points.
+
+Functions::
+        read_journal : reads the header and records of a journal file, tolerating a truncated last line.
+
+        file_checksum : MD5 hex digest of a file.
+"""
+# Standard library imports
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+from timeit import default_timer as timer
+
+
+class CaptureJournal(object):
+    """Append-only journal of completed sweep points.
+
+    Parameters
+    ----------
+    path : str or None
+        journal file path, None to disable journaling
+    params : dict
+        JSON serializable sweep parameters, a resumed journal must have been created with the same values
+    resume : bool, optional
+        set to True to continue an existing journal at path, by default False starts a new journal
+        (if the file does not exist, a new journal is started either way)
+    verify : bool, optional
+        set to True to check the recorded files when resuming (size, and checksum if recorded), by default True
+        points with missing or modified files are not considered done
+    checksums : bool, optional
+        set to True to also record the MD5 checksum of each file, by default False
+    sync_every : int, optional
+        number of records between fsync calls, by default 32
+    sync_interval : float, optional
+        maximum time in seconds between fsync calls while recording, by default 5.0
+
+    Raises
+    ------
+    ValueError
+        if resuming a journal created with different parameters
+    """
+
+    def __init__(self, path, params, resume = False, verify = True, checksums = False, sync_every = 32, sync_interval = 5.0):
+        self.path = path
+        self.checksums = checksums
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.completed = {}
+        self.resumed = 0
+        self.rejected = 0
+        self.header = None
+
+        self._file = None
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = timer()
+
+        if path is None:
+            return
+
+        params = _normalize(params)
+        if resume and os.path.exists(path):
+            self.header, records = read_journal(path)
+            if self.header.get("params") != params:
+                raise ValueError("Journal {} was created with different sweep parameters, it cannot be resumed.".format(path))
+            for record in records:
+                key = _record_key(record)
+                if not verify or _files_match(record):
+                    self.completed[key] = record["files"]
+                else:
+                    self.completed.pop(key, None)
+                    self.rejected += 1
+            self.resumed = len(self.completed)
+            _truncate_torn_line(path)
+            self._file = open(path, 'a')
+        else:
+            self.header = {"type" : "header", "version" : 1,
+                            "created" : datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                            "params" : params}
+            self._file = open(path, 'w')
+            self._file.write(json.dumps(self.header, sort_keys=True) + "\n")
+            self.sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def is_done(self, iteration, tx, rx, freq):
+        """Return True if the point was completed in the resumed journal (or recorded in this run)."""
+        return (iteration, tx, rx, str(freq)) in self.completed
+
+    def all_done(self, iteration, tx, rx, freq_range):
+        """Return True if every frequency of freq_range was completed for the iteration and pair."""
+        return all(self.is_done(iteration, tx, rx, freq) for freq in freq_range)
+
+    def retain(self, predicate):
+        """Keep only the completed points whose key (iteration, Tx, Rx, frequency) satisfies predicate.
+
+        Used to check resumed points against an output that is not a set of files (e.g. an HDF5 sweep file),
+        points that are dropped count as rejected.
+        """
+        for key in [key for key in self.completed if not predicate(key)]:
+            del self.completed[key]
+            self.rejected += 1
+        self.resumed = len(self.completed)
+
+    def record(self, key, *paths):
+        """Append a record for a completed point.
+
+        Parameters
+        ----------
+        key : tuple
+            (iteration, Tx, Rx, frequency) of the point, Tx and Rx may be None
+        *paths : str or None
+            files written for the point, None entries are ignored
+        """
+        if self._file is None:
+            return
+        iteration, tx, rx, freq = key
+        paths = [f for f in paths if f is not None]
+        files = dict((f, file_checksum(f) if self.checksums else None) for f in paths)
+        sizes = dict((f, os.path.getsize(f)) for f in paths)
+        line = json.dumps({"iter" : iteration, "tx" : tx, "rx" : rx, "freq" : str(freq), "files" : files, "sizes" : sizes},
+                            sort_keys=True) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self.completed[(iteration, tx, rx, str(freq))] = files
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or timer() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def sync(self):
+        """Flush pending records to disk."""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Sync and close the journal file."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = timer()
+
+
+def read_journal(path):
+    """Read a journal file, return (header, records).
+
+    Lines that cannot be decoded (e.g. a record truncated by a crash) are skipped.
+
+    Parameters
+    ----------
+    path : str
+        journal file path
+
+    Returns
+    -------
+    header : dict
+        journal header, with the sweep parameters under "params"
+    records : list of dict
+        completed point records, in recording order
+
+    Raises
+    ------
+    ValueError
+        if the file has no valid header
+    """
+    header = None
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("type") == "header":
+                header = entry
+            elif "files" in entry:
+                records.append(entry)
+    if header is None:
+        raise ValueError("{} is not a capture journal.".format(path))
+    return header, records
+
+def file_checksum(path, block_size = 1 << 16):
+    """Return the MD5 hex digest of the file at path."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def _files_match(record):
+    """Return True if the files of record exist with their recorded size and checksum (when recorded)."""
+    sizes = record.get("sizes", {})
+    for f, checksum in record["files"].items():
+        if not os.path.exists(f):
+            return False
+        if f in sizes and os.path.getsize(f) != sizes[f]:
+            return False
+        if checksum is not None and file_checksum(f) != checksum:
+            return False
+    return True
+
+def _truncate_torn_line(path):
+    """Truncate the file at path after its last newline, removing a line torn by a crash so that new records
+    are not appended to it."""
+    with open(path, 'r+b') as f:
+        content = f.read()
+        end = content.rfind("\n") + 1
+        if end < len(content):
+            f.truncate(end)
+
+def _normalize(params):
+    """Return params as read back from JSON (tuples become lists, strings unicode), for comparison with a journal header."""
+    return json.loads(json.dumps(params, sort_keys=True))
+
+def _record_key(record):
+    return (record["iter"], record["tx"], record["rx"], str(record["freq"]))
@@ -0,0 +1,354 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for writing captured data to disk in background threads, so that the sweep loop can move the
+        hardware to the next point while the previous capture is still being formatted and written.
+
+        Captures are placed in a bounded queue. When the queue is full, the acquisition thread blocks until
+        a writer frees a slot (backpressure), so memory use stays bounded even if the disk is slower than the rig.
+
+        Optionally, the FFT for .fft files is computed by a pool of worker processes (see dsp_offload module),
+        which also produces per-capture metrics that can be appended to a JSON lines file.
+
+        Captures put with a key are recorded in a CaptureJournal (see capture_journal module) once all their
+        files are written, so an interrupted sweep can be resumed.
+
+        With a SweepStore (see hdf5_store module), captures are written to a single HDF5 file instead of PScope files.
+
+        Main usage:
+
+        $ with CaptureWriter(num_bits, is_bipolar, num_samples, num_writers = 1) as writer:
+        $     writer.put(adc_path, fft_path, ch0, ch1)    # returns as soon as the capture is queued
+        $ print writer.stats.report()                     # all files are written once the block exits
+
+Class::
+        CaptureWriter : bounded capture queue drained by writer threads (or written inline with num_writers = 0).
+
+        WriterStats : queue-depth, backpressure and per-stage write statistics collected by CaptureWriter.
+"""
+# Standard library imports
+import json
+import Queue
+import threading
+import time
+from timeit import default_timer as timer
+
+# Local application imports
+from dsp_offload import DspOffload
+from ReceiverFFT import ReceiverFFT as rfft
+from tracing import NULL_TRACER
+
+
+class WriterStats(object):
+    """Queue-depth, backpressure and per-stage timing statistics of a CaptureWriter.
+
+    A large put_wait means acquisition was stalled by the writers (I/O bound), while a large writer_idle
+    with low queue depths means the writers were waiting for captures (acquisition bound).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.captures = 0
+        self.depth_max = 0
+        self.depth_sum = 0
+        self.put_wait = 0.0
+        self.put_blocked = 0
+        self.writer_idle = 0.0
+        self.stages = {}
+
+    def add_put(self, depth, wait, blocked):
+        with self._lock:
+            self.captures += 1
+            self.depth_sum += depth
+            self.depth_max = max(self.depth_max, depth)
+            self.put_wait += wait
+            self.put_blocked += int(blocked)
+
+    def add_stage(self, stage, duration):
+        with self._lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + duration, max(longest, duration))
+
+    def add_idle(self, duration):
+        with self._lock:
+            self.writer_idle += duration
+
+    def as_dict(self):
+        """Return statistics as a JSON serializable dictionary (times in seconds)."""
+        with self._lock:
+            out = {"captures" : self.captures,
+                    "queue_depth_max" : self.depth_max,
+                    "queue_depth_mean" : float(self.depth_sum) / self.captures if self.captures else 0.0,
+                    "put_wait" : self.put_wait,
+                    "put_blocked" : self.put_blocked,
+                    "writer_idle" : self.writer_idle}
+            for stage, (count, total, longest) in self.stages.items():
+                out[stage] = {"count" : count, "total" : total,
+                                "mean" : total / count, "max" : longest}
+        return out
+
+    def report(self):
+        """Return a short human readable summary of the statistics."""
+        stats = self.as_dict()
+        lines = ["Captures: {captures:d} | queue depth mean {queue_depth_mean:.2f} max {queue_depth_max:d} | "
+                    "acquisition blocked {put_blocked:d} times ({put_wait:.3f} s) | writers idle {writer_idle:.3f} s".format(**stats)]
+        for stage in sorted(self.stages):
+            lines.append("    {0}: {count:d} writes, mean {mean:.4f} s, max {max:.4f} s, total {total:.3f} s".format(stage, **stats[stage]))
+        return "\n".join(lines)
+
+
+class CaptureWriter(object):
+    """Write PScope .adc (and optionally .fft) files for queued captures.
+
+    With num_writers > 0, files are written by background threads and put() only blocks when max_queue captures
+    are already waiting. With num_writers = 0, put() writes the files inline, as the sweep functions always did.
+
+    Leaving the with block (normally or through an exception) waits until every queued capture is written.
+    Exceptions raised by a writer thread are re-raised in the acquisition thread on the next put(), flush() or close().
+
+    Parameters
+    ----------
+    num_bits : int, optional
+        number of bits on the receiver ADC, by default 14
+    is_bipolar : bool, optional
+        True if the ADC operates with both negative and positive values, by default True
+    num_samples : int, optional
+        number of samples per channel, by default 1024
+    window : str, optional
+        FFT window used for .fft files (see fft_window module), by default 'hann'
+    num_writers : int, optional
+        number of writer threads, 0 to write inline, by default 1
+    max_queue : int, optional
+        maximum number of captures waiting to be written before put() blocks, by default 16
+    dc_num : str, optional
+        name/number of the demonstration circuit, by default 'DC_1513B-AA'
+    ltc_num : str, optional
+        name/number of the device, by default 'LTM9004'
+    stats : WriterStats or None, optional
+        statistics object to accumulate into (e.g. shared by several writers), by default None creates a new one
+    dsp_workers : int, optional
+        number of worker processes computing the FFT of captures with an fft_path, by default 0 computes it in the writer
+    metrics_file : str or None, optional
+        JSON lines file to append the per-capture metrics computed by the DSP workers, by default None
+        (records are in acquisition order when num_writers <= 1)
+    journal : CaptureJournal or None, optional
+        journal recording the key of each capture once its files are written, by default None
+    tracer : Tracer or NullTracer, optional
+        tracer recording a span per file write, tagged with the capture key, by default NULL_TRACER (see tracing module)
+    store : SweepStore or None, optional
+        HDF5 sweep file receiving the captures instead of PScope files, by default None (see hdf5_store module)
+        captures must be put with a key, the paths are then only used to name the captures in the DSP metrics
+    """
+
+    def __init__(self, num_bits = 14, is_bipolar = True, num_samples = 1024, window = 'hann', num_writers = 1, max_queue = 16,
+                    dc_num = 'DC_1513B-AA', ltc_num = 'LTM9004', stats = None, dsp_workers = 0, metrics_file = None,
+                    journal = None, tracer = NULL_TRACER, store = None):
+        self.num_bits = num_bits
+        self.is_bipolar = is_bipolar
+        self.num_samples = num_samples
+        self.window = window
+        self.dc_num = dc_num
+        self.ltc_num = ltc_num
+        self.stats = stats if stats is not None else WriterStats()
+        self.latest_metrics = None
+        self.journal = journal
+        self.tracer = tracer
+        self.store = store
+
+        self.dsp = None
+        if dsp_workers > 0:
+            self.dsp = DspOffload(num_samples, num_bits = num_bits, window = window, num_workers = dsp_workers,
+                                    num_slots = max(max_queue, 1) + 2*dsp_workers)
+        self._metrics_file = open(metrics_file, 'a') if metrics_file is not None else None
+        self._metrics_lock = threading.Lock()
+
+        self._error = None
+        self._queue = Queue.Queue(maxsize = max(1, max_queue))
+        self._threads = []
+        for n in range(num_writers):
+            thread = threading.Thread(target = self._run, name = "CaptureWriter-{}".format(n))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # keep the original exception, but still write everything that was already acquired
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def put(self, adc_path, fft_path, *data, **kwargs):
+        """Queue one capture for writing.
+
+        Parameters
+        ----------
+        adc_path : str
+            file path for the .adc (time domain) file
+        fft_path : str or None
+            file path for the .fft (frequency domain) file, None to skip the FFT
+        *data : array
+            collected data in the time domain, one argument per channel
+        key : tuple, optional
+            keyword only, (iteration, Tx, Rx, frequency) recorded in the journal after the files are written
+        spectra : array or None, optional
+            keyword only, FFT magnitude in dBFS (one row per channel) written to fft_path instead of computing it from data
+        extra : list of tuple, optional
+            keyword only, additional (path, is_fft, arrays) files written with the capture, e.g. variance or individual
+            frames of an averaged capture (see averaging module); is_fft selects the .fft (dBFS rows) or .adc format
+        """
+        self._raise_error()
+        spectra = kwargs.get("spectra")
+        job = None
+        if self.dsp is not None and fft_path is not None and spectra is None and not _is_float(data[0]):
+            job = self.dsp.submit(*data)
+        item = (adc_path, fft_path, data, job, kwargs.get("key"), spectra, kwargs.get("extra", ()), time.time())
+        if not self._threads:
+            self.stats.add_put(0, 0.0, False)
+            self._write(item)
+            return
+        depth = self._queue.qsize()
+        blocked = self._queue.full()
+        start = timer()
+        self._queue.put(item)
+        self.stats.add_put(depth, timer() - start, blocked)
+
+    def flush(self):
+        """Block until every queued capture is written."""
+        if self._threads:
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Write all queued captures and stop the writer threads and DSP workers."""
+        if self._threads:
+            self._queue.join()
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+        if self.dsp is not None:
+            self.dsp.close()
+            self.dsp = None
+        if self._metrics_file is not None:
+            self._metrics_file.close()
+            self._metrics_file = None
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        while True:
+            start = timer()
+            item = self._queue.get()
+            self.stats.add_idle(timer() - start)
+            try:
+                if item is None:
+                    return
+                self._write(item)
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, item):
+        adc_path, fft_path, data, job, key, spectra, extra, timestamp = item
+        tags = dict(zip(("iter", "tx", "rx", "freq"), key)) if key is not None and self.tracer.enabled else None
+
+        if self.store is not None:
+            self._write_store(item, tags)
+            return
+
+        try:
+            start = timer()
+            rfft.save_for_pscope(adc_path, self.num_bits, self.is_bipolar, self.num_samples,
+                                    self.dc_num, self.ltc_num, *data)
+            self._add_stage("adc", "save_for_pscope", start, tags)
+
+            if job is not None:
+                self._write_job(adc_path, fft_path, job, tags)
+        finally:
+            if job is not None:
+                job.release()
+
+        if fft_path is not None and job is None:
+            start = timer()
+            if spectra is not None:
+                rfft.save_fft_for_pscope(fft_path, self.num_samples, *spectra)
+            else:
+                rfft.save_for_pscope_fft(fft_path, self.num_bits, self.is_bipolar, self.num_samples,
+                                            self.dc_num, self.ltc_num, self.window, *data)
+            self._add_stage("fft", "save_for_pscope_fft", start, tags)
+
+        for path, is_fft, arrays in extra:
+            start = timer()
+            if is_fft:
+                rfft.save_fft_for_pscope(path, self.num_samples, *arrays)
+            else:
+                rfft.save_for_pscope(path, self.num_bits, self.is_bipolar, self.num_samples,
+                                        self.dc_num, self.ltc_num, *arrays)
+            self._add_stage("extra", "save_extra", start, tags)
+
+        if self.journal is not None and key is not None:
+            self.journal.record(key, adc_path, fft_path, *[path for path, is_fft, arrays in extra])
+
+    def _write_store(self, item, tags = None):
+        adc_path, fft_path, data, job, key, spectra, extra, timestamp = item
+        try:
+            if job is not None:
+                start = timer()
+                spectra, metrics = job.result()
+                self._add_stage("dsp_wait", "dsp_wait", start, tags)
+                self._save_metrics(adc_path, metrics)
+            elif fft_path is not None and spectra is None:
+                spectra = rfft.fft_channels(self.num_bits, self.num_samples, self.window, *data)
+
+            start = timer()
+            self.store.write(key, data, timestamp, spectra, extra[0][2] if extra else None)
+            self._add_stage("hdf5", "store_write", start, tags)
+        finally:
+            if job is not None:
+                job.release()
+
+        if self.journal is not None:
+            self.journal.record(key)
+
+    def _write_job(self, adc_path, fft_path, job, tags = None):
+        start = timer()
+        spectra, metrics = job.result()
+        self._add_stage("dsp_wait", "dsp_wait", start, tags)
+
+        start = timer()
+        rfft.save_fft_for_pscope(fft_path, self.num_samples, *spectra)
+        self._add_stage("fft", "save_fft_for_pscope", start, tags)
+
+        self._save_metrics(adc_path, metrics)
+
+    def _save_metrics(self, adc_path, metrics):
+        self.latest_metrics = metrics
+        if self._metrics_file is not None:
+            with self._metrics_lock:
+                self._metrics_file.write(json.dumps({"file" : adc_path, "channels" : metrics}, sort_keys=True) + "\n")
+
+    def _add_stage(self, stage, span, start, tags):
+        duration = timer() - start
+        self.stats.add_stage(stage, duration)
+        self.tracer.add(span, start, duration, tags)
+
+
+def _is_float(channel_data):
+    """Return True for floating point arrays (e.g. averaged captures), which are not sent to the int16 DSP ring."""
+    return getattr(channel_data, "dtype", None) is not None and channel_data.dtype.kind == 'f'
@@ -8,6 +8,7 @@
         Module for basic data manipulation of the narrow band system.
         The two main functions are narrow_band_data_read and data_read, the former outputs only the data
         while the latter also outputs number of samples, time/frequency arrays and sampling rate.
+        Both return float64 arrays; pscope_reader.read_pscope reads .adc files as int16 (4 times less memory).
 
 Functions::
 
@@ -15,8 +16,12 @@ Functions::
 
         data_read : reads narrow band system data file and returns data and time/frequency arrays plus number of samples and sampling rate.
 
+        hdf5_data_read : reads a selection of captures from an HDF5 sweep file, with the data_read outputs (from hdf5_store).
+
         fft_file : calculates and writes FFT file from .adc data file.
 
+        fft_files : calculates and writes FFT files from many .adc data files at once (batched FFT).
+
         narrow_band_plot : plots file using Linear Lab Tools plot_channels function.
 
 To be continued::
@@ -31,11 +36,13 @@ import os
 # Third party imports
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from timeit import default_timer as timer
 
 # Local application imports
+from hdf5_store import hdf5_data_read
+from pscope_reader import read_pscope
 from ReceiverFFT import ReceiverFFT as rfft
+from ReceiverFFT.fft_engine import cube_spectra, DEFAULT_CHUNK_BYTES
 
 
 def narrow_band_data_read(file_name):
@@ -51,33 +58,13 @@ def narrow_band_data_read(file_name):
 
     Returns
     ----------
-    data : ndarray of int
-        2-D array with ADC output values, rows are samples and columns are separate channel
+    data : ndarray of float
+        2-D array with ADC output values or FFT magnitude in dBFS, rows are samples and columns are separate channel
+        (see pscope_reader module, truncated files are read up to their last complete row)
     """
 
-    extension = os.path.splitext(file_name)[1]
-
-    if extension == '.fft': #for .ffr files
-        #start = timer()
-        csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 2, header = None)
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
-        return data
-
-    else: # for .adc files (default)
-        #start = timer()
-        csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 6, header = None)
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
-        return data
+    data, _ = read_pscope(file_name, dtype = float)
+    return data
 
 def data_read(file_name):
     """Read narrow band system data file and return data and time/frequency arrays plus number of samples and sampling rate integers.
@@ -92,8 +79,8 @@ def data_read(file_name):
 
     Returns
     ----------
-    data : ndarray of int
-        2-D array with ADC output values, rows are samples and columns are separate channel
+    data : ndarray of float
+        2-D array with ADC output values or FFT magnitude in dBFS, rows are samples and columns are separate channel
     time: ndarray of float
         2-D array with time values for each ADC sample, rows are samples and columns are separate channel
         output for .adc input files only
@@ -106,34 +93,15 @@ def data_read(file_name):
         sampling rate in Msps
     """
 
-    extension = os.path.splitext(file_name)[1]
-
-    if extension == '.fft': #for .ffr files
-        #start = timer()
-        csv_reader1 = pd.read_csv(file_name, sep =',', skiprows = 1, nrows = 1, header = None, usecols = [2,3])
-        nsamples, srate = csv_reader1.to_numpy()[0]
-        csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 2, header = None)
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
+    data, info = read_pscope(file_name, dtype = float)
+    nsamples, srate = info.header_samples, info.sample_rate
+
+    if info.kind == "fft":
         freq = np.linspace(0,(srate*1e6)/2,len(data))
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
         return data, freq, nsamples, srate
 
-    else: # for .adc files (default)
-        #start = timer()
-        csv_reader1 = pd.read_csv(file_name, sep =',', skiprows = 4, nrows = 1, header = None, usecols = [2,6])
-        nsamples, srate = csv_reader1.to_numpy()[0]
-        csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 6, header = None)
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
+    else:
         time = np.linspace(0,len(data)/(srate*1e6),len(data))
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
         return data, time, nsamples, srate
 
 def fft_file(file_name, window = 'hann'):
@@ -159,6 +127,52 @@ def fft_file(file_name, window = 'hann'):
     print "FFT file saved"
     print "Duration of saving to .fft:", end - start
 
+def fft_files(file_names, window = 'hann', num_bits = 14, chunk_files = 1024, chunk_bytes = DEFAULT_CHUNK_BYTES, num_threads = 4):
+    """Calculate and write FFT files from .adc data files, computing the FFT of many captures at once.
+
+    New files are saved with same names except for .fft extension, with the values fft_file and the sweeps write
+    (see ReceiverFFT.fft_engine.cube_spectra). Files are processed by groups of chunk_files captures of the same size.
+
+    Parameters
+    ----------
+    file_names : list of str
+        file names and paths for .adc files in PScope format
+    window : str, optional
+        FFT window type, by default 'hann'
+    num_bits : int, optional
+        number of bits of the ADC in the receiver, by default 14
+    chunk_files : int, optional
+        number of files read before computing their FFT, by default 1024
+    chunk_bytes : int, optional
+        work memory of each FFT chunk, by default DEFAULT_CHUNK_BYTES (64 MiB)
+    num_threads : int, optional
+        number of threads computing the FFT, by default 4
+
+    Returns
+    ----------
+    list of str
+        .fft file paths written
+    """
+
+    written = []
+    start = timer()
+    for first in range(0, len(file_names), chunk_files):
+        groups = {}
+        for file_name in file_names[first:first + chunk_files]:
+            data = read_pscope(file_name)[0].T # [channels, samples], int16
+            groups.setdefault(data.shape, []).append((file_name, data))
+        for (num_channels, nsamples), captures in groups.items():
+            spectra = cube_spectra(np.stack([data for _, data in captures]), num_bits, window,
+                                    chunk_bytes = chunk_bytes, num_threads = num_threads)
+            for (file_name, _), capture_spectra in zip(captures, spectra):
+                output_file = file_name.replace(".adc",".fft")
+                rfft.save_fft_for_pscope(output_file, nsamples, *capture_spectra)
+                written.append(output_file)
+    end = timer()
+    print "FFT files saved:", len(written)
+    print "Duration of saving to .fft:", end - start
+    return written
+
 def narrow_band_plot(file_name, window = 'hann', num_bits = 14, verbose = False):
     """Plot file using Linear Lab Tools plot_channels function.
 
@@ -8,6 +8,7 @@
         Module for basic data manipulation of the narrow band system.
         The two main functions are narrow_band_data_read and data_read, the former outputs only the data
         while the latter also outputs number of samples, time/frequency arrays and sampling rate.
+        Both return float64 arrays; pscope_reader.read_pscope reads .adc files as int16 (4 times less memory).
 
 Functions::
 
@@ -15,6 +16,8 @@ Functions::
 
         data_read : reads narrow band system data file and returns data and time/frequency arrays plus number of samples and sampling rate.
 
+        hdf5_data_read : reads a selection of captures from an HDF5 sweep file, with the data_read outputs (from hdf5_store).
+
 Written by: Leonardo Fortaleza
 """
 # Standard library imports
@@ -23,10 +26,11 @@ import os
 # Third party imports
 #import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 #from timeit import default_timer as timer
 
 # Local application imports
+from hdf5_store import hdf5_data_read
+from pscope_reader import read_pscope
 #from ReceiverFFT import ReceiverFFT as rfft
 
 
@@ -43,41 +47,13 @@ def narrow_band_data_read(file_name):
 
     Returns
     ----------
-    data : ndarray of int
-        2-D array with ADC output values, rows are samples and columns are separate channel
+    data : ndarray of float
+        2-D array with ADC output values or FFT magnitude in dBFS, rows are samples and columns are separate channel
+        (see pscope_reader module, truncated files are read up to their last complete row)
     """
 
-    extension = os.path.splitext(file_name)[1]
-
-    if extension == '.fft': #for .ffr files
-        #start = timer()
-        try:
-            csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 2, header = None)
-        except:
-            print "\n C Engine Error in: ", file_name
-            csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 2, header = None, engine = 'python')
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
-        return data
-
-    else: # for .adc files (default)
-        #start = timer()
-        try:
-            csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 6, header = None)
-        except:
-            print "\n C Engine Error in: ", file_name
-            csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 6, header = None, engine = 'python')
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
-        return data
+    data, _ = read_pscope(file_name, dtype = float)
+    return data
 
 def data_read(file_name):
     """Read narrow band system data file and return data and time/frequency arrays plus number of samples and sampling rate integers.
@@ -92,8 +68,8 @@ def data_read(file_name):
 
     Returns
     ----------
-    data : ndarray of int
-        2-D array with ADC output values, rows are samples and columns are separate channel
+    data : ndarray of float
+        2-D array with ADC output values or FFT magnitude in dBFS, rows are samples and columns are separate channel
     time: ndarray of float
         2-D array with time values for each ADC sample, rows are samples and columns are separate channel
         output for .adc input files only
@@ -106,40 +82,13 @@ def data_read(file_name):
         sampling rate in Msps
     """
 
-    extension = os.path.splitext(file_name)[1]
-
-    if extension == '.fft': #for .ffr files
-        #start = timer()
-        try:
-            csv_reader1 = pd.read_csv(file_name, sep =',', skiprows = 1, nrows = 1, header = None, usecols = [2,3])
-        except:
-            print "\n C Engine Error in: ", file_name
-            csv_reader1 = pd.read_csv(file_name, sep =',', skiprows = 1, nrows = 1, header = None, usecols = [2,3], engine = 'python')
-        nsamples, srate = csv_reader1.to_numpy()[0]
-        csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 2, header = None)
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
-        freq = np.linspace(0,(srate*1e6)/2,len(data[:,1]))
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
+    data, info = read_pscope(file_name, dtype = float)
+    nsamples, srate = info.header_samples, info.sample_rate
+
+    if info.kind == "fft":
+        freq = np.linspace(0,(srate*1e6)/2,len(data))
         return data, freq, nsamples, srate
 
-    else: # for .adc files (default)
-        #start = timer()
-        try:
-            csv_reader1 = pd.read_csv(file_name, sep =',', skiprows = 4, nrows = 1, header = None, usecols = [2,6])
-        except:
-            print "\n C Engine Error in: ", file_name
-            csv_reader1 = pd.read_csv(file_name, sep =',', skiprows = 4, nrows = 1, header = None, usecols = [2,6], engine = 'python')
-        nsamples, srate = csv_reader1.to_numpy()[0]
-        csv_reader = pd.read_csv(file_name, sep = ',', skiprows = 6, header = None)
-        csv_reader.drop(csv_reader.tail(1).index,inplace=True)# droping last row "End", faster than read_csv with skipfooter = 'True'
-        data = csv_reader.to_numpy()
-        data = np.delete(data, axis = 1, obj = 1)# MUCH faster than using read_csv with sep = ', ,' due to engine = 'python'
-        data = data.astype(float)
-        time = np.linspace(0,len(data)/(srate*1e6),len(data[:,1]))
-        #end = timer()
-        #print "Duration:" , end-start, " seconds"
+    else:
+        time = np.linspace(0,len(data)/(srate*1e6),len(data))
         return data, time, nsamples, srate
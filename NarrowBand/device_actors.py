@@ -0,0 +1,284 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for executing the steps of a sweep plan on the devices of a rig (switching matrix, DC590B and receiver).
+
+        SequentialExecutor sets the pair, sets the frequency, waits for settling and collects, one command after the
+        other, as the sweep functions always did.
+
+        OverlappedExecutor runs each device as an independent actor, a thread executing the commands of that device
+        in submission order, so that the blocking serial writes on independent ports overlap:
+            - the pair switch and the frequency burst of a step are sent at the same time;
+            - the switch and burst of the next step are sent as soon as the receiver has sampled the current step,
+              while its data is still being transferred over USB (receivers with start_collect and read_collect,
+              i.e. system.Dc1513bAa and the virtual rig; otherwise as soon as collect returns).
+        Ordering guarantees: a capture starts only after the pair switch and the frequency burst of its step are
+        complete and settled (see settling module), and the devices are reconfigured for the next step only after
+        the current step has been sampled.
+
+        Main usage:
+
+        $ with OverlappedExecutor(rig.switch, fctrl, controller, settler, num_samples, TRIGGER_NONE) as executor:
+        $     for step, frames in executor.run(plan.steps):
+        $         ...                    # frames : list of num_frames (ch0, ch1) captures of step
+
+Class::
+        Completion : result of a command executed by a device actor.
+
+        DeviceActor : thread executing the commands of one device in submission order.
+
+        SequentialExecutor : executes sweep steps one command after the other.
+
+        OverlappedExecutor : executes sweep steps with one actor per device.
+"""
+# Standard library imports
+from collections import deque
+import Queue
+import sys
+import threading
+
+# Local application imports
+from settling import NULL_SETTLER
+from tracing import NULL_TRACER
+
+
+class Completion(object):
+    """Result of a command submitted to a DeviceActor."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._event.set()
+
+    def wait(self):
+        """Block until the command is complete and return its result, re-raising its exception if it failed."""
+        self._event.wait() # no timeout: Python 2 polls timed waits with sleeps of up to 50 ms
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class DeviceActor(object):
+    """Thread executing the commands of one device in submission order.
+
+    Parameters
+    ----------
+    name : str
+        device name, used as thread name (one track per device in Chrome traces)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target = self._run, name = name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue the call fn(*args, **kwargs), return its Completion."""
+        completion = Completion()
+        self._queue.put((completion, fn, args, kwargs))
+        return completion
+
+    def close(self):
+        """Execute the queued commands and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            completion, fn, args, kwargs = item
+            try:
+                completion.set_result(fn(*args, **kwargs))
+            except BaseException:
+                completion.set_exception(sys.exc_info())
+
+
+class SequentialExecutor(object):
+    """Execute sweep steps one command after the other: set pair, set frequency, settle, collect.
+
+    Parameters
+    ----------
+    switch : switching matrix
+        object with set_pair(TX, RX) (e.g. rig.switch)
+    fctrl : DC590B
+        synthesizer controller
+    controller : receiver
+        receiver controller with collect(num_samples, trigger)
+    settler : settling.Settler or None, optional
+        settling waits, by default None for NULL_SETTLER
+    num_samples : int, optional
+        number of samples per capture, by default 1024
+    trigger : int, optional
+        capture trigger, by default 0 (TRIGGER_NONE)
+    num_frames : int, optional
+        number of consecutive captures per step, by default 1
+    verbose : bool, optional
+        DC590B verbose output, by default False
+    tracer : tracing.Tracer, optional
+        tracer for the device spans, by default NULL_TRACER
+    """
+
+    def __init__(self, switch, fctrl, controller, settler = None, num_samples = 1024, trigger = 0, num_frames = 1,
+                    verbose = False, tracer = NULL_TRACER):
+        self.switch = switch
+        self.fctrl = fctrl
+        self.controller = controller
+        self.settler = settler if settler is not None else NULL_SETTLER
+        self.num_samples = num_samples
+        self.trigger = trigger
+        self.num_frames = num_frames
+        self.verbose = verbose
+        self.tracer = tracer
+        self.pair = None
+        self.freq = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, steps):
+        """Execute steps (sweep_plan.PlanStep), yielding (step, frames) in order, frames a list of (ch0, ch1)."""
+        for step in steps:
+            tags = dict(iter = step.iteration, tx = step.tx, rx = step.rx, freq = step.freq)
+            if step.pair != self.pair:
+                self._set_pair(step, tags)
+                self.pair = step.pair
+            if step.freq != self.freq:
+                self._freq_set(step, tags)
+                self.freq = step.freq
+            with self.tracer.span("settle", **tags):
+                self.settler.wait()
+            with self.tracer.span("collect", **tags):
+                frames = [self.controller.collect(self.num_samples, self.trigger) for _ in range(self.num_frames)]
+            yield step, frames
+
+    def _set_pair(self, step, tags):
+        with self.tracer.span("set_pair", **tags):
+            self.settler.set_pair(self.switch, step.tx, step.rx)
+
+    def _freq_set(self, step, tags):
+        with self.tracer.span("freq_set", **tags):
+            self.settler.freq_set(self.fctrl, step.freq, self.verbose, msg = step.burst)
+
+
+class OverlappedExecutor(SequentialExecutor):
+    """Execute sweep steps with one DeviceActor per device, overlapping the reconfiguration for the next step with
+    the data transfer of the current one (see module description).
+
+    Parameters are those of SequentialExecutor, plus:
+
+    lookahead : int, optional
+        maximum number of steps submitted ahead of the step being yielded, by default 2
+    """
+
+    def __init__(self, switch, fctrl, controller, settler = None, num_samples = 1024, trigger = 0, num_frames = 1,
+                    verbose = False, tracer = NULL_TRACER, lookahead = 2):
+        SequentialExecutor.__init__(self, switch, fctrl, controller, settler, num_samples, trigger, num_frames, verbose, tracer)
+        if lookahead < 1:
+            raise ValueError("lookahead must be at least 1, got {}.".format(lookahead))
+        self.lookahead = lookahead
+        self.split = hasattr(controller, "start_collect") and hasattr(controller, "read_collect")
+        self._actors = {}
+        for name in ("switch", "synthesizer", "receiver"):
+            self._actors[name] = DeviceActor(name)
+        self._sampled = None # Completion of the sampling of the last submitted step
+        self._closing = False
+
+    def close(self):
+        """Stop the actors, skipping the steps submitted but not yielded (e.g. when the sweep is interrupted)."""
+        self._closing = True
+        for actor in self._actors.values():
+            actor.close()
+
+    def run(self, steps):
+        """Execute steps (sweep_plan.PlanStep), yielding (step, frames) in order, frames a list of (ch0, ch1)."""
+        pending = deque()
+        for step in steps:
+            pending.append((step, self._submit(step)))
+            if len(pending) > self.lookahead:
+                step, done = pending.popleft()
+                yield step, done.wait()
+        while pending:
+            step, done = pending.popleft()
+            yield step, done.wait()
+
+    def _submit(self, step):
+        """Queue the reconfiguration and capture of step, return the Completion of its frames."""
+        tags = dict(iter = step.iteration, tx = step.tx, rx = step.rx, freq = step.freq)
+        after = self._sampled
+        configured = []
+        if step.pair != self.pair:
+            configured.append(self._actors["switch"].submit(self._after, after, self._set_pair, step, tags))
+        if step.freq != self.freq:
+            configured.append(self._actors["synthesizer"].submit(self._after, after, self._freq_set, step, tags))
+        sampled = Completion()
+        done = self._actors["receiver"].submit(self._capture, configured, sampled, tags)
+        self._sampled = sampled
+        self.pair, self.freq = step.pair, step.freq
+        return done
+
+    def _after(self, dependency, fn, step, tags):
+        """Wait for dependency (a Completion or None), then call fn(step, tags)."""
+        if dependency is not None:
+            dependency.wait()
+        self._check_open()
+        fn(step, tags)
+
+    def _check_open(self):
+        if self._closing:
+            raise RuntimeError("Executor closed before the step was executed.")
+
+    def _capture(self, configured, sampled, tags):
+        """Wait for the reconfiguration of the step and its settling, then collect num_frames captures.
+
+        sampled is completed once the last frame is sampled, before its data transfer, so that the other actors can
+        reconfigure the devices for the next step.
+        """
+        try:
+            for completion in configured:
+                completion.wait()
+            self._check_open()
+            with self.tracer.span("settle", **tags):
+                self.settler.wait()
+            frames = []
+            for k in range(self.num_frames):
+                if self.split:
+                    with self.tracer.span("acquire", **tags):
+                        self.controller.start_collect(self.num_samples, self.trigger)
+                    if k == self.num_frames - 1:
+                        sampled.set_result(None) # the devices can be reconfigured during the transfer
+                    with self.tracer.span("collect", **tags):
+                        frames.append(self.controller.read_collect())
+                else:
+                    with self.tracer.span("collect", **tags):
+                        frames.append(self.controller.collect(self.num_samples, self.trigger))
+        except BaseException:
+            if not sampled.done:
+                sampled.set_exception(sys.exc_info())
+            raise
+        if not sampled.done:
+            sampled.set_result(None)
+        return frames
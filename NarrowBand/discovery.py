@@ -0,0 +1,281 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for finding the serial ports of the DC590B and of the switching matrix quickly, on Windows (COMn) and
+        Linux (/dev/ttyACMn, /dev/ttyUSBn) alike.
+
+        Discovery works in three steps:
+            - the serial ports are enumerated once with serial.tools.list_ports (no COM0 to COM255 open attempts);
+            - the ports are matched by USB VID/PID (and serial number, if given) to each device kind; the ports that
+              need an ID query (DC590B) are probed in parallel, one thread per port, so that discovery takes about
+              one query timeout whatever the number of ports;
+            - the ports found are saved to a JSON cache file. On the next start, a cached port still enumerated with the
+              same USB identity is validated with a single ID query (switching matrix: identity only, its firmware has
+              no ID command) and used without probing the other ports.
+
+        Main usage:
+
+        $ discovery = Discovery()                        # cache in ~/.narrowband_devices.json
+        $ fsynth = DC590B(port = discovery.find("dc590b"))
+        $ swm.SwitchingMatrix(discovery.find("switching_matrix"))
+        $ discovery.find_all("dc590b")                   # all DC590B boards, e.g. for multi-rig sweeps
+        $ rig = HardwareRig()                            # system.HardwareRig uses find_port for the DC590B
+
+Class::
+        PortRecord : USB identity of an enumerated serial port.
+
+        DeviceSpec : matching rules and ID query of a device kind.
+
+        Discovery : enumerates, matches, probes and caches device ports.
+
+Functions::
+        find_port : returns the port of a device kind with the default Discovery.
+"""
+# Standard library imports
+from collections import namedtuple
+from datetime import datetime
+import json
+import os
+import threading
+
+# Third-party library imports
+import serial
+import serial.tools.list_ports
+
+# Local application imports
+from SwitchingMatrix import switching_matrix as swm
+from Transmitter_LTC6946 import ltc6946_serial as fsynth
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".narrowband_devices.json")
+
+
+class PortRecord(namedtuple("PortRecord", ["device", "vid", "pid", "serial_number", "description"])):
+    """USB identity of an enumerated serial port (vid, pid and serial_number are None for non-USB ports)."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_port_info(cls, info):
+        """Return the record of a serial.tools.list_ports ListPortInfo."""
+        return cls(info.device, info.vid, info.pid, info.serial_number, info.description or "")
+
+    def same_identity(self, other):
+        """Return True if other (a PortRecord) is the same USB device, possibly under another device name."""
+        return (self.vid, self.pid, self.serial_number) == (other.vid, other.pid, other.serial_number) and self.vid is not None
+
+
+class DeviceSpec(namedtuple("DeviceSpec", ["kind", "usb_ids", "description", "identify", "probe_unmatched"])):
+    """Matching rules and ID query of a device kind.
+
+    Attributes
+    ----------
+    kind : str
+        device kind, e.g. "dc590b"
+    usb_ids : tuple of tuple
+        (VID, PID) of the device
+    description : str or None
+        start of the port description of the device (fallback when the VID/PID is unknown)
+    identify : function or None
+        identify(com, timeout) returning True if the device answers its ID query on the open port com, None if the
+        device has no ID query (matched by USB identity only)
+    probe_unmatched : bool
+        set True to probe every port not claimed by another device kind when no port matches usb_ids or description
+    """
+
+    __slots__ = ()
+
+    def matches(self, record):
+        return ((record.vid, record.pid) in self.usb_ids
+                    or (self.description is not None and record.description.startswith(self.description)))
+
+SPECS = {"dc590b" : DeviceSpec("dc590b", fsynth.USB_IDS, None, fsynth.identify, True),
+            "switching_matrix" : DeviceSpec("switching_matrix", swm.USB_IDS, swm.DESCRIPTION, None, False)}
+
+
+class Discovery(object):
+    """Enumerate the serial ports once, match and probe them for each device kind, and cache the ports found.
+
+    Parameters
+    ----------
+    cache_file : str or None, optional
+        JSON cache of the ports found, by default DEFAULT_CACHE_FILE, None for no cache
+    timeout : float, optional
+        ID query timeout in seconds, by default 0.5
+    specs : dict or None, optional
+        {kind : DeviceSpec}, by default None for SPECS
+    comports : function or None, optional
+        function returning the serial.tools.list_ports ListPortInfo (or PortRecord) of the ports, by default None for
+        serial.tools.list_ports.comports (e.g. emulated ports)
+    open_port : function or None, optional
+        open_port(device, timeout) returning an open serial port, by default None for serial.Serial at 9600 baud
+    """
+
+    def __init__(self, cache_file = DEFAULT_CACHE_FILE, timeout = 0.5, specs = None, comports = None, open_port = None):
+        self.cache_file = cache_file
+        self.timeout = timeout
+        self.specs = specs if specs is not None else SPECS
+        self._comports = comports if comports is not None else serial.tools.list_ports.comports
+        self._open_port = open_port if open_port is not None else _open_serial
+        self.stats = {"enumerations" : 0, "probes" : 0, "cache_hits" : 0}
+        self._ports = None
+        self._found = {}
+        self._lock = threading.Lock()
+
+    def ports(self, refresh = False):
+        """Return the PortRecord of every serial port, enumerated once (again if refresh)."""
+        with self._lock:
+            if self._ports is None or refresh:
+                self._ports = [info if isinstance(info, PortRecord) else PortRecord.from_port_info(info) for info in self._comports()]
+                self.stats["enumerations"] += 1
+            return list(self._ports)
+
+    def find(self, kind, serial_number = None):
+        """Return the port (device name) of a device of kind, the cached port if it is still valid.
+
+        Parameters
+        ----------
+        kind : str
+            device kind in specs, e.g. "dc590b" or "switching_matrix"
+        serial_number : str or None, optional
+            USB serial number of the device, by default None for any device of kind
+
+        Raises
+        ------
+        IOError
+            if no device of kind (with serial_number) is found
+        """
+        spec = self._spec(kind)
+        for record in self._cached(kind):
+            if serial_number is not None and record.serial_number != serial_number:
+                continue
+            current = self._current(record)
+            if current is not None and self._validate(spec, current):
+                self.stats["cache_hits"] += 1
+                return current.device
+        found = [record for record in self.find_all(kind) if serial_number is None or record.serial_number == serial_number]
+        if not found:
+            raise IOError("No {} found{}.".format(kind, "" if serial_number is None else " with serial number " + serial_number))
+        return found[0].device
+
+    def find_all(self, kind):
+        """Return the PortRecord of every device of kind, probing the candidate ports in parallel, and update the cache."""
+        spec = self._spec(kind)
+        ports = self.ports()
+        candidates = [record for record in ports if spec.matches(record)]
+        if not candidates and spec.probe_unmatched:
+            claimed = [other for other in self.specs.values() if other.kind != kind]
+            candidates = [record for record in ports if not any(other.matches(record) for other in claimed)]
+        if spec.identify is not None:
+            answers = self._probe(spec, candidates)
+            candidates = [record for record, answer in zip(candidates, answers) if answer]
+        self._found[kind] = candidates
+        self._save()
+        return candidates
+
+    def clear_cache(self):
+        """Forget the ports found and delete the cache file."""
+        self._found = {}
+        if self.cache_file is not None and os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def _spec(self, kind):
+        try:
+            return self.specs[kind]
+        except KeyError:
+            raise ValueError("Unknown device kind {}, expected one of {}.".format(kind, sorted(self.specs)))
+
+    def _cached(self, kind):
+        if kind in self._found:
+            return self._found[kind]
+        cache = self._load()
+        return [PortRecord(**dict((str(key), value) for key, value in record.items())) for record in cache.get(kind, [])]
+
+    def _current(self, record):
+        """Return the enumerated port of the cached record: same device name and identity, else same USB identity."""
+        ports = self.ports()
+        for port in ports:
+            if port.device == record.device and (port.vid, port.pid, port.serial_number) == (record.vid, record.pid, record.serial_number):
+                return port
+        for port in ports:
+            if port.same_identity(record):
+                return port
+        return None
+
+    def _validate(self, spec, record):
+        if spec.identify is None:
+            return True
+        return self._probe(spec, [record])[0]
+
+    def _probe(self, spec, records):
+        """Run the ID query of spec on every record at once, return the list of answers (True if identified)."""
+        answers = [False] * len(records)
+        def probe(n, record):
+            try:
+                com = self._open_port(record.device, self.timeout)
+            except Exception:
+                return
+            try:
+                answers[n] = spec.identify(com, self.timeout)
+            except Exception:
+                pass
+            finally:
+                com.close()
+        threads = [threading.Thread(target = probe, args = (n, record), name = record.device) for n, record in enumerate(records)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats["probes"] += len(records)
+        return answers
+
+    def _load(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as fp:
+                return json.load(fp)
+        except (IOError, ValueError):
+            return {}
+
+    def _save(self):
+        if self.cache_file is None:
+            return
+        cache = self._load()
+        cache.update((kind, [record._asdict() for record in records]) for kind, records in self._found.items())
+        cache["created"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            with open(self.cache_file, 'w') as fp:
+                json.dump(cache, fp, sort_keys=True, indent=4)
+        except IOError:
+            pass # the cache only saves time
+
+
+def _open_serial(device, timeout):
+    return serial.Serial(device, 9600, timeout = timeout, write_timeout = timeout)
+
+_default = None
+
+def find_port(kind, serial_number = None):
+    """Return the port of a device of kind (see Discovery.find) with a shared Discovery using the default cache file."""
+    global _default
+    if _default is None:
+        _default = Discovery()
+    return _default.find(kind, serial_number)
+
+
+if __name__ == '__main__':
+
+    from timeit import default_timer as timer
+
+    discovery = Discovery()
+    for kind in sorted(discovery.specs):
+        start = timer()
+        try:
+            port = discovery.find(kind)
+        except IOError as error:
+            port = error
+        print("{0}: {1} ({2:.2f} s)".format(kind, port, timer() - start))
+    print(discovery.stats)
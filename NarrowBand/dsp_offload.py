@@ -0,0 +1,206 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for offloading the FFT of captures to a pool of worker processes, so that recording .fft files
+        does not stall the acquisition loop.
+
+        Captures are copied once into a preallocated shared memory ring (one slot per capture in flight).
+        Worker processes read the slot in place, compute the dBFS spectra into a shared spectrum ring and only
+        return a few derived metrics, so no sample arrays are pickled between processes.
+        A slot is reused only after its spectra were written to disk, which bounds memory and provides backpressure.
+
+        Main usage:
+
+        $ with DspOffload(num_samples, num_workers = 2) as dsp:
+        $     job = dsp.submit(ch0, ch1)           # returns right after copying the capture to shared memory
+        $     spectra, metrics = job.result()      # blocks until the worker finished, spectra is a shared memory view
+        $     job.release()                        # slot can be reused
+
+        On Windows, worker processes re-import the main script. Scripts using the offload must keep their
+        measurement calls under an "if __name__ == '__main__':" guard.
+
+Class::
+        CaptureRing : preallocated shared memory slots for captures and their spectra.
+
+        DspOffload : process pool computing FFT spectra and metrics of captures placed in a CaptureRing.
+
+        DspJob : handle for one submitted capture.
+"""
+# Standard library imports
+import multiprocessing
+from multiprocessing import sharedctypes
+import Queue
+
+# Third-party imports
+import numpy as np
+
+# Local application imports
+from ReceiverFFT import ReceiverFFT as rfft
+
+
+class CaptureRing(object):
+    """Preallocated shared memory ring with num_slots capture slots (int16) and matching spectrum slots (float64).
+
+    Parameters
+    ----------
+    num_slots : int
+        number of captures that can be in flight at the same time
+    num_channels : int
+        number of receiver channels per capture
+    num_samples : int
+        number of samples per channel
+    """
+
+    def __init__(self, num_slots, num_channels, num_samples):
+        self.num_slots = num_slots
+        self.num_channels = num_channels
+        self.num_samples = num_samples
+        self.num_bins = num_samples//2 + 1
+
+        self.capture_buffer = sharedctypes.RawArray('h', num_slots * num_channels * num_samples)
+        self.spectrum_buffer = sharedctypes.RawArray('d', num_slots * num_channels * self.num_bins)
+        self.captures, self.spectra = _ring_views(self.capture_buffer, self.spectrum_buffer, self.shape)
+
+        self._free = Queue.Queue()
+        for slot in range(num_slots):
+            self._free.put(slot)
+
+    @property
+    def shape(self):
+        return (self.num_slots, self.num_channels, self.num_samples)
+
+    def acquire(self):
+        """Return the index of a free slot, blocking until one is released."""
+        return self._free.get()
+
+    def release(self, slot):
+        """Return slot to the free list."""
+        self._free.put(slot)
+
+
+class DspJob(object):
+    """Handle for one capture submitted to a DspOffload pool."""
+
+    def __init__(self, ring, slot, num_channels, async_result):
+        self._ring = ring
+        self._async = async_result
+        self.slot = slot
+        self.num_channels = num_channels
+        self.metrics = None
+
+    def result(self):
+        """Wait for the worker and return (spectra, metrics).
+
+        spectra is a [channels, num_samples/2 + 1] view of the shared spectrum slot in dBFS, valid until release() is called.
+        metrics is a list with one dictionary per channel (see _capture_metrics).
+        """
+        if self.metrics is None:
+            self.metrics = self._async.get()
+        return self._ring.spectra[self.slot, :self.num_channels], self.metrics
+
+    def release(self):
+        """Free the shared memory slot of this capture."""
+        if self.slot is not None:
+            self._ring.release(self.slot)
+            self.slot = None
+
+
+class DspOffload(object):
+    """Pool of worker processes computing dBFS spectra and metrics of captures.
+
+    Parameters
+    ----------
+    num_samples : int
+        number of samples per channel
+    num_channels : int, optional
+        number of receiver channels per capture, by default 2
+    num_bits : int, optional
+        number of bits on the receiver ADC, by default 14
+    window : str, optional
+        FFT window type (see fft_window module), by default 'hann'
+    num_workers : int, optional
+        number of worker processes, by default 2
+    num_slots : int or None, optional
+        number of shared memory slots, by default None for 4 slots per worker
+    """
+
+    def __init__(self, num_samples, num_channels = 2, num_bits = 14, window = 'hann', num_workers = 2, num_slots = None):
+        if num_slots is None:
+            num_slots = 4 * num_workers
+        self.num_bits = num_bits
+        self.window = window
+        self.ring = CaptureRing(num_slots, num_channels, num_samples)
+        self._pool = multiprocessing.Pool(num_workers, initializer = _init_worker,
+                                            initargs = (self.ring.capture_buffer, self.ring.spectrum_buffer, self.ring.shape))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def submit(self, *data):
+        """Copy one capture (one argument per channel) to a free shared memory slot and queue its FFT, return a DspJob."""
+        slot = self.ring.acquire()
+        captures = self.ring.captures[slot]
+        for ch, channel_data in enumerate(data):
+            captures[ch, :] = channel_data
+        async_result = self._pool.apply_async(_process_slot, (slot, len(data), self.num_bits, self.window))
+        return DspJob(self.ring, slot, len(data), async_result)
+
+    def close(self):
+        """Wait for the workers to finish pending jobs and stop them."""
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """Stop the workers immediately, discarding pending jobs."""
+        self._pool.terminate()
+        self._pool.join()
+
+
+def _ring_views(capture_buffer, spectrum_buffer, shape):
+    """Return numpy views [slots, channels, samples] and [slots, channels, bins] of the shared buffers."""
+    num_slots, num_channels, num_samples = shape
+    captures = np.frombuffer(capture_buffer, dtype = np.int16).reshape(shape)
+    spectra = np.frombuffer(spectrum_buffer, dtype = np.float64).reshape((num_slots, num_channels, num_samples//2 + 1))
+    return captures, spectra
+
+_worker_views = None
+
+def _init_worker(capture_buffer, spectrum_buffer, shape):
+    global _worker_views
+    _worker_views = _ring_views(capture_buffer, spectrum_buffer, shape)
+
+def _process_slot(slot, num_channels, num_bits, window):
+    """Worker task: compute spectra of the capture in slot in place and return its metrics."""
+    captures, spectra = _worker_views
+    data = captures[slot, :num_channels]
+    spectra[slot, :num_channels] = rfft.fft_channels(num_bits, data.shape[1], window, *data)
+    return _capture_metrics(data, spectra[slot, :num_channels], num_bits)
+
+def _capture_metrics(data, spectra, num_bits):
+    """Return a list with one dictionary of derived metrics per channel.
+
+    Keys: "dc" (mean code), "rms" (AC RMS in codes), "min_code", "max_code", "clipped" (True if a full scale code
+    was reached), "peak_bin" and "peak_dbfs" (largest FFT bin, excluding DC).
+    """
+    full_scale = 2**(num_bits-1)
+    metrics = []
+    for channel_data, spectrum in zip(data, spectra):
+        peak_bin = int(np.argmax(spectrum[1:])) + 1
+        min_code = int(channel_data.min())
+        max_code = int(channel_data.max())
+        metrics.append({"dc" : float(channel_data.mean()),
+                        "rms" : float(channel_data.std()),
+                        "min_code" : min_code,
+                        "max_code" : max_code,
+                        "clipped" : min_code <= -full_scale or max_code >= full_scale - 1,
+                        "peak_bin" : peak_bin,
+                        "peak_dbfs" : float(spectrum[peak_bin])})
+    return metrics
@@ -0,0 +1,394 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for estimating the duration of a sweep before it starts and while it runs, from a cost model corrected
+        by the step durations observed in previous sweeps.
+
+        Steps are classed by the devices they drive: "capture" (same pair and frequency as the previous step),
+        "switch" (pair change), "retune" (frequency change) and "switch+retune". For each class, the learned cost model
+        keeps the total observed and predicted (scheduler.CostModel) step durations of previous sweeps, and scales the
+        CostModel prediction of a step by their ratio. Learned costs are saved per profile (the rig type and the sweep
+        settings changing the step durations, see profile_key) in a JSON file chosen by the caller (e.g. next to the
+        measurement configuration, the costs_file parameter of system.sweep), with the mean setup time (from the sweep call to the first step: plan compilation, device opening, FPGA load).
+
+        While the sweep runs, EtaTracker blends the prediction of the remaining steps with the step durations observed
+        so far, class by class, so that the ETA converges to the actual rate of the rig instead of the prior.
+        When the estimate exceeds a time budget, trim_options lists the largest plans fitting it (fewer iterations,
+        or an evenly spaced subset of the frequencies).
+
+        Main usage:
+
+        $ estimate = nbsys.sweep(meas_parameters, dry_run = True, budget = 600)   # prints the breakdown, no device opened
+        $ print estimate.total, estimate.stages, estimate.options
+        $ nbsys.sweep(meas_parameters, budget = 600, trim = "ask")                # live ETA, offers to trim if late
+
+Class::
+        LearnedCostModel : CostModel scaled by the step durations observed in previous sweeps.
+
+        EtaTracker : ETA of the remaining steps of a running sweep.
+
+        Estimate : predicted sweep duration with its breakdown.
+
+        TrimOption : reduced plan fitting a time budget.
+
+Functions::
+        step_class : class of a step from the previous one.
+
+        profile_key : learned cost profile of a rig and sweep settings.
+
+        estimate : predicted duration of a list of steps.
+
+        trim_options : reduced plans fitting a time budget.
+
+        choose_trim : offers the trim options (prompt, automatic or warning).
+
+        format_duration : h:mm:ss (or seconds) string of a duration.
+"""
+# Standard library imports
+from collections import namedtuple
+from datetime import datetime
+import json
+import os
+import sys
+
+# Local application imports
+from scheduler import CostModel, STAGES, predict_stages, schedule
+
+STEP_CLASSES = ("capture", "switch", "retune", "switch+retune")
+MAX_COUNT = 1000    # observations kept per class, older sweeps fading out beyond
+TRIM_MODES = ("ask", "trim", "warn")
+
+
+def step_class(from_pair, from_freq, to_pair, to_freq):
+    """Return the class of a step to (to_pair, to_freq) after a step at (from_pair, from_freq) (None at start)."""
+    if to_pair != from_pair:
+        return "switch+retune" if to_freq != from_freq else "switch"
+    return "retune" if to_freq != from_freq else "capture"
+
+def profile_key(rig, **settings):
+    """Return the learned cost profile of rig (device factory, or list of) with the sweep settings, e.g.
+    "HardwareRig fast_hop=False num_frames=1 overlap=False"."""
+    rigs = list(rig) if isinstance(rig, (list, tuple)) else [rig]
+    names = sorted(set(type(device).__name__ for device in rigs))
+    return " ".join(["+".join(names)] + ["{}={}".format(key, settings[key]) for key in sorted(settings)])
+
+
+class LearnedCostModel(CostModel):
+    """CostModel (fallback) with the step cost of each class scaled by the ratio of the observed to the predicted step
+    durations of previous sweeps.
+
+    Parameters
+    ----------
+    fallback : scheduler.CostModel or None, optional
+        operation costs and settling model predicting each step, by default None for CostModel() defaults
+    classes : dict or None, optional
+        {class : {"observed", "predicted", "count"}} total observed and predicted durations in seconds and number of
+        steps of each class in STEP_CLASSES, by default None (nothing learned, fallback costs)
+    setup : dict or None, optional
+        {"mean", "count"} setup time in seconds, by default None (0 s)
+    """
+
+    def __init__(self, fallback = None, classes = None, setup = None):
+        fallback = fallback if fallback is not None else CostModel()
+        CostModel.__init__(self, fallback.retune, fallback.switch, fallback.capture, fallback.step, fallback.lock_per_mhz,
+                            fallback.settling)
+        self.fallback = fallback
+        self.classes = dict((cls, dict(classes[cls])) for cls in classes or {} if cls in STEP_CLASSES)
+        self.setup = dict(setup) if setup else {"mean" : 0.0, "count" : 0}
+
+    def scale(self, cls):
+        """Return the observed / predicted duration ratio of class cls, 1.0 if not learned."""
+        learned = self.classes.get(cls)
+        if not learned or learned["predicted"] <= 0:
+            return 1.0
+        return learned["observed"] / learned["predicted"]
+
+    def stage_costs(self, from_pair, from_freq, to_pair, to_freq):
+        scale = self.scale(step_class(from_pair, from_freq, to_pair, to_freq))
+        return dict((stage, value * scale) for stage, value in
+                        self.fallback.stage_costs(from_pair, from_freq, to_pair, to_freq).items())
+
+    def learn(self, observations, setup = None):
+        """Add the step observations of a sweep, {class : (observed, predicted, count)} (see EtaTracker.observations),
+        and its setup time, keeping at most MAX_COUNT steps per class (older ones scaled down)."""
+        for cls, (observed, predicted, count) in observations.items():
+            if count == 0:
+                continue
+            learned = self.classes.setdefault(cls, {"observed" : 0.0, "predicted" : 0.0, "count" : 0})
+            learned["observed"] += observed
+            learned["predicted"] += predicted
+            learned["count"] += count
+            if learned["count"] > MAX_COUNT:
+                fade = float(MAX_COUNT) / learned["count"]
+                learned["observed"] *= fade
+                learned["predicted"] *= fade
+                learned["count"] = MAX_COUNT
+        if setup is not None:
+            count = min(self.setup["count"], MAX_COUNT - 1)
+            self.setup = {"mean" : (self.setup["mean"] * count + setup) / (count + 1), "count" : count + 1}
+
+    def save(self, file_path, profile):
+        """Save the learned costs of profile to a JSON file, keeping the other profiles of the file."""
+        costs = _load_costs(file_path)
+        costs.setdefault("profiles", {})[profile] = {"classes" : self.classes, "setup" : self.setup}
+        costs["created"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(file_path, 'w') as fp:
+            json.dump(costs, fp, sort_keys=True, indent=4)
+
+    @classmethod
+    def load(cls, file_path, profile, fallback = None):
+        """Return the learned costs of profile saved in a JSON file, nothing learned if the file or profile is missing."""
+        learned = _load_costs(file_path).get("profiles", {}).get(profile, {})
+        return cls(fallback, learned.get("classes"), learned.get("setup"))
+
+
+class EtaTracker(object):
+    """ETA of the remaining steps of a running sweep.
+
+    Each step is predicted with cost_model (divided by the number of rigs sharing the steps). The predictions of a class
+    are scaled by the ratio of the observed to the predicted durations of the steps of that class completed so far,
+    shrunk towards the ratio of all classes (and that one towards 1) by prior_weight steps matching the prediction.
+
+    Parameters
+    ----------
+    points : sequence of tuple
+        (iteration, pair, freq) of the remaining steps, in acquisition order
+    cost_model : scheduler.CostModel
+        operation costs (a LearnedCostModel also records its fallback predictions for learning)
+    rigs : int, optional
+        number of rigs sharing the steps, by default 1
+    prior_weight : float, optional
+        number of steps the prediction weighs against the observations, by default 5.0
+    start : tuple or None, optional
+        (pair, freq) before the first point, by default None (devices not set)
+    """
+
+    def __init__(self, points, cost_model, rigs = 1, prior_weight = 5.0, start = None):
+        self.rigs = rigs
+        self.prior_weight = prior_weight
+        base = getattr(cost_model, "fallback", cost_model)
+        self._steps = {}
+        pair, freq = start if start is not None else (None, None)
+        for j, to_pair, to_freq in points:
+            to_pair = tuple(to_pair)
+            self._steps[(j, to_pair[0], to_pair[1], to_freq)] = (step_class(pair, freq, to_pair, to_freq),
+                                                                    cost_model.cost(pair, freq, to_pair, to_freq) / rigs,
+                                                                    base.cost(pair, freq, to_pair, to_freq) / rigs)
+            pair, freq = to_pair, to_freq
+        self.total = len(self._steps)
+        self._remaining = dict((cls, 0.0) for cls in STEP_CLASSES)
+        self._counts = dict((cls, 0) for cls in STEP_CLASSES)
+        for cls, prior, _ in self._steps.values():
+            self._remaining[cls] += prior
+            self._counts[cls] += 1
+        self._observed = dict((cls, [0.0, 0.0, 0.0, 0]) for cls in STEP_CLASSES) # observed, prior, base prediction, count
+
+    @property
+    def remaining(self):
+        """Number of steps left."""
+        return len(self._steps)
+
+    def observe(self, key, duration):
+        """Record the duration in seconds of the step key (iteration, Tx, Rx, freq), from the end of the previous step."""
+        cls, prior, base = self._steps.pop(key)
+        self._remaining[cls] -= prior
+        self._counts[cls] -= 1
+        observed = self._observed[cls]
+        observed[0] += duration
+        observed[1] += prior
+        observed[2] += base
+        observed[3] += 1
+
+    def discard(self, keys):
+        """Drop the steps keys from the remaining steps (e.g. iterations trimmed from the plan)."""
+        for key in keys:
+            if key in self._steps:
+                cls, prior, _ = self._steps.pop(key)
+                self._remaining[cls] -= prior
+                self._counts[cls] -= 1
+
+    def ratio(self, cls = None):
+        """Return the observed / predicted duration ratio of class cls (None for all classes), shrunk by prior_weight."""
+        observed = sum(values[0] for values in self._observed.values())
+        prior = sum(values[1] for values in self._observed.values())
+        count = sum(values[3] for values in self._observed.values())
+        mean = prior / count if count else 1.0
+        overall = (self.prior_weight * mean + observed) / (self.prior_weight * mean + prior) if prior > 0 else 1.0
+        if cls is None:
+            return overall
+        observed, prior, _, count = self._observed[cls]
+        if count == 0 or prior <= 0:
+            return overall
+        mean = prior / count
+        return (self.prior_weight * mean * overall + observed) / (self.prior_weight * mean + prior)
+
+    def eta(self):
+        """Return the predicted time in seconds to complete the remaining steps."""
+        return sum(max(self._remaining[cls], 0.0) * self.ratio(cls) for cls in STEP_CLASSES if self._counts[cls] > 0)
+
+    def observations(self):
+        """Return {class : (observed, predicted, count)} of the completed steps, per rig (observed and fallback predicted
+        durations multiplied by rigs), for LearnedCostModel.learn."""
+        return dict((cls, (values[0] * self.rigs, values[2] * self.rigs, values[3]))
+                        for cls, values in self._observed.items() if values[3] > 0)
+
+
+class Estimate(namedtuple("Estimate", ["order", "steps", "rigs", "setup", "total", "stages", "candidates", "budget", "options"])):
+    """Predicted sweep duration.
+
+    Attributes
+    ----------
+    order : str
+        scheduler ordering the steps
+    steps : int
+        number of steps
+    rigs : int
+        number of rigs sharing the steps
+    setup : float
+        learned setup time in seconds
+    total : float
+        predicted duration in seconds, setup included
+    stages : dict
+        {stage : seconds} of the steps (see scheduler.STAGES), divided by the number of rigs
+    candidates : dict
+        {order : predicted duration of the steps} of the schedulers evaluated
+    budget : float or None
+        time budget in seconds
+    options : list of TrimOption
+        reduced plans fitting the budget, empty without budget or when the plan fits
+    """
+
+    __slots__ = ()
+
+    def report(self):
+        """Return the breakdown as text."""
+        lines = ["Estimate: {0:d} steps ({1}) on {2:d} rig(s) - {3}".format(self.steps, self.order, self.rigs, format_duration(self.total)),
+                    "    {0:<8} {1:>10}".format("setup", format_duration(self.setup))]
+        lines.extend("    {0:<8} {1:>10} ({2:4.1f} %)".format(stage, format_duration(self.stages[stage]),
+                        100.0 * self.stages[stage] / self.total if self.total > 0 else 0.0) for stage in STAGES)
+        if self.budget is not None:
+            lines.append("Budget {0}: {1}".format(format_duration(self.budget),
+                            "fits" if self.total <= self.budget else "exceeded by " + format_duration(self.total - self.budget)))
+            lines.extend("    {0:d}) {1} - {2}".format(n + 1, option.description, format_duration(option.predicted))
+                            for n, option in enumerate(self.options))
+        return "\n".join(lines)
+
+
+class TrimOption(namedtuple("TrimOption", ["description", "iterations", "freq_range", "predicted"])):
+    """Reduced plan fitting a time budget: iterations (number) and freq_range (tuple of str) of the reduced plan, and its
+    predicted duration in seconds."""
+
+    __slots__ = ()
+
+
+def estimate(points, cost_model, rigs = 1, order = None, candidates = None, budget = None, options = ()):
+    """Return the Estimate of the (iteration, pair, freq) points, in order, with cost_model (setup time of a
+    LearnedCostModel included)."""
+    stages = dict((stage, value / rigs) for stage, value in predict_stages(points, cost_model).items())
+    setup = getattr(cost_model, "setup", {}).get("mean", 0.0)
+    return Estimate(order, len(points), rigs, setup, setup + sum(stages.values()), stages, candidates or {}, budget, list(options))
+
+def trim_options(pairs, freq_range, iterations, order, cost_model, budget, rigs = 1):
+    """Return the TrimOption fitting budget (seconds): the most iterations of the full frequency range, and the largest
+    evenly spaced subset of freq_range (first and last frequencies kept) for all iterations, when they exist."""
+    setup = getattr(cost_model, "setup", {}).get("mean", 0.0)
+    predicted = lambda ite, freqs: setup + schedule(pairs, freqs, ite, order, cost_model)[2] / rigs
+    options = []
+    fitting = [ite for ite in range(iterations - 1, 0, -1) if predicted(ite, freq_range) <= budget]
+    if fitting:
+        options.append(TrimOption("{0:d} iteration(s) instead of {1:d}".format(fitting[0], iterations), fitting[0],
+                                    tuple(freq_range), predicted(fitting[0], freq_range)))
+    for size in range(len(freq_range) - 1, 1, -1):
+        freqs = tuple(freq_range[int(round(k * (len(freq_range) - 1.0) / (size - 1)))] for k in range(size))
+        duration = predicted(iterations, freqs)
+        if duration <= budget:
+            options.append(TrimOption("{0:d} frequencies instead of {1:d} ({2} to {3} MHz)".format(size, len(freq_range),
+                                        freqs[0], freqs[-1]), iterations, freqs, duration))
+            break
+    return options
+
+def choose_trim(options, mode = "ask", write = None):
+    """Offer the trim options, return the chosen TrimOption or None to keep the plan.
+
+    Parameters
+    ----------
+    options : list of TrimOption
+        reduced plans
+    mode : str, optional
+        "ask" to prompt for a choice on the terminal ("warn" when the input is not a terminal), "trim" for the first
+        option, "warn" to print the options and keep the plan, by default "ask"
+    write : function or None, optional
+        function printing a line, by default None for print (e.g. tqdm.write while a progress bar is shown)
+
+    Raises
+    ------
+    ValueError
+        for an unknown mode
+    """
+    if mode not in TRIM_MODES:
+        raise ValueError("trim must be one of {}, got {}.".format(TRIM_MODES, mode))
+    write = write if write is not None else _print
+    if not options:
+        write("No reduced plan fits the time budget.")
+        return None
+    for n, option in enumerate(options):
+        write("    {0:d}) {1} - {2}".format(n + 1, option.description, format_duration(option.predicted)))
+    if mode == "trim":
+        write("Trimmed to: " + options[0].description)
+        return options[0]
+    if mode == "ask" and sys.stdin is not None and sys.stdin.isatty():
+        answer = raw_input("Trim the plan? Option number, or Enter to keep it: ").strip()
+        if answer.isdigit() and 1 <= int(answer) <= len(options):
+            return options[int(answer) - 1]
+    return None
+
+def format_duration(seconds):
+    """Return seconds as "h:mm:ss", e.g. "1:02:05", or "12.3 s" under a minute."""
+    if seconds < 59.95:
+        return "{0:.1f} s".format(max(seconds, 0.0))
+    seconds = int(round(seconds))
+    return "{0:d}:{1:02d}:{2:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def _load_costs(file_path):
+    if file_path is None or not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r') as fp:
+            return json.load(fp)
+    except (IOError, ValueError):
+        return {}
+
+def _print(line):
+    print(line)
+
+
+if __name__ == '__main__':
+
+    # Estimate a sweep on the virtual rig before and after learning its step costs, then run it with a budget.
+
+    import tempfile
+
+    import system as nbsys
+    from virtual_rig import VirtualRig, RigLatencies, SignalModel
+
+    root = tempfile.mkdtemp()
+    costs_file = os.path.join(root, "costs.json")
+    def meas_parameters():
+        return {"num_samples" : 256, "spi_registers" : [], "verbose" : False, "fft_window" : "hann",
+                "data_file" : os.path.join(root, "DATE/Iter ITE/ANTPAIR FREQMHz.adc"), "cal_data_file" : None,
+                "cal_fft_file" : None, "date" : "virtual", "Phantom" : 1, "Angle" : 0, "Plug" : 2, "rep" : 1, "iter" : 3,
+                "freq_range" : ["2000", "2050", "2100", "2150", "2200"], "pairs" : [(1,2), (2,3), (3,4)],
+                "system" : "narrow band", "type" : "measurement configuration parameters"}
+    rig = lambda: VirtualRig(RigLatencies(fpga_load = 0.0, port_open = 0.0, time_scale = 0.3), SignalModel(seed = 0))
+
+    for run in range(2):
+        nbsys.sweep(meas_parameters(), rig = rig(), dry_run = True, costs_file = costs_file)
+        parameters = meas_parameters()
+        nbsys.sweep(parameters, rig = rig(), save_json = False, journal = False, costs_file = costs_file)
+        print("Achieved {}".format(format_duration(parameters["schedule"]["setup"] + parameters["schedule"]["achieved"])))
+    parameters = meas_parameters()
+    nbsys.sweep(parameters, rig = rig(), save_json = False, journal = False, costs_file = costs_file, budget = 0.5,
+                trim = "trim")
+    print("Trimmed: {0}, achieved {1}".format(parameters.get("trimmed"), format_duration(parameters["schedule"]["achieved"])))
@@ -0,0 +1,347 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for storing a whole sweep in a single HDF5 file, instead of one PScope text file per capture.
+
+        The captures are kept in a chunked dataset indexed by [iteration, pair, frequency, channel, sample], with one
+        chunk per capture, so that any capture (or any slice by pair or frequency) is read without loading the rest.
+        Each capture is written as soon as it is acquired, with its acquisition time in the "timestamp" dataset
+        ([iteration, pair, frequency], seconds since the epoch, NaN for points not captured yet).
+        The full meas_parameters dictionary is kept as JSON in the "meas_parameters" file attribute, and is updated
+        during the sweep.
+
+        File layout:
+            "adc" : int16 time domain samples (float32 for averaged captures, see averaging module)
+            "fft" : float32 FFT magnitude in dBFS, [iteration, pair, frequency, channel, bin] (only with do_FFT)
+            "adc_var" or "fft_var" : float32 variance of averaged captures (only with num_frames > 1)
+            "timestamp" : float64 acquisition time of each capture
+            "pairs" : [pair, (Tx, Rx)] antenna pair numbers
+            "freq_range" : frequency strings in MHz, as in meas_parameters["freq_range"]
+            attributes "meas_parameters", "num_bits", "is_bipolar", "sample_rate" (Msps), "layout", "created" and "version"
+
+        Main usage:
+
+        $ with SweepStore(file_path, meas_parameters, do_FFT = True) as store:
+        $     store.write((j, TX, RX, f_cur), (ch0, ch1))
+        $ data, info = read_sweep(file_path, pairs = [(1, 2)], freqs = ["2000"])
+
+Class::
+        SweepStore : HDF5 container of the captures of a sweep.
+
+Functions::
+        read_sweep : reads a selection of captures by iteration, pair and frequency.
+
+        read_sweep_info : reads the sweep parameters, pairs, frequencies and timestamps.
+
+        hdf5_data_read : reads a selection of captures with the outputs of data_basics.data_read (data, time or frequency
+                         array, number of samples and sampling rate).
+
+        write_parameters : updates the meas_parameters attribute of an HDF5 sweep file.
+"""
+# Standard library imports
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+# Third-party imports
+import numpy as np
+try:
+    import h5py
+except ImportError: # h5py not installed, only PScope files can be written
+    h5py = None
+
+LAYOUT = "iteration, pair, frequency, channel, sample"
+
+
+class SweepStore(object):
+    """HDF5 container of the captures of a sweep.
+
+    Parameters
+    ----------
+    path : str
+        HDF5 file path
+    meas_parameters : dict
+        dictionary with "measurement configuration parameters", with the "iter", "pairs", "freq_range" and "num_samples" keys
+    num_channels : int, optional
+        number of receiver channels, by default 2
+    do_FFT : bool, optional
+        set True to also store the FFT magnitude of each capture, by default False
+    averaged : bool, optional
+        set True to store float32 averaged captures instead of int16 codes, by default False
+    variance : str or None, optional
+        "adc" or "fft" to store the variance of averaged captures as "adc_var" or "fft_var", by default None
+    resume : bool, optional
+        set True to continue an existing file at path, by default False overwrites it
+    num_bits : int, optional
+        number of bits on the receiver ADC, by default 14
+    is_bipolar : bool, optional
+        True if the ADC operates with both negative and positive values, by default True
+    sample_rate : float, optional
+        sampling rate in Msps, by default 125.0
+    compression : str or None, optional
+        h5py compression filter of the datasets (e.g. "gzip" or "lzf"), by default None
+    flush_every : int, optional
+        number of captures between flushes of the file to disk, by default 64
+
+    Raises
+    ------
+    ImportError
+        if h5py is not installed
+    ValueError
+        if resuming a file with a different sweep layout
+    """
+
+    def __init__(self, path, meas_parameters, num_channels = 2, do_FFT = False, averaged = False, variance = None, resume = False,
+                    num_bits = 14, is_bipolar = True, sample_rate = 125.0, compression = None, flush_every = 64):
+        if h5py is None:
+            raise ImportError("h5py is required for the HDF5 output.")
+        self.path = path
+        self.flush_every = flush_every
+        self.pairs = [tuple(pair) for pair in meas_parameters["pairs"]]
+        self.freq_range = [str(freq) for freq in meas_parameters["freq_range"]]
+        self._pair_index = dict((pair, n) for n, pair in enumerate(self.pairs))
+        self._freq_index = dict((freq, n) for n, freq in enumerate(self.freq_range))
+        self._lock = threading.Lock()
+        self._unflushed = 0
+
+        num_samples = meas_parameters["num_samples"]
+        points = (meas_parameters["iter"], len(self.pairs), len(self.freq_range))
+        datasets = {"adc" : (points + (num_channels, num_samples), np.float32 if averaged else np.int16)}
+        if do_FFT:
+            datasets["fft"] = (points + (num_channels, num_samples//2 + 1), np.float32)
+        if variance is not None:
+            datasets[variance + "_var"] = datasets[variance][0], np.float32
+
+        if resume and os.path.exists(path):
+            self.file = h5py.File(path, 'a')
+            if (self.file.attrs.get("layout") != LAYOUT or self.file["timestamp"].shape != points
+                    or [tuple(pair) for pair in self.file["pairs"][()]] != self.pairs
+                    or list(self.file["freq_range"][()]) != self.freq_range
+                    or any(name not in self.file or self.file[name].shape != shape for name, (shape, dtype) in datasets.items())):
+                self.file.close()
+                raise ValueError("HDF5 file {} holds a different sweep, it cannot be resumed.".format(path))
+        else:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            self.file = h5py.File(path, 'w')
+            for name, (shape, dtype) in datasets.items():
+                self.file.create_dataset(name, shape, dtype = dtype, chunks = (1, 1, 1) + shape[3:], compression = compression)
+            self.file.create_dataset("timestamp", points, dtype = np.float64, fillvalue = np.nan)
+            self.file.create_dataset("pairs", data = np.array(self.pairs, dtype = np.int16).reshape(-1, 2))
+            self.file.create_dataset("freq_range", data = np.array(self.freq_range, dtype = "S"))
+            self.file.attrs["layout"] = LAYOUT
+            self.file.attrs["num_bits"] = num_bits
+            self.file.attrs["is_bipolar"] = is_bipolar
+            self.file.attrs["sample_rate"] = sample_rate
+            self.file.attrs["created"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.file.attrs["version"] = 1
+        self.timestamps = self.file["timestamp"][()]
+        self.set_parameters(meas_parameters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def index(self, key):
+        """Return the (iteration, pair, frequency) indices of key = (iteration, Tx, Rx, frequency), iteration starting at 1."""
+        iteration, tx, rx, freq = key
+        return iteration - 1, self._pair_index[(tx, rx)], self._freq_index[str(freq)]
+
+    def is_written(self, key):
+        """Return True if the capture of key = (iteration, Tx, Rx, frequency) is stored."""
+        return not np.isnan(self.timestamps[self.index(key)])
+
+    def write(self, key, data, timestamp = None, spectra = None, variance = None):
+        """Store one capture.
+
+        Parameters
+        ----------
+        key : tuple
+            (iteration, Tx, Rx, frequency) of the capture
+        data : sequence of array
+            time domain samples, one array per channel
+        timestamp : float or None, optional
+            acquisition time in seconds since the epoch, by default None for the current time
+        spectra : array or None, optional
+            FFT magnitude in dBFS, one row per channel (stored when the file has an "fft" dataset), by default None
+        variance : array or None, optional
+            variance of an averaged capture, one row per channel, by default None
+        """
+        index = self.index(key)
+        with self._lock:
+            self.file["adc"][index] = np.asarray(data)
+            if spectra is not None and "fft" in self.file:
+                self.file["fft"][index] = np.asarray(spectra)
+            for name in ("adc_var", "fft_var"):
+                if variance is not None and name in self.file:
+                    self.file[name][index] = np.asarray(variance)
+            self.timestamps[index] = timestamp if timestamp is not None else time.time()
+            self.file["timestamp"][index] = self.timestamps[index]
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._flush()
+
+    def set_parameters(self, meas_parameters):
+        """Store meas_parameters as JSON in the "meas_parameters" attribute."""
+        with self._lock:
+            self.file.attrs["meas_parameters"] = json.dumps(meas_parameters, sort_keys=True)
+
+    def flush(self):
+        """Flush stored captures to disk."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and close the file."""
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def _flush(self):
+        self.file.flush()
+        self._unflushed = 0
+
+
+def read_sweep(file_name, pairs = None, freqs = None, iterations = None, dataset = "adc"):
+    """Read a selection of captures from an HDF5 sweep file.
+
+    Only the selected captures are read from disk (one chunk per capture).
+
+    Parameters
+    ----------
+    file_name : str
+        HDF5 sweep file path
+    pairs : list of tuple or None, optional
+        (Tx, Rx) antenna pairs to read, by default None reads all pairs
+    freqs : list of str or None, optional
+        frequencies in MHz to read, as in meas_parameters["freq_range"], by default None reads all frequencies
+    iterations : list of int or None, optional
+        iterations to read (starting at 1), by default None reads all iterations
+    dataset : str, optional
+        "adc", "fft", "adc_var" or "fft_var", by default "adc"
+
+    Returns
+    ----------
+    data : ndarray
+        5-D array indexed by [iteration, pair, frequency, channel, sample] in the order of the selection
+    info : dict
+        read_sweep_info output restricted to the selection ("pairs", "freq_range", "iterations" and "timestamp")
+    """
+    if h5py is None:
+        raise ImportError("h5py is required to read HDF5 sweep files.")
+    with h5py.File(file_name, 'r') as f:
+        info = _info(f)
+        it_index = _select(iterations, info["iterations"], "iteration")
+        pair_index = _select(pairs, info["pairs"], "pair")
+        freq_index = _select(freqs, info["freq_range"], "frequency")
+
+        source = f[dataset]
+        data = np.empty((len(it_index), len(pair_index), len(freq_index)) + source.shape[3:], dtype = source.dtype)
+        for a, i in enumerate(it_index):
+            for b, p in enumerate(pair_index):
+                for c, k in enumerate(freq_index):
+                    data[a, b, c] = source[i, p, k]
+
+    info["timestamp"] = info["timestamp"][np.ix_(it_index, pair_index, freq_index)]
+    info["iterations"] = [info["iterations"][i] for i in it_index]
+    info["pairs"] = [info["pairs"][p] for p in pair_index]
+    info["freq_range"] = [info["freq_range"][k] for k in freq_index]
+    return data, info
+
+def read_sweep_info(file_name):
+    """Read the description of an HDF5 sweep file, without reading any capture.
+
+    Returns
+    ----------
+    info : dict
+        "meas_parameters" (dict), "pairs" (list of (Tx, Rx)), "freq_range" (list of str), "iterations" (list of int),
+        "timestamp" (array [iteration, pair, frequency]), "num_bits", "is_bipolar", "sample_rate" and "datasets" (names)
+    """
+    if h5py is None:
+        raise ImportError("h5py is required to read HDF5 sweep files.")
+    with h5py.File(file_name, 'r') as f:
+        return _info(f)
+
+def hdf5_data_read(file_name, pairs = None, freqs = None, iterations = None, dataset = "adc"):
+    """Read captures from an HDF5 sweep file and return data and time/frequency arrays plus number of samples and sampling rate.
+
+    Counterpart of data_basics.data_read for sweeps recorded with output = "hdf5" (also available from the data_basics
+    and data_essentials modules). Only the selected captures are read from disk, e.g. a single antenna pair with
+    pairs = [(1, 2)] or a single frequency with freqs = ["2000"]. Pair and frequency labels of a file are given by
+    read_sweep_info.
+
+    Parameters
+    ----------
+    file_name : str
+        file name and path for .h5 sweep file
+    pairs : list of tuple or None, optional
+        (Tx, Rx) antenna pairs to read, by default None reads all pairs
+    freqs : list of str or None, optional
+        frequencies in MHz to read, as in meas_parameters["freq_range"], by default None reads all frequencies
+    iterations : list of int or None, optional
+        iterations to read (starting at 1), by default None reads all iterations
+    dataset : str, optional
+        "adc" for time domain data or "fft" for FFT magnitude in dBFS (also "adc_var" and "fft_var"), by default "adc"
+
+    Returns
+    ----------
+    data : ndarray
+        5-D array indexed by [iteration, pair, frequency, sample, channel], in the order of the selection,
+        each data[i, p, f] having the layout of the data_read output (rows are samples and columns are separate channels)
+    time: ndarray of float
+        1-D array with time values for each ADC sample, output for "adc" datasets only
+    freq : ndarray of float
+        1-D array with frequency values for each FFT bin, output for "fft" datasets only
+    nsamples : int
+        number of samples (per channel), or number of samples / 2 for "fft" datasets as in the .fft files
+    srate : float
+        sampling rate in Msps
+    """
+    data, info = read_sweep(file_name, pairs, freqs, iterations, dataset)
+    data = np.swapaxes(data, 3, 4)
+    srate = info["sample_rate"]
+
+    if dataset.startswith("fft"):
+        nsamples = data.shape[3] - 1
+        freq = np.linspace(0,(srate*1e6)/2,data.shape[3])
+        return data, freq, nsamples, srate
+
+    else:
+        nsamples = data.shape[3]
+        time = np.linspace(0,nsamples/(srate*1e6),nsamples)
+        return data, time, nsamples, srate
+
+def write_parameters(file_name, meas_parameters):
+    """Update the meas_parameters attribute of a closed HDF5 sweep file (e.g. with the final run duration)."""
+    if h5py is None:
+        raise ImportError("h5py is required for the HDF5 output.")
+    with h5py.File(file_name, 'a') as f:
+        f.attrs["meas_parameters"] = json.dumps(meas_parameters, sort_keys=True)
+
+def _info(f):
+    timestamp = f["timestamp"][()]
+    return {"meas_parameters" : json.loads(f.attrs["meas_parameters"]),
+            "pairs" : [tuple(int(n) for n in pair) for pair in f["pairs"][()]],
+            "freq_range" : [str(freq) for freq in f["freq_range"][()]],
+            "iterations" : range(1, timestamp.shape[0] + 1),
+            "timestamp" : timestamp,
+            "num_bits" : int(f.attrs["num_bits"]),
+            "is_bipolar" : bool(f.attrs["is_bipolar"]),
+            "sample_rate" : float(f.attrs["sample_rate"]),
+            "datasets" : [name for name in f if name not in ("timestamp", "pairs", "freq_range")]}
+
+def _select(values, available, name):
+    """Return the indices of values in available (all indices for None)."""
+    if values is None:
+        return range(len(available))
+    try:
+        return [available.index(tuple(value) if isinstance(value, list) else value) for value in values]
+    except ValueError:
+        raise ValueError("{} not found in the sweep file, available: {}".format(name, available))
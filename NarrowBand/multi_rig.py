@@ -0,0 +1,260 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for running one sweep on several narrow band systems at once, each a receiver (DC890/DC1513B-AA),
+        a DC590B with the LTC6946 and a switching matrix.
+
+        The rig argument of system.sweep accepts a list of rigs, e.g. system.HardwareRig instances identified by port
+        or serial number, virtual_rig.VirtualRig or session.HardwareSession instances. The steps of each iteration of
+        the sweep plan are then shared between the rigs, one worker thread per rig:
+            - each worker takes the next contiguous chunk of steps (keeping the order of the plan, so that pair and
+              frequency changes stay as few as in a single rig sweep) and executes it on its rig;
+            - chunk sizes follow the live throughput of each rig (captures per second measured so far), so that a
+              faster rig takes more steps, and shrink towards the end of the iteration so that all rigs finish together;
+            - every capture is written by the main thread with the file names of the plan, so the output is named
+              exactly as if a single rig had acquired it (see sweep_plan module).
+        All rigs finish an iteration before the next one starts.
+
+        Main usage:
+
+        $ rigs = [nbsys.HardwareRig(name = "rig A", synthesizer_port = "COM5", switch_port = "COM4", receiver_serial = "LT1234"),
+        $         nbsys.HardwareRig(name = "rig B", synthesizer_port = "COM8", switch_port = "COM7", receiver_serial = "LT5678")]
+        $ nbsys.sweep(meas_parameters = MeasParameters, rig = rigs)    # per-rig statistics in MeasParameters["rigs"]
+
+Class::
+        RigDevices : open devices of one rig.
+
+        ShardedExecutor : executes sweep steps on several rigs, load balanced on their throughput.
+
+Functions::
+        open_rigs : opens the devices of several rigs.
+
+        rig_executor : returns the executor for the open rigs.
+"""
+# Standard library imports
+from collections import deque, namedtuple
+from contextlib import contextmanager
+import math
+import Queue
+import sys
+import threading
+from timeit import default_timer as timer
+
+# Local application imports
+from device_actors import OverlappedExecutor, SequentialExecutor
+from tracing import NULL_TRACER
+
+
+class RigDevices(namedtuple("RigDevices", ["name", "switch", "fctrl", "controller"])):
+    """Open devices of one rig: switching matrix, DC590B controller and receiver controller."""
+
+    __slots__ = ()
+
+
+@contextmanager
+def open_rigs(rigs, spi_registers, verbose = False):
+    """Open the synthesizer and the receiver of every rig, yield a list of RigDevices.
+
+    Parameters
+    ----------
+    rigs : list
+        device factories (system.HardwareRig, virtual_rig.VirtualRig or session.HardwareSession), optionally with
+        a name attribute
+    spi_registers : list
+        receiver SPI registers
+    verbose : bool, optional
+        set True for verbosity, by default False
+
+    Raises
+    ------
+    ValueError
+        if two rigs have the same name, or if the receivers have different numbers of bits or coding
+    """
+    names = [getattr(rig, "name", None) or "rig {:d}".format(n + 1) for n, rig in enumerate(rigs)]
+    if len(set(names)) != len(names):
+        raise ValueError("Rig names must be unique, got {}.".format(names))
+
+    receivers = []
+    devices = []
+    try:
+        for name, rig in zip(names, rigs):
+            fctrl = rig.synthesizer()
+            receiver = rig.receiver(spi_registers, verbose)
+            controller = receiver.__enter__()
+            receivers.append(receiver)
+            devices.append(RigDevices(name, rig.switch, fctrl, controller))
+        formats = set((device.controller.num_bits, device.controller.is_bipolar) for device in devices)
+        if len(formats) > 1:
+            raise ValueError("All receivers must have the same number of bits and coding, got {}.".format(sorted(formats)))
+        yield devices
+    except BaseException:
+        exc_info = sys.exc_info()
+        _close(receivers, exc_info)
+        raise exc_info[0], exc_info[1], exc_info[2]
+    _close(receivers, (None, None, None))
+
+def _close(receivers, exc_info):
+    for receiver in reversed(receivers):
+        receiver.__exit__(*exc_info)
+
+def rig_executor(devices, settlers, overlap = False, num_samples = 1024, trigger = 0, num_frames = 1, verbose = False,
+                    tracer = NULL_TRACER, chunk_time = 2.0):
+    """Return the executor running sweep steps on the open rigs.
+
+    Parameters
+    ----------
+    devices : list of RigDevices
+        open rigs (see open_rigs)
+    settlers : list
+        settling.Settler (or NULL_SETTLER) of each rig
+    overlap : bool, optional
+        set True for device_actors.OverlappedExecutor on each rig, by default False for SequentialExecutor
+    num_samples, trigger, num_frames, verbose, tracer :
+        see device_actors.SequentialExecutor
+    chunk_time : float, optional
+        target duration in seconds of the chunk of steps taken by a rig (see ShardedExecutor), by default 2.0
+
+    Returns
+    ----------
+    executor
+        the executor of the rig for a single rig, a ShardedExecutor otherwise
+    """
+    cls = OverlappedExecutor if overlap else SequentialExecutor
+    executors = [cls(device.switch, device.fctrl, device.controller, settler, num_samples, trigger, num_frames, verbose, tracer)
+                    for device, settler in zip(devices, settlers)]
+    if len(executors) == 1:
+        return executors[0]
+    return ShardedExecutor(executors, [device.name for device in devices], chunk_time)
+
+
+class ShardedExecutor(object):
+    """Execute sweep steps on several rigs, one worker thread per rig, with the same run interface as a single rig executor.
+
+    Workers take contiguous chunks of steps sized to chunk_time seconds at their measured throughput (one step until
+    a throughput is measured), at most a share of the remaining steps (guided self-scheduling), so that faster rigs
+    take more steps and all rigs finish together.
+
+    Parameters
+    ----------
+    executors : list
+        device_actors.SequentialExecutor or OverlappedExecutor of each rig
+    names : list of str
+        rig names, also used as worker thread names
+    chunk_time : float, optional
+        target duration in seconds of a chunk, by default 2.0
+    max_queue : int, optional
+        maximum number of captures waiting for the main thread, by default 16
+    """
+
+    def __init__(self, executors, names, chunk_time = 2.0, max_queue = 16):
+        if len(executors) != len(names):
+            raise ValueError("One name per executor is required.")
+        self.executors = executors
+        self.names = names
+        self.chunk_time = chunk_time
+        self.max_queue = max_queue
+        self.stats = dict((name, {"captures" : 0, "busy" : 0.0, "chunks" : 0}) for name in names)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for executor in self.executors:
+            executor.close()
+
+    def throughput(self, name):
+        """Return the measured captures per second of rig name, None before its first capture."""
+        stats = self.stats[name]
+        return stats["captures"] / stats["busy"] if stats["captures"] and stats["busy"] > 0 else None
+
+    def run(self, steps):
+        """Execute steps (sweep_plan.PlanStep) on all rigs, yielding (step, frames) as the captures complete."""
+        remaining = deque(steps)
+        results = Queue.Queue(self.max_queue)
+        stop = threading.Event()
+        workers = [threading.Thread(target = self._work, args = (name, executor, remaining, results, stop), name = name)
+                    for name, executor in zip(self.names, self.executors)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            finished = 0
+            while finished < len(workers):
+                item = results.get()
+                if item is None:
+                    finished += 1
+                elif item[0] is _FAILED:
+                    exc_info = item[1]
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                else:
+                    yield item
+        finally:
+            stop.set()
+            for worker in workers:
+                while worker.is_alive():
+                    _drain(results)
+                    worker.join(0.05)
+
+    def report(self):
+        """Return a short human readable summary of the captures of each rig."""
+        lines = []
+        for name in self.names:
+            stats = self.stats[name]
+            rate = self.throughput(name)
+            lines.append("{0}: {1:d} captures in {2:d} chunks, {3:.2f} s busy ({4:.1f} captures/s)".format(name, stats["captures"],
+                            stats["chunks"], stats["busy"], rate or 0.0))
+        return "\n".join(lines)
+
+    def as_dict(self):
+        """Return the statistics of each rig, with their throughput, as a JSON serializable dictionary."""
+        rigs = {}
+        for name in self.names:
+            rigs[name] = dict(self.stats[name])
+            rigs[name]["throughput"] = self.throughput(name)
+        return rigs
+
+    def _next_chunk(self, name, remaining):
+        with self._lock:
+            if not remaining:
+                return []
+            rate = self.throughput(name)
+            share = int(math.ceil(len(remaining) / (2.0 * len(self.executors))))
+            size = 1 if rate is None else max(1, min(int(rate * self.chunk_time), share))
+            self.stats[name]["chunks"] += 1
+            return [remaining.popleft() for _ in range(min(size, len(remaining)))]
+
+    def _work(self, name, executor, remaining, results, stop):
+        try:
+            while not stop.is_set():
+                chunk = self._next_chunk(name, remaining)
+                if not chunk:
+                    break
+                start = timer()
+                for item in executor.run(chunk):
+                    end = timer()
+                    with self._lock:
+                        self.stats[name]["captures"] += 1
+                        self.stats[name]["busy"] += end - start
+                    results.put(item)
+                    if stop.is_set():
+                        break
+                    start = timer()
+        except BaseException:
+            results.put((_FAILED, sys.exc_info()))
+        finally:
+            results.put(None)
+
+_FAILED = object()
+
+def _drain(results):
+    try:
+        while True:
+            results.get_nowait()
+    except Queue.Empty:
+        pass
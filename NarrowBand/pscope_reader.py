@@ -0,0 +1,382 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module reading PScope .adc and .fft files (as written by ReceiverFFT.save_for_pscope and save_fft_for_pscope)
+        without pandas, in a single pass over the file.
+
+        The file is read at once; its header is parsed into a PScopeInfo (number of channels, samples, sample rate, ADC
+        bits) and its body is decoded by numpy directly into an int16 array for .adc files of ADC codes or a float64 (or
+        float32) array for .fft files and for .adc files holding non-integer values (averaged frames and variances written
+        by the averaging module), instead of a float64 DataFrame with an empty separator column.
+        Truncated files (e.g. a sweep stopped while writing) are read up to their last complete row, with
+        info.complete False, instead of failing or falling back to a slow parser.
+
+        Main usage:
+
+        $ data, info = read_pscope("Tx 1 Rx 2 2000MHz.adc")     # int16 [samples, channels], PScopeInfo
+        $ info.num_samples, info.sample_rate, info.num_channels, info.num_bits, info.complete
+        $ spectra, info = read_pscope("Tx 1 Rx 2 2000MHz.fft", dtype = np.float32)
+        $ info = read_info("Tx 1 Rx 2 2000MHz.adc")              # header only
+        $ data, infos, errors = read_pscope_files("Session/*/*.adc")  # int16 [files, samples, channels]
+        $ data, infos, errors = read_pscope_files(file_names, memmap = "session.npy", num_workers = 8)
+
+Class::
+        PScopeInfo : header of a PScope file.
+
+Functions::
+        read_pscope : reads the header and data of a PScope file.
+
+        read_info : reads the header of a PScope file.
+
+        read_pscope_files : reads many PScope files in parallel into one array.
+
+        parse_pscope : parses the text of a PScope file.
+"""
+# Standard library imports
+from collections import namedtuple
+import glob
+import mmap
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+# Third-party imports
+import numpy as np
+
+ADC_DTYPE = np.int16
+FFT_DTYPE = np.float64
+INFO_BYTES = 4096 # enough for the header of up to 16 channels
+INTEGER_CHARS = "0123456789-, \r\n" # characters of a body of integer values
+
+
+class PScopeInfo(namedtuple("PScopeInfo", ["kind", "num_channels", "num_samples", "sample_rate", "num_bits", "num_rows",
+                                            "complete"])):
+    """Header of a PScope file.
+
+    Attributes
+    ----------
+    kind : str
+        "adc" or "fft"
+    num_channels : int
+        number of channels (columns)
+    num_samples : int
+        number of time domain samples per channel, as in the header ("FFTMagnitude" gives num_samples/2 for .fft files)
+    sample_rate : float
+        sampling rate in Msps
+    num_bits : int or None
+        ADC resolution, None for .fft files
+    num_rows : int
+        number of rows read (num_samples for .adc, num_samples/2 + 1 for .fft files when complete)
+    complete : bool
+        False if the file ends before the "End" line (rows read up to the last complete one)
+    """
+
+    __slots__ = ()
+
+    @property
+    def header_samples(self):
+        """Number of samples written in the header: num_samples for .adc, num_samples/2 for .fft files (data_read nsamples)."""
+        return self.num_samples if self.kind == "adc" else self.num_samples//2
+
+
+def read_pscope(file_name, dtype = None, out = None):
+    """Read a PScope .adc or .fft file, return (data, info).
+
+    Parameters
+    ----------
+    file_name : str
+        file name and path for .adc or .fft file in PScope format
+    dtype : numpy dtype or None, optional
+        data type, by default None for int16 (.adc files of integer values) or float64 (.fft and averaged .adc files)
+    out : numpy.ndarray or None, optional
+        [rows, channels] array receiving the data (rows beyond the ones read are left unchanged), by default None
+
+    Returns
+    ----------
+    data : ndarray
+        [rows, channels] array, rows are samples (or FFT bins) and columns are separate channels (out if given)
+    info : PScopeInfo
+        file header
+
+    Raises
+    ------
+    ValueError
+        if the file is not a PScope file, its values cannot be parsed as dtype, or out is too small
+    """
+    with open(file_name, 'rb') as fp:
+        text = fp.read()
+    return parse_pscope(text, dtype, out, name = file_name)
+
+def read_info(file_name):
+    """Return the PScopeInfo of a PScope file, reading its header only (num_rows and complete as if the file were complete)."""
+    with open(file_name, 'rb') as fp:
+        text = fp.read(INFO_BYTES)
+    info, _ = _parse_header(text, file_name)
+    return info._replace(num_rows = _full_rows(info), complete = True)
+
+def read_pscope_files(file_names, dtype = None, out = None, memmap = None, num_workers = None, processes = True,
+                        chunk_files = 16):
+    """Read many PScope files of the same size in parallel into one [files, rows, channels] array.
+
+    Each file is parsed by read_pscope in a pool of worker processes (or threads) and written to its slice of a single
+    preallocated array, or of a .npy memmap for sessions larger than the memory. Files which cannot be read, or whose
+    size differs from the first readable file, are reported in errors and their slice is left as zeros (rows missing
+    from truncated files too) instead of aborting the load.
+
+    Parameters
+    ----------
+    file_names : list of str or str
+        file names and paths for .adc or .fft files in PScope format, or a glob pattern (files sorted by name)
+    dtype : numpy dtype or None, optional
+        data type, by default None for the dtype read_pscope picks for the first readable file
+    out : numpy.ndarray or numpy.memmap or None, optional
+        [files, rows, channels] array receiving the data, by default None (array allocated from the first readable header)
+    memmap : str or None, optional
+        path of a .npy file created as a memmap receiving the data when out is None (numpy.load(memmap, mmap_mode = 'r')
+        opens it later), by default None
+    num_workers : int or None, optional
+        number of worker processes or threads, by default None for the number of CPUs
+    processes : bool, optional
+        parse the files in worker processes (parsing holds the GIL, threads only overlap the file reads), by default True
+    chunk_files : int, optional
+        number of files sent to a worker at once, by default 16
+
+    Returns
+    ----------
+    data : ndarray or numpy.memmap
+        [files, rows, channels] array, data[i] of file_names[i] (out or the memmap if given)
+    infos : list of PScopeInfo or None
+        header of each file, None for files in errors
+    errors : dict
+        error message of each file that could not be read, by file name
+
+    Raises
+    ------
+    ValueError
+        if no file could be read to size the output array, or out does not have one row per file
+    """
+    if isinstance(file_names, basestring):
+        file_names = sorted(glob.glob(file_names))
+    file_names = list(file_names)
+    errors = {}
+    if out is None:
+        shape = None
+        for file_name in file_names:
+            try:
+                info = read_info(file_name)
+                if dtype is None: # from the content of the first file (int16 or float64 .adc)
+                    dtype = read_pscope(file_name)[0].dtype
+            except (IOError, OSError, ValueError) as e:
+                errors[file_name] = str(e)
+                continue
+            shape = (len(file_names), info.num_rows, info.num_channels)
+            break
+        if shape is None:
+            raise ValueError("None of the {:d} files could be read.".format(len(file_names)))
+        if memmap is not None:
+            out = np.lib.format.open_memmap(memmap, mode = 'w+', dtype = dtype, shape = shape)
+        else:
+            out = np.zeros(shape, dtype)
+    elif len(out) != len(file_names):
+        raise ValueError("out has {:d} rows for {:d} files.".format(len(out), len(file_names)))
+
+    target = None # file mapped by out, for worker processes to write to it
+    if isinstance(out, np.memmap) and isinstance(out.base, mmap.mmap) and out.flags.c_contiguous:
+        target = (out.filename, out.offset, out.dtype.str, out.shape)
+    jobs = [(index, file_name, out.dtype, out.shape[1:], target) for index, file_name in enumerate(file_names)
+                if file_name not in errors]
+    infos = [None] * len(file_names)
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+
+    def store(results):
+        for index, info, data, error in results:
+            if error is not None:
+                errors[file_names[index]] = error
+                continue
+            if data is not None:
+                out[index, :len(data)] = data
+            infos[index] = info
+
+    if num_workers > 1 and len(jobs) > 1:
+        if processes:
+            pool = multiprocessing.Pool(num_workers)
+            worker = _read_into_file if target is not None else _read_copy
+        else:
+            pool = ThreadPool(num_workers)
+            worker = lambda job: _read_into(job, out)
+        try:
+            store(pool.imap_unordered(worker, jobs, chunk_files))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        store(_read_into(job, out) for job in jobs)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out, infos, errors
+
+def parse_pscope(text, dtype = None, out = None, name = "<string>"):
+    """Parse the text of a PScope file, return (data, info) as read_pscope."""
+    info, body_start = _parse_header(text, name)
+    expected = _full_rows(info)
+
+    end = text.find("End", body_start)
+    complete = end >= 0
+    if not complete:
+        end = text.rfind("\n", body_start) + 1 # last complete line
+    body = text[body_start:max(end, body_start)]
+    num_rows = min(body.count("\n"), expected)
+
+    if dtype is None:
+        integers = info.kind == "adc" and not body.translate(None, INTEGER_CHARS)
+        dtype = ADC_DTYPE if integers else FFT_DTYPE
+    values = np.fromstring(body.replace(", ,", ",").replace("\n", ","), dtype = dtype, sep = ",")
+    if len(values) < num_rows * info.num_channels: # parsing stopped at a value that is not of dtype
+        raise ValueError("{} holds {:d} rows of {:d} channels but only {:d} values parse as {}.".format(name, num_rows,
+                            info.num_channels, len(values), np.dtype(dtype).name))
+    data = values[:num_rows * info.num_channels].reshape(num_rows, info.num_channels)
+    if out is not None:
+        if out.shape[0] < num_rows or out.shape[1:] != (info.num_channels,):
+            raise ValueError("out of shape {} cannot receive {:d} rows of {:d} channels from {}.".format(out.shape, num_rows,
+                                info.num_channels, name))
+        out[:num_rows] = data
+        data = out
+    return data, info._replace(num_rows = num_rows, complete = complete and num_rows == expected)
+
+def _read_into(job, out):
+    """Read the file of job (index, file name, dtype, (rows, channels), target) into out[index], return
+    (index, info, None, error message or None)."""
+    index, file_name, dtype, shape, _ = job
+    try:
+        _, info = read_pscope(file_name, dtype, out[index])
+        _check_size(info, shape, file_name)
+    except (IOError, OSError, ValueError) as e:
+        out[index] = 0 # rows of a smaller file
+        return index, None, None, str(e)
+    return index, info, None, None
+
+_targets = {}
+
+def _read_into_file(job):
+    """Read the file of job into its target (file name, offset, dtype, shape) mapped once per worker process, return
+    as _read_into."""
+    target = job[4]
+    if target not in _targets:
+        file_name, offset, dtype, shape = target
+        _targets.clear()
+        _targets[target] = np.memmap(file_name, dtype, 'r+', offset, shape)
+    return _read_into(job, _targets[target])
+
+def _read_copy(job):
+    """Read the file of job (worker processes), return (index, info, data, error message or None) for the parent to
+    copy data to its array."""
+    index, file_name, dtype, shape, _ = job
+    try:
+        data, info = read_pscope(file_name, dtype)
+        _check_size(info, shape, file_name)
+    except (IOError, OSError, ValueError) as e:
+        return index, None, None, str(e)
+    return index, info, data, None
+
+def _check_size(info, shape, name):
+    """Raise ValueError if the file of info does not fill (rows, channels) shape when complete."""
+    if (_full_rows(info), info.num_channels) != tuple(shape):
+        raise ValueError("{} has {:d} rows of {:d} channels, expected {:d} rows of {:d} channels.".format(name,
+                            _full_rows(info), info.num_channels, shape[0], shape[1]))
+
+def _full_rows(info):
+    """Return the number of rows of the file of info when complete."""
+    return info.num_samples if info.kind == "adc" else info.num_samples//2 + 1
+
+def _parse_header(text, name):
+    """Return (PScopeInfo, offset of the first data row) of the text of a PScope file."""
+    def next_line(start):
+        stop = text.find("\n", start)
+        if stop < 0:
+            raise ValueError("header truncated")
+        return text[start:stop].rstrip("\r").split(","), stop + 1
+    try:
+        version, start = next_line(0)
+        fields, start = next_line(start)
+        if version[0] == "Version" and fields[0] == "FFTMagnitude":
+            return PScopeInfo("fft", int(fields[1]), 2 * int(fields[2]), float(fields[3]), None, 0, False), start
+        if version[0] == "Version" and fields[0] == "Retainers":
+            num_channels = int(fields[2])
+            for _ in range(2): # Placement and DemoID
+                _, start = next_line(start)
+            raw, start = next_line(start) # RawData of the first channel
+            for _ in range(num_channels - 1):
+                _, start = next_line(start)
+            return PScopeInfo("adc", num_channels, int(raw[2]), float(raw[6]), int(raw[3]), 0, False), start
+    except (IndexError, ValueError):
+        pass
+    raise ValueError("{} is not a PScope file or its header is truncated.".format(name))
+
+
+if __name__ == '__main__':
+
+    import os
+    import tempfile
+    from timeit import default_timer as timer
+
+    from ReceiverFFT import ReceiverFFT as rfft
+
+    num_samples = 65536
+    folder = tempfile.mkdtemp()
+    adc = np.random.randint(-8192, 8192, size = (2, num_samples))
+    adc_name = os.path.join(folder, "bench.adc")
+    fft_name = os.path.join(folder, "bench.fft")
+    rfft.save_for_pscope(adc_name, 14, True, num_samples, 'DC_1513B-AA', 'LTM9004', *adc)
+    rfft.save_for_pscope_fft(fft_name, 14, True, num_samples, 'DC_1513B-AA', 'LTM9004', 'hann', *adc)
+
+    for name in (adc_name, fft_name):
+        start = timer()
+        data, info = read_pscope(name)
+        duration = timer() - start
+        print("{0}: {1} {2} in {3:.1f} ms, {4:.1f} kB ({5:.1f} kB as float64)".format(os.path.basename(name), data.dtype,
+                data.shape, 1e3 * duration, data.nbytes / 1024., data.size * 8 / 1024.))
+        print("    {}".format(info))
+    assert np.array_equal(read_pscope(adc_name)[0], adc.T)
+
+    with open(adc_name, 'rb') as fp:
+        text = fp.read()
+    _, info = parse_pscope(text[:len(text)//2], name = "truncated")
+    print("Truncated .adc: {0:d} of {1:d} rows, complete = {2}".format(info.num_rows, info.num_samples, info.complete))
+    print("Header only: {}".format(read_info(adc_name)))
+
+    averaged = adc / 3.0 # averaged frame written by the averaging module
+    averaged_name = os.path.join(folder, "averaged.adc")
+    rfft.save_for_pscope(averaged_name, 14, True, num_samples, 'DC_1513B-AA', 'LTM9004', *averaged)
+    data, info = read_pscope(averaged_name)
+    assert data.dtype == np.float64 and info.complete and np.array_equal(data, averaged.T)
+    try:
+        read_pscope(averaged_name, dtype = np.int16)
+    except ValueError as e:
+        print("Averaged .adc: {0} {1} round trip exact, as int16: {2}".format(data.dtype, data.shape, e))
+
+    num_files = 64
+    names = [os.path.join(folder, "capture {:03d}.adc".format(k)) for k in range(num_files)]
+    for name in names:
+        rfft.save_for_pscope(name, 14, True, 16384, 'DC_1513B-AA', 'LTM9004', *adc[:, :16384])
+    with open(names[1], 'wb') as fp: # unreadable
+        fp.write("not a PScope file\n")
+    with open(names[2], 'r+b') as fp: # truncated
+        fp.truncate(os.path.getsize(names[2])//2)
+    start = timer()
+    for name in names:
+        try:
+            read_pscope(name)
+        except ValueError:
+            pass
+    print("\nLoop over {0:d} files: {1:.1f} ms".format(num_files, 1e3 * (timer() - start)))
+    for kwargs in (dict(num_workers = 1), dict(processes = False), dict(processes = True),
+                    dict(memmap = os.path.join(folder, "session.npy"))):
+        start = timer()
+        data, infos, errors = read_pscope_files(os.path.join(folder, "capture *.adc"), **kwargs)
+        print("read_pscope_files({0}): {1} {2} in {3:.1f} ms, {4:d} incomplete, errors {5}".format(kwargs,
+                type(data).__name__, data.shape, 1e3 * (timer() - start),
+                sum(1 for info in infos if info is not None and not info.complete), errors.keys()))
+        assert np.array_equal(data[0], adc[:, :16384].T) and np.array_equal(data[-1], data[0]) and not data[1].any()
+    print("CPUs: {:d}".format(multiprocessing.cpu_count()))
@@ -0,0 +1,240 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for choosing the order of the steps of a sweep (antenna pair and frequency of each capture), from a
+        model of the cost of each operation on a given rig.
+
+        A scheduler returns the (pair, frequency) points of one iteration in acquisition order. Available schedulers:
+            - "ant_sweep" : pair -> frequency, as ant_sweep always did.
+            - "ant_sweep_alt" : frequency -> pair, as ant_sweep_alt always did.
+            - "serpentine" : pair -> frequency, with the frequencies of every other pair in reverse order, so that the
+              frequency is kept when the pair changes (no jump from the last frequency back to the first one).
+            - "serpentine_alt" : frequency -> pair, with the pairs of every other frequency in reverse order.
+        The serpentine schedulers also reverse every other iteration, which then starts at the point where the
+        previous one ended. Any function scheduler(pairs, freq_range, iteration) returning a list of (pair, freq)
+        points with every point once can be used as well.
+
+        With order "auto", the schedule is chosen among the four fixed orders above (the one with the lowest
+        predicted time according to a CostModel), it is not an optimisation of the point order.
+
+        Main usage:
+
+        $ cost_model = CostModel.from_trace(tracer.summary(), settling = SettlingModel.load("settling.json"))
+        $ order, points, predicted, candidates = schedule(pairs, freq_range, iterations, "auto", cost_model)
+
+Class::
+        CostModel : time taken by the retune, switch, settling and capture of each step.
+
+Functions::
+        schedule : orders the points of a sweep, returning the predicted duration.
+
+        predict : predicted duration of a sequence of points.
+
+        predict_stages : predicted duration of a sequence of points per stage.
+
+        pair_major, freq_major, serpentine, serpentine_alt : schedulers.
+"""
+# Standard library imports
+from datetime import datetime
+import json
+
+COST_KEYS = ("retune", "switch", "capture", "step", "lock_per_mhz")
+STAGES = ("capture", "step", "switch", "retune", "settle")
+
+
+class CostModel(object):
+    """Time taken by each operation of a sweep step, in seconds.
+
+    A step costs capture + step, plus switch when the pair changes, plus retune when the frequency changes,
+    plus the longest of the PLL lock time and the switch settle time (waited concurrently by settling.Settler).
+
+    Parameters
+    ----------
+    retune : float, optional
+        DC590B frequency burst (serial write), by default 0.045 (43 characters at 9600 baud)
+    switch : float, optional
+        switching matrix command, by default 0.005
+    capture : float, optional
+        receiver collect, by default 0.02
+    step : float, optional
+        fixed time per step (e.g. inline file writes when the sweep is not pipelined), by default 0.0
+    lock_per_mhz : float, optional
+        PLL lock time per MHz of frequency jump, added to the settling model lock time, by default 0.0
+    settling : settling.SettlingModel or None, optional
+        lock and switch settle times per transition, by default None (no settling waits)
+    """
+
+    def __init__(self, retune = 0.045, switch = 0.005, capture = 0.02, step = 0.0, lock_per_mhz = 0.0, settling = None):
+        self.retune = retune
+        self.switch = switch
+        self.capture = capture
+        self.step = step
+        self.lock_per_mhz = lock_per_mhz
+        self.settling = settling
+
+    def cost(self, from_pair, from_freq, to_pair, to_freq):
+        """Return the predicted time of a step to (to_pair, to_freq) after a step at (from_pair, from_freq) (None at start),
+        the sum of its stage_costs."""
+        return sum(self.stage_costs(from_pair, from_freq, to_pair, to_freq).values())
+
+    def stage_costs(self, from_pair, from_freq, to_pair, to_freq):
+        """Return the predicted time of a step per stage, {"capture", "step", "switch", "retune", "settle"}."""
+        stages = {"capture" : self.capture, "step" : self.step, "switch" : 0.0, "retune" : 0.0, "settle" : 0.0}
+        lock = settle = 0.0
+        if to_pair != from_pair:
+            stages["switch"] = self.switch
+            if self.settling is not None:
+                settle = self.settling.switch_time(from_pair, to_pair)
+        if to_freq != from_freq:
+            stages["retune"] = self.retune
+            if self.settling is not None:
+                lock = self.settling.lock_time(from_freq, to_freq)
+            if from_freq is not None:
+                lock += self.lock_per_mhz * abs(_mhz(to_freq) - _mhz(from_freq))
+        stages["settle"] = max(lock, settle)
+        return stages
+
+    @classmethod
+    def from_trace(cls, summary, settling = None, step = 0.0, lock_per_mhz = 0.0):
+        """Return a cost model with the mean durations of the spans of a traced sweep.
+
+        Parameters
+        ----------
+        summary : dict
+            tracing.Tracer.summary() of a sweep run with trace = True, with "freq_set", "set_pair" and "collect" spans
+        settling : settling.SettlingModel or None, optional
+            settling model, by default None
+        step : float, optional
+            fixed time per step, by default 0.0
+        lock_per_mhz : float, optional
+            PLL lock time per MHz of frequency jump, by default 0.0
+        """
+        default = cls()
+        mean = lambda name, value: summary[name]["mean"] if name in summary else value
+        return cls(mean("freq_set", default.retune), mean("set_pair", default.switch), mean("collect", default.capture),
+                    step, lock_per_mhz, settling)
+
+    def save(self, file_path):
+        """Save the operation costs to a JSON file (the settling model is saved separately)."""
+        model = dict((key, getattr(self, key)) for key in COST_KEYS)
+        model["created"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(file_path, 'w') as fp:
+            json.dump(model, fp, sort_keys=True, indent=4)
+
+    @classmethod
+    def load(cls, file_path, settling = None):
+        """Return the cost model saved in a JSON file, with an optional settling model."""
+        with open(file_path, 'r') as fp:
+            model = json.load(fp)
+        return cls(settling = settling, **dict((str(key), model[key]) for key in COST_KEYS if key in model))
+
+
+def pair_major(pairs, freq_range, iteration):
+    """Pair -> frequency order (ant_sweep)."""
+    return [(pair, freq) for pair in pairs for freq in freq_range]
+
+def freq_major(pairs, freq_range, iteration):
+    """Frequency -> pair order (ant_sweep_alt)."""
+    return [(pair, freq) for freq in freq_range for pair in pairs]
+
+def serpentine(pairs, freq_range, iteration):
+    """Pair -> frequency order, reversing the frequencies of every other pair and every other iteration."""
+    points = []
+    for n, pair in enumerate(pairs):
+        points.extend((pair, freq) for freq in (freq_range if n % 2 == 0 else freq_range[::-1]))
+    return points if iteration % 2 == 1 else points[::-1]
+
+def serpentine_alt(pairs, freq_range, iteration):
+    """Frequency -> pair order, reversing the pairs of every other frequency and every other iteration."""
+    points = []
+    for n, freq in enumerate(freq_range):
+        points.extend((pair, freq) for pair in (pairs if n % 2 == 0 else pairs[::-1]))
+    return points if iteration % 2 == 1 else points[::-1]
+
+SCHEDULERS = {"ant_sweep" : pair_major, "ant_sweep_alt" : freq_major, "serpentine" : serpentine, "serpentine_alt" : serpentine_alt}
+
+def schedule(pairs, freq_range, iterations, order = "ant_sweep", cost_model = None):
+    """Order the points of a sweep and predict its duration.
+
+    Parameters
+    ----------
+    pairs : sequence of tuple
+        antenna pairs (Tx, Rx)
+    freq_range : sequence of str
+        frequencies in MHz
+    iterations : int
+        number of iterations
+    order : str or function, optional
+        name of a scheduler in SCHEDULERS, "auto" for the one of SCHEDULERS with the lowest predicted duration (a
+        choice among these fixed orders, not an optimisation), or a scheduler function, by default "ant_sweep"
+    cost_model : CostModel or None, optional
+        operation costs used for the prediction, by default None for CostModel() defaults
+
+    Returns
+    ----------
+    order : str
+        name of the scheduler used (the function name for a scheduler function)
+    points : list of tuple
+        (iteration, pair, freq) of every step, in acquisition order
+    predicted : float
+        predicted duration in seconds
+    candidates : dict
+        {order : predicted duration} of every scheduler evaluated
+
+    Raises
+    ------
+    ValueError
+        for an unknown order, or a scheduler not returning every point of an iteration once
+    """
+    cost_model = cost_model if cost_model is not None else CostModel()
+    pairs = [tuple(pair) for pair in pairs]
+    freq_range = list(freq_range)
+
+    if order == "auto":
+        schedulers = sorted(SCHEDULERS.items())
+    elif callable(order):
+        schedulers = [(order.__name__, order)]
+    elif order in SCHEDULERS:
+        schedulers = [(order, SCHEDULERS[order])]
+    else:
+        raise ValueError("Sweep order must be \"auto\", a scheduler function or one of {}, got {}.".format(sorted(SCHEDULERS), order))
+
+    expected = sorted((pair, freq) for pair in pairs for freq in freq_range)
+    candidates = {}
+    best = None
+    for name, scheduler in schedulers:
+        points = []
+        for j in range(1, iterations + 1):
+            iteration_points = [(tuple(pair), freq) for pair, freq in scheduler(pairs, freq_range, j)]
+            if sorted(iteration_points) != expected:
+                raise ValueError("Scheduler {} does not return every point of iteration {:d} once.".format(name, j))
+            points.extend((j, pair, freq) for pair, freq in iteration_points)
+        candidates[name] = predict(points, cost_model)
+        if best is None or candidates[name] < candidates[best[0]]:
+            best = (name, points)
+    return best[0], best[1], candidates[best[0]], candidates
+
+def predict(points, cost_model):
+    """Return the predicted duration in seconds of the (iteration, pair, freq) points, in order, with cost_model."""
+    total = 0.0
+    pair = freq = None
+    for j, to_pair, to_freq in points:
+        total += cost_model.cost(pair, freq, to_pair, to_freq)
+        pair, freq = to_pair, to_freq
+    return total
+
+def predict_stages(points, cost_model):
+    """Return the predicted duration in seconds of the (iteration, pair, freq) points per stage (see CostModel.stage_costs)."""
+    totals = dict.fromkeys(STAGES, 0.0)
+    pair = freq = None
+    for j, to_pair, to_freq in points:
+        for stage, value in cost_model.stage_costs(pair, freq, to_pair, to_freq).items():
+            totals[stage] += value
+        pair, freq = to_pair, to_freq
+    return totals
+
+def _mhz(freq):
+    """Return frequency string freq (underscore for the decimal point) in MHz."""
+    return float(str(freq).replace("_", "."))
@@ -0,0 +1,371 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for recording the serial traffic of the device drivers (ltc6946_serial.DC590B and switching_matrix)
+        during a real sweep, and replaying it offline, so that timing problems seen on the bench can be reproduced,
+        profiled and regression tested without the hardware.
+
+        A transport is any object with a Serial(port, baudrate, ...) factory, as the pyserial module itself, which is
+        the default transport of both drivers (ltc6946_serial.default_transport and switching_matrix.default_transport,
+        or the transport argument of DC590B and SwitchingMatrix):
+            - RecordingTransport opens the ports with another transport (pyserial by default) and records every
+              write and read of every port, with its timestamp, duration and data (short reads, i.e. read timeouts
+              and dropped answers, included) to a JSON lines file;
+            - ReplayTransport opens ports answering from a recording: each read returns the recorded data after the
+              recorded device time (scaled by speed, e.g. speed = 10 for 10 times faster, speed = 0 for no waiting),
+              and each write is compared to the recorded one, so that a driver change altering the traffic is
+              reported (mismatches in stats, or ReplayError with strict = True).
+        Only the device side time is replayed: the time spent by the host between operations is the time of the
+        code under test.
+
+        Main usage:
+
+        $ with RecordingTransport("bench.jsonl") as recorder:          # at the bench
+        $     fsynth.default_transport = swm.default_transport = recorder
+        $     nbsys.ant_sweep(meas_parameters = MeasParameters)
+        $ replay = ReplayTransport("bench.jsonl", speed = 10)          # offline, ports opened by name as recorded
+        $ fctrl = fsynth.DC590B(port = replay.devices[0], transport = replay)
+
+Class::
+        RecordingTransport : opens ports recording their traffic.
+
+        RecordingPort : serial port wrapper recording its traffic.
+
+        ReplayTransport : opens ports replaying a recording.
+
+        ReplayPort : serial port answering from a recording.
+
+        ReplayError : replayed traffic differs from the recording.
+
+Functions::
+        read_recording : reads the header and events of a recording, tolerating a truncated last line.
+"""
+# Standard library imports
+from collections import defaultdict
+from datetime import datetime
+import json
+import threading
+import time
+from timeit import default_timer as timer
+
+# Third-party library imports
+import serial
+
+OPERATIONS = ("write", "read", "readline", "in_waiting", "reset_input_buffer")
+
+
+class ReplayError(IOError):
+    """Replayed traffic differs from the recording (strict replay)."""
+
+
+class RecordingTransport(object):
+    """Open serial ports with transport and record their traffic to a JSON lines file.
+
+    The first line is a header, followed by one event per port operation:
+    {"channel", "device", "op", "t", "duration", "data", "size"}, with t the start time in seconds since the header,
+    data the bytes written or read (latin-1) and size the number of bytes requested by a read.
+
+    Parameters
+    ----------
+    path : str
+        recording file path
+    transport : object, optional
+        transport opening the real ports, by default the pyserial module
+    """
+
+    def __init__(self, path, transport = serial):
+        self.path = path
+        self.transport = transport
+        self.channels = 0
+        self._lock = threading.Lock()
+        self._origin = timer()
+        self._file = open(path, 'w')
+        self._write({"type" : "serial recording", "created" : datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def Serial(self, port = None, *args, **kwargs):
+        """Open port with the transport, return it wrapped in a RecordingPort."""
+        return self.wrap(self.transport.Serial(port, *args, **kwargs), port)
+
+    def wrap(self, port, device = None):
+        """Return the open serial port (or emulated port) wrapped in a RecordingPort, recorded as device."""
+        with self._lock:
+            channel = self.channels
+            self.channels += 1
+        device = device if device is not None else getattr(port, "portstr", None)
+        self.record(channel, device, "open", timer(), 0.0)
+        return RecordingPort(port, self, channel, device)
+
+    def record(self, channel, device, op, start, duration, data = None, size = None):
+        """Append an event (start from timeit.default_timer, duration in seconds)."""
+        event = {"channel" : channel, "device" : device, "op" : op, "t" : start - self._origin, "duration" : duration}
+        if data is not None:
+            event["data"] = data.decode("latin-1") if isinstance(data, str) else data
+        if size is not None:
+            event["size"] = size
+        with self._lock:
+            if self._file is not None:
+                self._write(event)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, event):
+        self._file.write(json.dumps(event, sort_keys=True) + "\n")
+
+
+class RecordingPort(object):
+    """Serial port wrapper recording the writes and reads of port to a RecordingTransport."""
+
+    def __init__(self, port, recorder, channel, device):
+        self.port = port
+        self.recorder = recorder
+        self.channel = channel
+        self.device = device
+
+    def __getattr__(self, name):
+        return getattr(self.port, name)
+
+    @property
+    def in_waiting(self):
+        start = timer()
+        value = self.port.in_waiting
+        self.recorder.record(self.channel, self.device, "in_waiting", start, timer() - start, size = value)
+        return value
+
+    def write(self, data):
+        start = timer()
+        try:
+            return self.port.write(data)
+        finally:
+            self.recorder.record(self.channel, self.device, "write", start, timer() - start, data)
+
+    def read(self, size = 1):
+        start = timer()
+        data = self.port.read(size)
+        self.recorder.record(self.channel, self.device, "read", start, timer() - start, data, size)
+        return data
+
+    def readline(self):
+        start = timer()
+        data = self.port.readline()
+        self.recorder.record(self.channel, self.device, "readline", start, timer() - start, data)
+        return data
+
+    def reset_input_buffer(self):
+        start = timer()
+        self.port.reset_input_buffer()
+        self.recorder.record(self.channel, self.device, "reset_input_buffer", start, timer() - start)
+
+    def close(self):
+        self.recorder.record(self.channel, self.device, "close", timer(), 0.0)
+        self.port.close()
+
+
+class ReplayTransport(object):
+    """Open ports answering from a recording made by RecordingTransport.
+
+    The n-th opening of a device replays the n-th recorded port of that device.
+
+    Parameters
+    ----------
+    path : str
+        recording file path
+    speed : float, optional
+        replay speed, 1.0 for the recorded device times, larger to accelerate, 0 for no waiting, by default 1.0
+    strict : bool, optional
+        set True to raise ReplayError when the traffic differs from the recording, by default False counts it
+        in stats["mismatches"]
+
+    Attributes
+    ----------
+    devices : list of str
+        recorded devices, in order of first opening
+    stats : dict
+        "opens", "operations", "mismatches", "bytes_written", "bytes_read", "device_time" (recorded time of the
+        replayed operations) and "waited" (time slept), in seconds
+    """
+
+    def __init__(self, path, speed = 1.0, strict = False):
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.header, events = read_recording(path)
+        self._channels = defaultdict(list)
+        self._order = defaultdict(list)
+        self.devices = []
+        for event in events:
+            if event["op"] == "open":
+                self._order[event["device"]].append(event["channel"])
+                if event["device"] not in self.devices:
+                    self.devices.append(event["device"])
+            elif event["op"] in OPERATIONS:
+                self._channels[event["channel"]].append(event)
+        self.stats = {"opens" : 0, "operations" : 0, "mismatches" : 0, "bytes_written" : 0, "bytes_read" : 0,
+                        "device_time" : 0.0, "waited" : 0.0}
+        self._lock = threading.Lock()
+
+    def Serial(self, port = None, *args, **kwargs):
+        """Return a ReplayPort for the next recorded opening of port.
+
+        Raises
+        ------
+        serial.SerialException
+            if port has no (more) recorded openings, as pyserial does for a missing port
+        """
+        with self._lock:
+            if not self._order.get(port):
+                raise serial.SerialException("No recorded opening of port {} left in {}.".format(port, self.path))
+            channel = self._order[port].pop(0)
+            self.stats["opens"] += 1
+        return ReplayPort(self, port, self._channels[channel], kwargs.get("timeout"))
+
+    def _account(self, op, event, data = None):
+        """Count event and wait its recorded device time."""
+        wait = event["duration"] / self.speed if self.speed else 0.0
+        with self._lock:
+            self.stats["operations"] += 1
+            self.stats["device_time"] += event["duration"]
+            self.stats["waited"] += wait
+            if data is not None:
+                self.stats["bytes_written" if op == "write" else "bytes_read"] += len(data)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _mismatch(self, message):
+        if self.strict:
+            raise ReplayError(message)
+        with self._lock:
+            self.stats["mismatches"] += 1
+
+
+class ReplayPort(object):
+    """Serial port answering from the recorded events of one port (see ReplayTransport)."""
+
+    def __init__(self, transport, device, events, timeout = None):
+        self.transport = transport
+        self.portstr = self.port = device
+        self.timeout = timeout
+        self.is_open = True
+        self._events = events
+        self._next = 0
+
+    def isOpen(self):
+        return self.is_open
+
+    @property
+    def in_waiting(self):
+        event = self._take("in_waiting")
+        return event["size"] if event is not None else 0
+
+    def write(self, data):
+        event = self._take("write", data = data)
+        if event is not None and event["data"].encode("latin-1") != data:
+            self.transport._mismatch("{} write {!r} differs from the recorded {!r}.".format(self.port, data, event["data"]))
+        return len(data)
+
+    def read(self, size = 1):
+        event = self._take("read", size)
+        return event["data"].encode("latin-1") if event is not None else ""
+
+    def readline(self):
+        event = self._take("readline")
+        return event["data"].encode("latin-1") if event is not None else ""
+
+    def reset_input_buffer(self):
+        self._take("reset_input_buffer")
+
+    def close(self):
+        self.is_open = False
+
+    def _take(self, op, size = None, data = None):
+        """Return the next recorded event of op after waiting its device time, None past the end of the recording.
+
+        Recorded events of other operations skipped on the way are reported as mismatches.
+        """
+        for n in range(self._next, len(self._events)):
+            event = self._events[n]
+            if event["op"] == op:
+                break
+        else:
+            self.transport._mismatch("{} {} past the end of the recording.".format(self.port, op))
+            return None
+        if n > self._next:
+            self.transport._mismatch("{} {} skips {:d} recorded operations from {}.".format(self.port, op, n - self._next,
+                                        self._events[self._next]["op"]))
+        if size is not None and event.get("size") != size:
+            self.transport._mismatch("{} read of {:d} bytes, {} recorded.".format(self.port, size, event.get("size")))
+        self._next = n + 1
+        self.transport._account(op, event, data if data is not None else event.get("data"))
+        return event
+
+
+def read_recording(path):
+    """Return (header, events) of a recording, ignoring a truncated last line (e.g. after a crash)."""
+    header = None
+    events = []
+    with open(path, 'r') as fp:
+        for line in fp:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                break
+            if header is None:
+                header = event
+            else:
+                events.append(event)
+    if header is None or header.get("type") != "serial recording":
+        raise ValueError("{} is not a serial recording.".format(path))
+    return header, events
+
+
+if __name__ == '__main__':
+
+    # Record the DC590B traffic of a frequency sweep on the virtual rig, then replay it at several speeds with the
+    # same driver settings and with fast hop (which changes the traffic, reported as mismatches).
+
+    import os
+    import tempfile
+
+    from virtual_rig import VirtualRig, RigLatencies, VirtualDC590BPort
+    from Transmitter_LTC6946 import ltc6946_serial as fsynth
+
+    class VirtualPorts(object):
+        """Transport opening emulated DC590B ports of rig."""
+        def __init__(self, rig):
+            self.rig = rig
+        def Serial(self, port = None, *args, **kwargs):
+            return VirtualDC590BPort(self.rig)
+
+    freq_range = ["2000", "2025", "2050", "2075", "2100"] * 2
+    fd, path = tempfile.mkstemp(suffix = ".jsonl")
+    os.close(fd) # reopened by RecordingTransport
+
+    rig = VirtualRig(RigLatencies(port_open = 0.0, time_scale = 0.1))
+    with RecordingTransport(path, VirtualPorts(rig)) as recorder:
+        fctrl = fsynth.DC590B(port = "VIRTUAL", transport = recorder)
+        start = timer()
+        for freq in freq_range:
+            fctrl.freq_set(freq)
+            fctrl.read_registers()
+        print("Recorded: {0:d} retunes in {1:.3f} s".format(len(freq_range), timer() - start))
+
+    for speed, fast_hop in ((1.0, False), (10.0, False), (0, False), (0, True)):
+        replay = ReplayTransport(path, speed = speed)
+        fctrl = fsynth.DC590B(port = replay.devices[0], transport = replay, fast_hop = fast_hop)
+        start = timer()
+        for freq in freq_range:
+            fctrl.freq_set(freq)
+            fctrl.read_registers()
+        print("Replay speed {0} - fast hop: {1} - {2:.3f} s - {3}".format(speed, fast_hop, timer() - start, replay.stats))
+    os.remove(path)
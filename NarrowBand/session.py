@@ -0,0 +1,189 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for keeping the narrow band system devices open across calibration and measurement runs.
+
+        A HardwareSession opens the DC590B (COM port scan), the DC890 receiver (FPGA load) and the switching matrix
+        once, and is passed as the rig argument of the sweep and calibration functions, which then reuse the open
+        devices instead of opening them on every call (or, for cal_type 1, on every iteration).
+
+        Main usage:
+
+        $ with HardwareSession(MeasParameters["spi_registers"]) as session:
+        $     print session.health_check()
+        $     nbsys.cal_system(meas_parameters = MeasParameters, cal_type = 1, rig = session)
+        $     nbsys.ant_sweep(meas_parameters = MeasParameters, rig = session)
+
+Class::
+        HardwareSession : device factory with the system.HardwareRig interface, returning the same open devices on every call.
+"""
+# Standard library imports
+from timeit import default_timer as timer
+
+# Third-party imports
+import numpy as np
+
+# Local application imports
+from system import HardwareRig, TRIGGER_NONE
+from Transmitter_LTC6946 import ltc6946_serial as fsynth
+
+
+class HardwareSession(object):
+    """Open receiver, synthesizer and switching matrix once and share them across runs.
+
+    Parameters
+    ----------
+    spi_registers : list, optional
+        receiver SPI registers, by default []
+    verbose : bool, optional
+        set True for verbosity, by default False
+    rig : object or None, optional
+        device factory providing the devices, by default None for system.HardwareRig()
+        (e.g. virtual_rig.VirtualRig for a simulated session)
+    """
+
+    def __init__(self, spi_registers = [], verbose = False, rig = None):
+        self.rig = rig if rig is not None else HardwareRig()
+        self.spi_registers = spi_registers
+        self.verbose = verbose
+        self.stats = {"receiver_loads" : 0, "synthesizer_opens" : 0, "receiver_reuses" : 0, "synthesizer_reuses" : 0}
+
+        self._controller = None
+        self._fctrl = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def switch(self):
+        return self.rig.switch
+
+    @property
+    def name(self):
+        return getattr(self.rig, "name", None)
+
+    def open(self):
+        """Open the synthesizer and the receiver (if not already open)."""
+        self._open_synthesizer()
+        self._open_receiver(self.spi_registers)
+        return self
+
+    def close(self):
+        """Mute the synthesizer and close all devices."""
+        if self._fctrl is not None:
+            try:
+                self._fctrl.freq_set(freq = "0")
+            finally:
+                self._fctrl.close()
+                self._fctrl = None
+        self._close_receiver()
+
+    def receiver(self, spi_registers = None, verbose = False):
+        """Return a context manager giving the open receiver, reloading it only if spi_registers changed.
+
+        Leaving the context keeps the receiver open.
+        """
+        if spi_registers is not None and spi_registers != self.spi_registers:
+            self._close_receiver()
+            self.spi_registers = spi_registers
+        if self._controller is None:
+            self._open_receiver(self.spi_registers)
+        else:
+            self.stats["receiver_reuses"] += 1
+        return _SharedReceiver(self._controller)
+
+    def synthesizer(self):
+        """Return the open DC590B controller."""
+        if self._fctrl is None:
+            self._open_synthesizer()
+        else:
+            self.stats["synthesizer_reuses"] += 1
+        return self._fctrl
+
+    def health_check(self, num_samples = 1024):
+        """Check that every device answers, return a dictionary of results.
+
+        Keys:
+            "synthesizer" : DC590B answers the ID query
+            "pll_locked" : LTC6946 PLL Lock flag (only meaningful after a frequency was set)
+            "switch" : switching matrix port is open
+            "receiver" : a capture returned num_samples per channel with a varying signal
+            "capture" : per channel "dc", "rms", "min_code" and "max_code" of the test capture
+            "duration" : time taken by the checks, in seconds
+            "healthy" : True if synthesizer, switch and receiver checks passed
+
+        Parameters
+        ----------
+        num_samples : int, optional
+            number of samples of the test capture, by default 1024
+        """
+        start = timer()
+        result = {}
+
+        fctrl = self.synthesizer()
+        try:
+            result["synthesizer"] = fsynth.identify(fctrl.port)
+            result["pll_locked"] = fctrl.read_lock_flag()
+        except Exception:
+            result["synthesizer"] = False
+            result["pll_locked"] = False
+
+        is_open = getattr(self.switch, "is_open", None)
+        try:
+            result["switch"] = bool(is_open()) if is_open is not None else True
+        except Exception:
+            result["switch"] = False
+
+        try:
+            with self.receiver() as controller:
+                data = controller.collect(num_samples, TRIGGER_NONE)
+            result["capture"] = [{"dc" : float(np.mean(ch)), "rms" : float(np.std(ch)),
+                                    "min_code" : int(np.min(ch)), "max_code" : int(np.max(ch))} for ch in data]
+            result["receiver"] = all(len(ch) == num_samples and np.ptp(ch) > 0 for ch in data)
+        except Exception:
+            result["capture"] = None
+            result["receiver"] = False
+
+        result["healthy"] = result["synthesizer"] and result["switch"] and result["receiver"]
+        result["duration"] = timer() - start
+        return result
+
+    def reconnect(self):
+        """Close and reopen every device (e.g. after a failed health check)."""
+        self.close()
+        self.open()
+
+    def _open_synthesizer(self):
+        if self._fctrl is None:
+            self._fctrl = self.rig.synthesizer()
+            self.stats["synthesizer_opens"] += 1
+
+    def _open_receiver(self, spi_registers):
+        if self._controller is None:
+            controller = self.rig.receiver(spi_registers, self.verbose)
+            self._controller = controller.__enter__()
+            self.stats["receiver_loads"] += 1
+
+    def _close_receiver(self):
+        if self._controller is not None:
+            controller, self._controller = self._controller, None
+            controller.__exit__(None, None, None)
+
+
+class _SharedReceiver(object):
+    """Context manager returning an open receiver without closing it on exit."""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def __enter__(self):
+        return self.controller
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
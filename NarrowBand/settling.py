@@ -0,0 +1,446 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for waiting the right amount of time for the LTC6946 PLL to lock and the switching matrix to settle
+        before each capture.
+
+        Settling times are characterised once per rig (lock time per frequency transition and settle time per antenna
+        pair transition) and stored as a lookup table in a JSON file. During a sweep, a Settler either polls the PLL
+        Lock flag or waits exactly the modelled lock time, and waits the modelled switch settle time, just before collect.
+        Register read-back verification runs on a sampled subset of frequency steps.
+
+        Main usage:
+
+        $ model = characterise(rig, freq_range, pairs)   # once, with a phantom or cal type 3 setup providing a signal
+        $ model.save("settling.json")
+        $ nbsys.ant_sweep(meas_parameters = MeasParameters, settling = Settler(SettlingModel.load("settling.json"), verify_fraction = 0.02))
+
+Class::
+        SettlingModel : lookup tables of PLL lock and switch settle times.
+
+        Settler : applies a SettlingModel during a sweep (used through the settling argument of the sweep functions).
+
+        NullSettler : Settler interface without any waits (previous behaviour).
+
+Functions::
+        characterise : measure lock and settle times of a rig for the transitions of a sweep, return a SettlingModel.
+
+        characterise_lock : measure PLL lock times by polling the lock flag.
+
+        characterise_switch : measure switch settle times from captures taken after increasing delays.
+
+        sweep_transitions : consecutive (from, to) transitions of a repeated sequence.
+"""
+# Standard library imports
+from datetime import datetime
+import json
+import random
+import time
+from timeit import default_timer as timer
+
+# Third-party imports
+import numpy as np
+
+# Local application imports
+from Transmitter_LTC6946.register_mapping import register_values_list
+
+
+class SettlingModel(object):
+    """Lookup tables of PLL lock times per frequency transition and switch settle times per antenna pair transition.
+
+    Transitions missing from a table use the longest time measured for the same destination, then the longest time
+    in the table, then the default.
+
+    Parameters
+    ----------
+    lock_times : dict or None, optional
+        {(from_freq, to_freq) : seconds}, frequencies as strings (from_freq is None for the first step), by default None
+    switch_times : dict or None, optional
+        {((from_tx, from_rx), (to_tx, to_rx)) : seconds}, by default None
+    lock_default : float, optional
+        lock time for an empty table, by default 5e-3
+    switch_default : float, optional
+        settle time for an empty table, by default 5e-3
+    margin : float, optional
+        factor applied to every table value, by default 1.0
+    """
+
+    def __init__(self, lock_times = None, switch_times = None, lock_default = 5e-3, switch_default = 5e-3, margin = 1.0):
+        self.lock_times = dict(lock_times) if lock_times is not None else {}
+        self.switch_times = dict(switch_times) if switch_times is not None else {}
+        self.lock_default = lock_default
+        self.switch_default = switch_default
+        self.margin = margin
+
+    def lock_time(self, from_freq, to_freq):
+        """Return the modelled lock time in seconds for a transition between two frequencies (strings)."""
+        return self.margin * _lookup(self.lock_times, from_freq, to_freq, self.lock_default)
+
+    def switch_time(self, from_pair, to_pair):
+        """Return the modelled settle time in seconds for a transition between two (Tx, Rx) pairs."""
+        if from_pair is not None:
+            from_pair = tuple(from_pair)
+        return self.margin * _lookup(self.switch_times, from_pair, tuple(to_pair), self.switch_default)
+
+    def save(self, file_path):
+        """Save the model to a JSON file."""
+        model = {"created" : datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    "lock_default" : self.lock_default,
+                    "switch_default" : self.switch_default,
+                    "margin" : self.margin,
+                    "lock" : sorted([f0, f1, t] for (f0, f1), t in self.lock_times.items()),
+                    "switch" : sorted([p0, p1, t] for (p0, p1), t in self.switch_times.items())}
+        with open(file_path, 'w') as fp:
+            json.dump(model, fp, sort_keys=True, indent=4)
+
+    @classmethod
+    def load(cls, file_path):
+        """Return the model saved in a JSON file."""
+        with open(file_path, 'r') as fp:
+            model = json.load(fp)
+        lock_times = dict(((_str(f0), _str(f1)), t) for f0, f1, t in model["lock"])
+        switch_times = dict(((tuple(p0) if p0 is not None else None, tuple(p1)), t) for p0, p1, t in model["switch"])
+        return cls(lock_times, switch_times, model["lock_default"], model["switch_default"], model.get("margin", 1.0))
+
+
+class Settler(object):
+    """Wait for PLL lock and switch settling before each capture, using a SettlingModel.
+
+    The sweep functions call freq_set and set_pair instead of the device methods, and wait() right before collect.
+    The Settler keeps the current frequency and pair, so it can be reused across sweeps.
+
+    Parameters
+    ----------
+    model : SettlingModel or None, optional
+        settling lookup tables, by default None for SettlingModel() defaults
+    mode : str, optional
+        "model" to wait the modelled lock time, "poll" to poll the PLL Lock flag, by default "model"
+    poll_timeout : float, optional
+        maximum time in seconds polling the lock flag; on timeout the frequency is set again and polled once more,
+        then wait() raises IOError, by default 0.1
+    verify_fraction : float, optional
+        fraction of frequency steps (the first step is always included) with register read-back verification,
+        by default 0.0
+    seed : int or None, optional
+        seed for choosing the verified steps, by default None
+    """
+
+    def __init__(self, model = None, mode = "model", poll_timeout = 0.1, verify_fraction = 0.0, seed = None):
+        if mode not in ("model", "poll"):
+            raise ValueError("Settler mode must be 'model' or 'poll', got {}.".format(mode))
+        self.model = model if model is not None else SettlingModel()
+        self.mode = mode
+        self.poll_timeout = poll_timeout
+        self.verify_fraction = verify_fraction
+        self._rng = random.Random(seed)
+
+        self.freq = None
+        self.pair = None
+        self._fctrl = None
+        self._lock_pending = False
+        self._lock_deadline = 0.0
+        self._switch_deadline = 0.0
+        self._verify = False
+        self._readback = None
+        self._switch_ack = None
+
+        self.stats = {"freq_steps" : 0, "pair_steps" : 0, "lock_wait" : 0.0, "switch_wait" : 0.0,
+                        "polls" : 0, "unlocked" : 0, "verified" : 0, "mismatched" : 0}
+
+    def freq_set(self, fctrl, freq, verbose = False, msg = None):
+        """Set frequency freq with the DC590B fctrl (with the pre-encoded SPI burst msg, if given) and start its lock timer.
+
+        For verified steps, the register read-back is sent in the same transfer as the burst and its answer is read
+        by wait() (see ltc6946_serial.CommandQueue).
+        """
+        self._verify = self.stats["freq_steps"] == 0 or self._rng.random() < self.verify_fraction
+        if self._verify:
+            with fctrl.queue.batch():
+                fctrl.freq_set(freq = freq, verbose = verbose, msg = msg)
+                self._readback = fctrl.queue.spi_read(1, len(register_values_list(freq)))
+        else:
+            fctrl.freq_set(freq = freq, verbose = verbose, msg = msg)
+        self._lock_deadline = timer() + self.model.lock_time(self.freq, freq)
+        self._lock_pending = True
+        self._fctrl = fctrl
+        self.freq = freq
+        self.stats["freq_steps"] += 1
+
+    def set_pair(self, switch, TX, RX):
+        """Set antenna pair (TX, RX) with the switching matrix and start its settle timer.
+
+        With a matrix acknowledging its commands (switching_matrix.SwitchingMatrix with acked set), the
+        acknowledgement is waited by wait(), so that the PLL lock and the relay switching overlap.
+        """
+        if getattr(switch, "acked", False):
+            self._switch_ack = (switch, switch.set_pair(TX, RX, wait = False))
+        else:
+            switch.set_pair(TX, RX)
+        self._switch_deadline = timer() + self.model.switch_time(self.pair, (TX, RX))
+        self.pair = (TX, RX)
+        self.stats["pair_steps"] += 1
+
+    def wait(self):
+        """Block until the last frequency and pair changes are settled.
+
+        Raises
+        ------
+        IOError
+            if a verified step still has wrong register values after setting the frequency again, or (poll mode) if
+            the PLL is still unlocked after setting the frequency again, so that no capture is taken on an unlocked
+            synthesizer
+        """
+        if self._lock_pending:
+            self._wait_lock()
+            if self._verify:
+                self._verify_registers()
+            self._lock_pending = False
+
+        if self._switch_ack is not None:
+            switch, seq = self._switch_ack
+            self._switch_ack = None
+            switch.wait_ack(seq)
+        remaining = self._switch_deadline - timer()
+        if remaining > 0:
+            time.sleep(remaining)
+            self.stats["switch_wait"] += remaining
+
+    def fork(self):
+        """Return a new Settler with the same model and settings and its own state, for another rig (see multi_rig module)."""
+        return Settler(self.model, self.mode, self.poll_timeout, self.verify_fraction, seed = self._rng.random())
+
+    def report(self):
+        """Return a short human readable summary of the settling statistics."""
+        return ("Settling: {freq_steps:d} frequency steps ({lock_wait:.3f} s lock wait, {polls:d} polls, {unlocked:d} unlocked), "
+                "{pair_steps:d} pair steps ({switch_wait:.3f} s settle wait), {verified:d} verified ({mismatched:d} mismatched)").format(**self.stats)
+
+    def _wait_lock(self):
+        start = timer()
+        if self.mode == "poll":
+            if not self._poll_lock_flag():
+                self.stats["unlocked"] += 1
+                self._fctrl.invalidate()
+                self._fctrl.freq_set(freq = self.freq)
+                if not self._poll_lock_flag():
+                    self.stats["lock_wait"] += timer() - start
+                    raise IOError("LTC6946 PLL did not lock at {} MHz after setting the frequency again.".format(self.freq))
+        else:
+            remaining = self._lock_deadline - start
+            if remaining > 0:
+                time.sleep(remaining)
+        self.stats["lock_wait"] += timer() - start
+
+    def _poll_lock_flag(self):
+        start = timer()
+        while True:
+            self.stats["polls"] += 1
+            if self._fctrl.read_lock_flag():
+                return True
+            if timer() - start > self.poll_timeout:
+                return False
+
+    def _verify_registers(self):
+        expected = ['04'] + register_values_list(self.freq)
+        self.stats["verified"] += 1
+        locked = self._fctrl.read_lock_flag() # its barrier also reads the pipelined read-back
+        try:
+            values = self._readback.result()
+        except IOError:
+            values = None
+        self._readback = None
+        if locked and values == expected[1:]:
+            return
+        self.stats["mismatched"] += 1
+        self._fctrl.invalidate()
+        self._fctrl.freq_set(freq = self.freq)
+        self._lock_deadline = timer() + self.model.lock_time(None, self.freq)
+        self._wait_lock()
+        if self._fctrl.read_registers(len(expected)) != expected:
+            raise IOError("LTC6946 register read-back does not match the values for {} MHz.".format(self.freq))
+
+
+class NullSettler(object):
+    """Settler interface calling the devices directly, without waits or verification."""
+
+    def freq_set(self, fctrl, freq, verbose = False, msg = None):
+        fctrl.freq_set(freq = freq, verbose = verbose, msg = msg)
+
+    def set_pair(self, switch, TX, RX):
+        switch.set_pair(TX, RX)
+
+    def wait(self):
+        pass
+
+    def fork(self):
+        return self
+
+NULL_SETTLER = NullSettler()
+
+
+def sweep_transitions(sequence):
+    """Return the unique (from, to) transitions of sequence repeated in a loop, plus (None, first) for the first step."""
+    sequence = list(sequence)
+    transitions = [(None, sequence[0])] if sequence else []
+    for transition in zip(sequence, sequence[1:] + sequence[:1]):
+        if transition not in transitions and transition[0] != transition[1]:
+            transitions.append(transition)
+    return transitions
+
+def characterise_lock(fctrl, transitions, repeats = 3, timeout = 0.1):
+    """Measure PLL lock times by setting each transition and polling the lock flag.
+
+    The measured time includes the serial round trip of each poll (about 6 bytes at 9600 baud),
+    so it is an upper bound of the lock time.
+
+    Parameters
+    ----------
+    fctrl : DC590B
+        opened frequency synthesizer controller
+    transitions : list of tuple
+        (from_freq, to_freq) transitions, from_freq may be None
+    repeats : int, optional
+        number of measurements per transition, the longest is kept, by default 3
+    timeout : float, optional
+        maximum time in seconds to wait for lock, by default 0.1
+
+    Returns
+    -------
+    dict
+        {(from_freq, to_freq) : seconds}
+
+    Raises
+    ------
+    IOError
+        if the PLL does not lock within timeout
+    """
+    lock_times = {}
+    for from_freq, to_freq in transitions:
+        longest = 0.0
+        for _ in range(repeats):
+            if from_freq is not None:
+                fctrl.freq_set(freq = from_freq)
+                _poll_lock(fctrl, timeout)
+            fctrl.freq_set(freq = to_freq)
+            longest = max(longest, _poll_lock(fctrl, timeout))
+        lock_times[(from_freq, to_freq)] = longest
+    return lock_times
+
+def characterise_switch(switch, controller, transitions, num_samples = 1024, trigger = 0,
+                        delays = (0.0, 0.5e-3, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3), reference_delay = 0.1,
+                        tolerance = 0.05, repeats = 2):
+    """Measure switch settle times from the signal level of captures taken after increasing delays.
+
+    For each transition, a reference capture is taken reference_delay seconds after switching. The settle time is the
+    shortest delay for which repeats captures are within tolerance (relative RMS per channel) of the reference.
+    The synthesizer must already be locked on a frequency giving a signal on every pair.
+
+    Parameters
+    ----------
+    switch : object
+        switching matrix with set_pair(TX, RX)
+    controller : Dc1513bAa
+        receiver, already entered
+    transitions : list of tuple
+        (from_pair, to_pair) transitions, from_pair may be None
+    num_samples : int, optional
+        number of samples per capture, by default 1024
+    trigger : int, optional
+        trigger type for collect, by default 0 (TRIGGER_NONE)
+    delays : tuple of float, optional
+        candidate delays in seconds, in increasing order, by default (0.0, 0.5e-3, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3)
+    reference_delay : float, optional
+        delay in seconds for the reference capture, by default 0.1
+    tolerance : float, optional
+        maximum relative RMS difference to the reference, by default 0.05
+    repeats : int, optional
+        number of captures that must agree with the reference, by default 2
+
+    Returns
+    -------
+    dict
+        {(from_pair, to_pair) : seconds}, reference_delay if no candidate delay was within tolerance
+    """
+    def level(from_pair, to_pair, delay):
+        if from_pair is not None:
+            switch.set_pair(*from_pair)
+            time.sleep(reference_delay)
+        switch.set_pair(*to_pair)
+        time.sleep(delay)
+        return np.array([np.std(channel) for channel in controller.collect(num_samples, trigger)])
+
+    settle_times = {}
+    for from_pair, to_pair in transitions:
+        reference = level(from_pair, to_pair, reference_delay)
+        settle_times[(from_pair, to_pair)] = reference_delay
+        for delay in delays:
+            if all(np.all(np.abs(level(from_pair, to_pair, delay) - reference) <= tolerance * reference) for _ in range(repeats)):
+                settle_times[(from_pair, to_pair)] = delay
+                break
+    return settle_times
+
+def characterise(rig, freq_range, pairs, spi_registers = [], num_samples = 1024, switch_freq = None, repeats = 3, verbose = False):
+    """Characterise lock and settle times of a rig for the transitions of a sweep over freq_range and pairs.
+
+    Parameters
+    ----------
+    rig : object
+        device factory with receiver(spi_registers, verbose), synthesizer() and switch (see system.HardwareRig)
+    freq_range : list or tuple of str
+        sweep frequencies in MHz, with underscores "_" replacing dots "."
+    pairs : list of tuple
+        sweep antenna pairs (Tx, Rx)
+    spi_registers : list, optional
+        receiver SPI registers, by default []
+    num_samples : int, optional
+        number of samples per capture, by default 1024
+    switch_freq : str or None, optional
+        frequency used for the switch characterisation, by default None for the middle of freq_range
+    repeats : int, optional
+        number of lock time measurements per transition, by default 3
+    verbose : bool, optional
+        set True for verbosity, by default False
+
+    Returns
+    -------
+    SettlingModel
+        model with the measured tables
+    """
+    fctrl = rig.synthesizer()
+    lock_times = characterise_lock(fctrl, sweep_transitions(freq_range), repeats = repeats)
+    if verbose:
+        print "Measured {} PLL lock transitions, longest {:.4f} s".format(len(lock_times), max(lock_times.values()))
+
+    if switch_freq is None:
+        switch_freq = freq_range[len(freq_range)//2]
+    fctrl.freq_set(freq = switch_freq)
+    _poll_lock(fctrl, 0.1)
+    with rig.receiver(spi_registers, verbose) as controller:
+        switch_times = characterise_switch(rig.switch, controller, sweep_transitions(pairs), num_samples)
+    fctrl.freq_set(freq = "0")
+    if verbose:
+        print "Measured {} switch transitions, longest {:.4f} s".format(len(switch_times), max(switch_times.values()))
+
+    return SettlingModel(lock_times, switch_times,
+                            lock_default = max(lock_times.values()), switch_default = max(switch_times.values()))
+
+def _poll_lock(fctrl, timeout):
+    start = timer()
+    while not fctrl.read_lock_flag():
+        if timer() - start > timeout:
+            raise IOError("LTC6946 PLL did not lock within {} s.".format(timeout))
+    return timer() - start
+
+def _lookup(table, source, destination, default):
+    if (source, destination) in table:
+        return table[(source, destination)]
+    same_destination = [t for (s, d), t in table.items() if d == destination]
+    if same_destination:
+        return max(same_destination)
+    if table:
+        return max(table.values())
+    return default
+
+def _str(value):
+    return str(value) if value is not None else None
@@ -0,0 +1,196 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for compiling the measurement configuration of a sweep into an immutable plan before any device is
+        opened, so that configuration errors stop the sweep before the first capture and the acquisition loop only
+        executes precomputed steps.
+
+        Compiling a plan:
+            - checks every frequency of freq_range against the LTC6946 register settings (register_mapping tables,
+              or computed by the register_synth module for the other frequencies within the LTC6946-2 limits)
+              and every antenna pair against the switching matrix ports, raising ValueError for invalid values;
+            - orders the steps with a scheduler (see scheduler module), e.g. iteration -> pair -> frequency for "ant_sweep"
+              and iteration -> frequency -> pair for "ant_sweep_alt", and predicts the sweep duration;
+            - resolves the .adc and .fft file paths of every step, checking that no two steps write the same file;
+            - pre-encodes the SPI burst of every frequency (and of the muted output, "0").
+
+        The output folders are created at once by make_directories.
+
+        Main usage:
+
+        $ plan = compile_plan(meas_parameters, order = "ant_sweep", do_FFT = True)    # raises ValueError on invalid settings
+        $ plan.make_directories()
+        $ for step in plan.steps:
+        $     ...                    # set step.pair and step.freq (with step.burst), collect, write step.adc_path and step.fft_path
+
+Class::
+        PlanStep : one capture of a sweep plan.
+
+        SweepPlan : immutable ordered list of plan steps, with the output folders and SPI bursts.
+
+Functions::
+        compile_plan : compiles meas_parameters into a SweepPlan.
+"""
+# Standard library imports
+from collections import namedtuple
+import os
+
+# Local application imports
+from scheduler import schedule
+from Transmitter_LTC6946 import register_synth
+from Transmitter_LTC6946.register_mapping import regs, _freq2str
+
+NUM_ANTENNAS = 16
+
+
+class PlanStep(namedtuple("PlanStep", ["iteration", "tx", "rx", "freq", "burst", "adc_path", "fft_path"])):
+    """One capture of a sweep plan.
+
+    Attributes
+    ----------
+    iteration : int
+        iteration number, starting at 1
+    tx, rx : int
+        antenna pair
+    freq : str
+        frequency in MHz, as in meas_parameters["freq_range"]
+    burst : str
+        DC590B SPI burst setting freq on the LTC6946
+    adc_path : str
+        .adc file path
+    fft_path : str or None
+        .fft file path, None if the FFT is not recorded
+    """
+
+    __slots__ = ()
+
+    @property
+    def pair(self):
+        return (self.tx, self.rx)
+
+    @property
+    def key(self):
+        """(iteration, Tx, Rx, frequency), as recorded in the capture journal."""
+        return (self.iteration, self.tx, self.rx, self.freq)
+
+
+class SweepPlan(namedtuple("SweepPlan", ["order", "iterations", "pairs", "freq_range", "steps", "directories", "mute",
+                                            "predicted", "candidates"])):
+    """Immutable plan of a sweep, created by compile_plan.
+
+    Attributes
+    ----------
+    order : str
+        name of the scheduler ordering the steps (see scheduler module)
+    iterations : int
+        number of iterations
+    pairs : tuple of tuple
+        antenna pairs (Tx, Rx)
+    freq_range : tuple of str
+        frequencies in MHz
+    steps : tuple of PlanStep
+        captures in acquisition order
+    directories : tuple of str
+        output folders of the steps
+    mute : str
+        DC590B SPI burst muting the LTC6946 output (frequency "0")
+    predicted : float
+        predicted sweep duration in seconds
+    candidates : dict
+        {order : predicted duration} of the schedulers evaluated
+    """
+
+    __slots__ = ()
+
+    def iteration_steps(self, iteration):
+        """Return the steps of iteration (starting at 1), in acquisition order."""
+        per_iteration = len(self.pairs) * len(self.freq_range)
+        return self.steps[(iteration - 1)*per_iteration:iteration*per_iteration]
+
+    def make_directories(self):
+        """Create the output folders that do not exist yet, return the number of folders created."""
+        created = 0
+        for directory in self.directories:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+                created += 1
+        return created
+
+
+def compile_plan(meas_parameters, order = "ant_sweep", do_FFT = False, cost_model = None):
+    """Compile the measurement configuration into a sweep plan, validating it before any device is opened.
+
+    Parameters
+    ----------
+    meas_parameters : dict
+        dictionary with "measurement configuration parameters", with "data_file" already completed by
+        system._generate_file_path (only the "ANTPAIR", "FREQ" and "ITE" placeholders left)
+    order : str or function, optional
+        scheduler name ("ant_sweep", "ant_sweep_alt", "serpentine" or "serpentine_alt"), "auto" for the one of these
+        four with the lowest predicted duration, or a scheduler function (see scheduler module), by default "ant_sweep"
+    do_FFT : bool, optional
+        set True to include the .fft file paths, by default False
+    cost_model : scheduler.CostModel or None, optional
+        operation costs used to predict the duration and choose the "auto" order, by default None for default costs
+
+    Returns
+    ----------
+    SweepPlan
+        immutable sweep plan
+
+    Raises
+    ------
+    ValueError
+        for an unknown order or an invalid scheduler, a frequency without LTC6946 register settings, an invalid or repeated antenna pair,
+        a number of iterations below 1, or file paths shared by several steps
+    """
+
+    iterations = meas_parameters["iter"]
+    if iterations < 1:
+        raise ValueError("Number of iterations must be at least 1, got {}.".format(iterations))
+
+    freq_range = tuple(meas_parameters["freq_range"])
+    bursts = dict((freq, _burst(freq)) for freq in freq_range)
+    if len(set(freq_range)) != len(freq_range):
+        raise ValueError("Repeated frequencies in freq_range: {}.".format(freq_range))
+
+    pairs = tuple(tuple(pair) for pair in meas_parameters["pairs"])
+    for pair in pairs:
+        _check_pair(pair)
+    if len(set(pairs)) != len(pairs):
+        raise ValueError("Repeated antenna pairs in pairs.")
+
+    order, points, predicted, candidates = schedule(pairs, freq_range, iterations, order, cost_model)
+
+    data_file = meas_parameters["data_file"]
+    steps = []
+    for j, (TX, RX), freq in points:
+        adc_path = data_file.replace("ANTPAIR", "Tx {0:d} Rx {1:d}".format(TX, RX)).replace("FREQ", freq).replace("ITE", str(j))
+        steps.append(PlanStep(j, TX, RX, freq, bursts[freq], adc_path, adc_path.replace(".adc", ".fft") if do_FFT else None))
+
+    if len(set(step.adc_path for step in steps)) != len(steps):
+        raise ValueError("data_file {} gives the same file path to several captures.".format(data_file))
+
+    directories = tuple(sorted(set(os.path.dirname(step.adc_path) for step in steps)))
+    return SweepPlan(order, iterations, pairs, freq_range, tuple(steps), directories, _burst("0"), predicted, candidates)
+
+def _burst(freq):
+    """Return the SPI burst of freq, raising ValueError for frequencies without register settings."""
+    try:
+        return regs[freq]
+    except KeyError:
+        try:
+            return regs[_freq2str(freq)]
+        except KeyError:
+            try:
+                return register_synth.burst(freq)
+            except ValueError as error:
+                raise ValueError("No LTC6946 register settings for frequency {} MHz: {}".format(freq, error))
+
+def _check_pair(pair):
+    """Raise ValueError if pair is not (Tx, Rx) with two different antenna numbers of the switching matrix."""
+    if (len(pair) != 2 or not all(isinstance(n, (int, long)) and 1 <= n <= NUM_ANTENNAS for n in pair)
+            or pair[0] == pair[1]):
+        raise ValueError("Invalid antenna pair {}, expected (Tx, Rx) with different antennas from 1 to {:d}.".format(pair, NUM_ANTENNAS))
@@ -14,8 +14,13 @@ Description:
 Class::
         Dc1513bAa(dc890.Demoboard): defined for communication with the D890B demo board.
 
+        HardwareRig: device factory for the physical system (see virtual_rig module for the simulated one).
+
 Functions::
 
+        sweep : performs scans for selected antenna pairs, for all selected input frequencies,
+                in the order chosen by a scheduler (see scheduler module)
+
         ant_sweep : performs scans for selected antenna pairs, for all selected input frequencies
                     in order order antenna pair switching -> frequency switching
 
@@ -26,12 +31,30 @@ Functions::
 
 Inner functions::
 
+        _estimate_sweep
+
+        _trim_iterations
+
         _generate_file_path
 
         _generate_file_path2
 
         _generate_cal_file_path
 
+        _compile_cal_plan
+
+        _generate_config_file_path
+
+        _generate_hdf5_file_path
+
+        _run_parameters
+
+        _publish_results
+
+        _open_journal
+
+        _open_store
+
         _save_json_exp
 
         _save_json_cal
@@ -41,16 +64,18 @@ Written by: Leonardo Fortaleza
 With code by Anne-Marie Zaccarin on Dc1513bAa(dc890.Demoboard) and its data collection, adapted from Linear Technology.
 """
 # Standard library imports
+from contextlib import contextmanager
 import copy
 from datetime import datetime
 import json
 import os, sys
+import threading
 import time
 
 # checks proper folder for Linear Lab Tools and adds to path
-lltpath = '{}/Documents/Analog Devices/linear_lab_tools64/python/'.format(os.environ['USERPROFILE'])
+lltpath = '{}/Documents/Analog Devices/linear_lab_tools64/python/'.format(os.environ.get('USERPROFILE', os.path.expanduser('~')))
 if not os.path.exists(os.path.dirname(lltpath)):
-    lltpath = '{}/Documents/linear_technology/linear_lab_tools64/python/'.format(os.environ['USERPROFILE'])
+    lltpath = '{}/Documents/linear_technology/linear_lab_tools64/python/'.format(os.environ.get('USERPROFILE', os.path.expanduser('~')))
 sys.path.insert(1,lltpath)
 
 # Third-party imports
@@ -59,45 +84,180 @@ from timeit import default_timer as timer
 from tqdm.auto import tqdm
 
 # Local  Linear Technology imports
-import llt.common.constants as consts
-import llt.common.dc890 as dc890
-import llt.common.functions as funcs
+try:
+    import llt.common.constants as consts
+    import llt.common.dc890 as dc890
+    import llt.common.functions as funcs
+except ImportError: # Linear Lab Tools not installed (e.g. Linux), only simulated receivers (virtual_rig module) can be used
+    consts = dc890 = funcs = None
 
 # Local application imports
+from capture_journal import CaptureJournal
+from averaging import FrameAverager
+from capture_writer import CaptureWriter, WriterStats
+from discovery import find_port
+from estimator import (EtaTracker, LearnedCostModel, choose_trim, estimate, format_duration,
+                        profile_key, trim_options, TrimOption)
+from hdf5_store import SweepStore, write_parameters
+from multi_rig import open_rigs, rig_executor, ShardedExecutor
+from scheduler import CostModel, predict
+from settling import NULL_SETTLER
+from sweep_plan import compile_plan
+from tracing import NULL_TRACER, Tracer
 from ReceiverFFT import ReceiverFFT as rfft
 from SwitchingMatrix import switching_matrix as swm
 from Transmitter_LTC6946 import ltc6946_serial as fsynth
 
+TRIGGER_NONE = consts.TRIGGER_NONE if consts is not None else 0
+
+# keys of the run dictionary of a sweep copied back to the caller's meas_parameters at its end (results of the run)
+SWEEP_RESULTS = ("start", "end", "meas_duration", "iter_duration", "schedule", "pipeline_stats", "rigs", "settling_stats",
+                    "resumed_points", "trimmed", "hdf5_file")
+
 
-class Dc1513bAa(dc890.Demoboard):
+class Dc1513bAa(dc890.Demoboard if dc890 is not None else object):
     """
         A DC890 demo board with settings for the DC1513B-AA.
     """
 
-    def __init__(self, spi_registers, verbose = False):
-        dc890.Demoboard.__init__(self,
-                                dc_number           = 'DC_1513B-AA',
-                                fpga_load           = 'CMOS',
-                                num_channels        = 2,
-                                is_positive_clock   = False,
-                                num_bits            = 14,
-                                alignment           = 14,
-                                is_bipolar          = True,
-                                spi_reg_values      = spi_registers,
-                                verbose             = verbose)
-
-def ant_sweep(meas_parameters, window = 'hann', do_plot = False, do_FFT = False, save_json = True, display=False):
+    def __init__(self, spi_registers, verbose = False, serial_number = None):
+        if dc890 is None:
+            raise ImportError("Linear Lab Tools not found, the DC890 receiver is unavailable (see virtual_rig module for a simulated rig).")
+        with _select_dc890(serial_number):
+            dc890.Demoboard.__init__(self,
+                                    dc_number           = 'DC_1513B-AA',
+                                    fpga_load           = 'CMOS',
+                                    num_channels        = 2,
+                                    is_positive_clock   = False,
+                                    num_bits            = 14,
+                                    alignment           = 14,
+                                    is_bipolar          = True,
+                                    spi_reg_values      = spi_registers,
+                                    verbose             = verbose)
+        self._collected = None
+
+    def start_collect(self, num_samples, trigger, timeout = 5):
+        """Start a capture and wait until it is sampled, the data is then transferred by read_collect.
+
+        Same steps as dc890.Demoboard.collect, split at the end of the sampling so that the synthesizer and the
+        switching matrix can be reconfigured during the USB transfer (see device_actors.OverlappedExecutor).
+
+        Raises
+        ------
+        IOError
+            if the capture is not done within timeout seconds (missed trigger)
+        """
+        self.controller.data_start_collect(num_samples * self.num_channels, trigger)
+        for _ in range(int(10 * timeout)):
+            if self.controller.data_is_collect_done():
+                break
+            time.sleep(0.1)
+        else:
+            self.controller.data_cancel_collect()
+            raise IOError("DC890 data collect timed out (missed trigger?).")
+        self._collected = num_samples
+
+    def read_collect(self):
+        """Transfer the data sampled by start_collect over USB, return the channel data."""
+        num_samples, self._collected = self._collected, None
+        if num_samples is None:
+            raise RuntimeError("read_collect called without start_collect.")
+        self.controller.dc890_flush()
+        num_bytes, data = self.controller.data_receive_uint16_values(end = num_samples * self.num_channels)
+        if num_bytes != 2 * num_samples * self.num_channels:
+            raise IOError("DC890 returned {} bytes instead of {}.".format(num_bytes, 2 * num_samples * self.num_channels))
+        data = self.fix_data(data, False, False)
+        return funcs.scatter(data, self.num_channels)
+
+class HardwareRig(object):
+    """Device factory for the physical narrow band system, used by default by the sweep functions.
+
+    Provides the same interface as virtual_rig.VirtualRig:
+        receiver(spi_registers, verbose) -- DC890/DC1513B-AA receiver context (Dc1513bAa)
+        synthesizer() -- opened DC590B controller for the LTC6946 frequency synthesizer
+        switch -- switching matrix with set_pair(TX, RX)
+
+    By default the first devices found are used, the DC590B port being found by the discovery module (cached
+    between runs). Give the ports and serial number to use several rigs at once (see multi_rig module).
+
+    Parameters
+    ----------
+    name : str or None, optional
+        rig name in multi-rig statistics, by default None
+    synthesizer_port : str or None, optional
+        DC590B serial port (e.g. "COM5"), by default None for discovery.find_port
+    switch_port : str or None, optional
+        switching matrix serial port, by default None to use the switching_matrix module (first matrix found)
+    receiver_serial : str or None, optional
+        DC890 serial number, by default None for the first DC890 found
+    switch_command_set : str, optional
+        switching matrix command set, "SMC" or "HEF", by default "SMC"
+    switch_acked : bool, optional
+        set True for a switching matrix firmware with the acknowledged protocol (schedule upload and pipelined
+        switching, see switching_matrix.SwitchingMatrix), by default False
+    """
+
+    def __init__(self, name = None, synthesizer_port = None, switch_port = None, receiver_serial = None,
+                    switch_command_set = "SMC", switch_acked = False):
+        self.name = name
+        self.synthesizer_port = synthesizer_port
+        self.receiver_serial = receiver_serial
+        if switch_port is not None or switch_acked or switch_command_set != "SMC":
+            self.switch = swm.SwitchingMatrix(switch_port, command_set = switch_command_set, acked = switch_acked)
+        else:
+            self.switch = swm
+
+    def receiver(self, spi_registers, verbose = False):
+        return Dc1513bAa(spi_registers, verbose, serial_number = self.receiver_serial)
+
+    def synthesizer(self):
+        port = self.synthesizer_port if self.synthesizer_port is not None else find_port("dc590b")
+        return fsynth.DC590B(port = port)
+
+_dc890_lock = threading.Lock()
+
+@contextmanager
+def _select_dc890(serial_number):
+    """Make Linear Lab Tools list only the DC890 with serial_number while a Demoboard connects (all DC890 if None)."""
+    if serial_number is None:
+        yield
+        return
+    comm = getattr(dc890, "comm", None)
+    if comm is None:
+        raise ImportError("This version of Linear Lab Tools does not allow selecting the DC890 by serial number.")
+    with _dc890_lock:
+        list_controllers = comm.list_controllers
+        def matching(*args, **kwargs):
+            return [info for info in list_controllers(*args, **kwargs) if info.get_serial_number() == serial_number]
+        comm.list_controllers = matching
+        try:
+            yield
+        finally:
+            comm.list_controllers = list_controllers
+
+def sweep(meas_parameters, window = 'hann', do_plot = False, do_FFT = False, save_json = True, display=False,
+            pipelined = False, num_writers = 1, max_queue = 16, dsp_workers = 0, rig = None, journal = True, resume = False,
+            trace = False, settling = None,
+            num_frames = 1, averaging = "time", keep_frames = False, output = "pscope",
+            order = "ant_sweep", cost_model = None, overlap = False, fast_hop = False,
+            dry_run = False, budget = None, trim = "ask", costs_file = None):
     """Execute frequency sweep and data acquisition, recording files for time and frequency domain.
 
     Performs narrow band system measurements by setting discrete input frequencies with the LTC6946 PLL Frequency Synthesizer
     and acquiring data with the LTM9004 DC Receiver.
 
-    This function uses serial control for the frequency synthesizer and performs in order: switch antenna pair  ->  switch frequency. 
+    This function uses serial control for the frequency synthesizer. The order of the antenna pair and frequency steps is chosen
+    by a scheduler (see scheduler module), e.g. switch antenna pair -> switch frequency for order = "ant_sweep".
+    The predicted and achieved sweep durations are saved to meas_parameters["schedule"], and a single progress bar shows
+    the ETA of the whole sweep, updated from the observed step durations (see estimator module).
 
     Parameters
     ----------
     meas_parameters : dict
         dictionary containing several measurement parameters for the experiment (see details after parameters)
+        the sweep runs on a copy, in which the file paths are completed and the options of the call are recorded for the
+        JSON and HDF5 files; only the results of the run (SWEEP_RESULTS) are written back to meas_parameters, so that the
+        same dictionary can be used for several sweeps
     window : str, optional
         FFT window to be used (see fft_window module), by default 'hann'
     do_plot : bool, optional
@@ -106,6 +266,76 @@ def ant_sweep(meas_parameters, window = 'hann', do_plot = False, do_FFT = False,
         set True to record the FFT, by default False
     save_json : bool, optional
         set True to save JSON dictionary file with experiment configuration, by default True
+    pipelined : bool, optional
+        set True to write files in background threads while the next point is acquired, by default False
+        writer statistics are saved to meas_parameters["pipeline_stats"]
+    num_writers : int, optional
+        number of background writer threads when pipelined = True, by default 1
+    max_queue : int, optional
+        number of captures that may wait to be written before acquisition blocks, by default 16
+    dsp_workers : int, optional
+        number of worker processes computing the FFT when do_FFT = True, by default 0 (computed by the writer)
+        per-capture metrics (DC level, RMS, clipping, peak bin and dBFS) are saved as JSON lines in the configuration folder
+    rig : object or None, optional
+        device factory with receiver(spi_registers, verbose), synthesizer() and switch,
+        by default None uses the hardware (HardwareRig), see session.HardwareSession to keep devices open across runs
+        and virtual_rig.VirtualRig for a simulated rig
+        a list of device factories shares the steps of each iteration between the rigs (see multi_rig module), per-rig
+        statistics are saved to meas_parameters["rigs"]
+    journal : bool or str, optional
+        set True to record each completed point in a capture journal in the configuration folder, "checksum" to also
+        record the MD5 checksum of each file (read back on the writer path), by default True
+    resume : bool, optional
+        set True to continue an interrupted sweep from its capture journal, by default False
+        points already recorded with intact files are skipped, the number of skipped points is saved to meas_parameters["resumed_points"]
+    trace : bool, optional
+        set True to record timing spans of each stage (freq_set, set_pair, collect, file writes, make_directories, save_json),
+        by default False. Spans are saved as a Chrome trace (trace.json, viewable in Perfetto) and as JSON lines (trace.jsonl)
+        in the configuration folder (see tracing module)
+    settling : settling.Settler or None, optional
+        waits for PLL lock and switch settling before each capture, with sampled register verification
+        (see settling module), by default None (no waits). Settler statistics are saved to meas_parameters["settling_stats"]
+    num_frames : int, optional
+        number of consecutive captures averaged at each point, by default 1 (no averaging)
+        the averaged record is written with its variance (see averaging module)
+    averaging : str, optional
+        averaging mode when num_frames > 1: "time", "magnitude" or "complex", by default "time"
+    keep_frames : bool, optional
+        set True to also write the individual frames when num_frames > 1, by default False
+    output : str, optional
+        "pscope" to write one .adc (and .fft) file per capture, or "hdf5" to write all captures to a single HDF5 file
+        next to the "Phantom" folder (see hdf5_store module), by default "pscope"
+        the HDF5 file path is saved to meas_parameters["hdf5_file"]
+    order : str or function, optional
+        step order: "ant_sweep" (pair -> frequency), "ant_sweep_alt" (frequency -> pair), "serpentine", "serpentine_alt",
+        "auto" for the one of these four orders with the lowest predicted duration (not an optimisation of the point
+        order), or a scheduler function (see scheduler module),
+        by default "ant_sweep"
+    cost_model : scheduler.CostModel or None, optional
+        operation costs predicting the sweep duration, by default None for default costs with the settling model of settling
+        (see CostModel.from_trace to build one from a traced sweep)
+    overlap : bool, optional
+        set True to drive the switching matrix, the DC590B and the receiver from one thread each, so that the pair switch
+        and frequency burst of the next step are sent while the current capture is transferred (see device_actors module),
+        by default False
+    fast_hop : bool, optional
+        set True for DC590B.fast_hop, writing only the LTC6946 registers that change between consecutive frequencies
+        (e.g. 11 instead of 43 characters at 9600 baud between 50 MHz steps), by default False
+    dry_run : bool, optional
+        set True to only compile the plan and return its estimator.Estimate (duration per stage, setup included, and trim
+        options when over budget) without opening any device nor changing meas_parameters, by default False
+    budget : float or None, optional
+        time budget in seconds from the call, by default None. If the estimate exceeds it, before the sweep or at the end of
+        an iteration, the plan can be trimmed to fewer iterations or frequencies according to trim
+    trim : str, optional
+        "ask" to prompt for a trim option on the terminal (warning only if the input is not a terminal), "trim" to apply
+        the first option, "warn" to only print the options, by default "ask". The option applied is saved to
+        meas_parameters["trimmed"]; "iter" and "freq_range" of meas_parameters are left unchanged (the trimmed values
+        are recorded in the JSON configuration files of the run)
+    costs_file : str or None, optional
+        JSON file of the step costs learned from previous sweeps, per rig type and settings (see estimator.LearnedCostModel),
+        e.g. in the configuration or output folder of the measurement, by default None to neither use nor update
+        learned costs (estimates then use the scheduler.CostModel defaults)
 
     For the meas_parameters dictionary:
     ----------------------------------------
@@ -143,6 +373,22 @@ def ant_sweep(meas_parameters, window = 'hann', do_plot = False, do_FFT = False,
 
     start = timer()
 
+    if rig is None:
+        rig = HardwareRig()
+    rigs = list(rig) if isinstance(rig, (list, tuple)) else [rig]
+    profile = profile_key(rig, do_FFT = do_FFT, fast_hop = fast_hop, num_frames = num_frames, overlap = overlap,
+                            pipelined = pipelined)
+    if cost_model is None:
+        cost_model = CostModel(settling = settling.model if settling is not None else None)
+        if costs_file is not None:
+            cost_model = LearnedCostModel.load(costs_file, profile, cost_model)
+
+    if dry_run:
+        return _estimate_sweep(meas_parameters, order, do_FFT, cost_model, len(rigs), budget)
+
+    caller_parameters = meas_parameters
+    meas_parameters = _run_parameters(meas_parameters)
+
     if save_json:
         meas_parameters["start"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -165,171 +411,196 @@ def ant_sweep(meas_parameters, window = 'hann', do_plot = False, do_FFT = False,
 
     window = meas_parameters["fft_window"]
 
-    fctrl = fsynth.DC590B()
-
-    with Dc1513bAa(spi_registers, verbose) as controller:
-        pbar = tqdm(range(1,ite+1), leave= True)
-        for j in pbar:
-            pbar.set_description("Iteration: %i" % j)
+    plan = compile_plan(meas_parameters, order = order, do_FFT = do_FFT, cost_model = cost_model)
+    if budget is not None:
+        planned = estimate([(step.iteration, step.pair, step.freq) for step in plan.steps], cost_model, len(rigs))
+        if planned.total > budget:
+            tqdm.write("Estimated {0}, over the budget of {1}.".format(format_duration(planned.total), format_duration(budget)))
+            option = choose_trim(trim_options(plan.pairs, plan.freq_range, ite, order, cost_model, budget, len(rigs)),
+                                    trim, tqdm.write)
+            if option is not None: # applied to the run dictionary only, the caller's meas_parameters receive "trimmed"
+                meas_parameters["iter"] = ite = option.iterations
+                meas_parameters["freq_range"] = freq_range = list(option.freq_range)
+                meas_parameters["trimmed"] = option.description
+                plan = compile_plan(meas_parameters, order = order, do_FFT = do_FFT, cost_model = cost_model)
+    setup_start = timer()
+
+    stats = WriterStats()
+    tracer = Tracer() if trace else NULL_TRACER
+    settler = settling if settling is not None else NULL_SETTLER
+    settlers = [settler] + [settler.fork() for _ in rigs[1:]]
+    if num_frames > 1:
+        meas_parameters["num_frames"] = num_frames
+        meas_parameters["averaging"] = averaging
+    hdf5_file = None
+    if output == "hdf5":
+        if keep_frames:
+            raise ValueError("keep_frames is not supported with the HDF5 output.")
+        meas_parameters["output"] = output
+        meas_parameters["hdf5_file"] = hdf5_file = _generate_hdf5_file_path(meas_parameters)
+    elif output != "pscope":
+        raise ValueError("output must be \"pscope\" or \"hdf5\", got {}.".format(output))
+    metrics_file = _generate_config_file_path(meas_parameters, "DSP metrics.jsonl") if do_FFT and dsp_workers > 0 else None
+    if output == "pscope":
+        with tracer.span("make_directories"):
+            plan.make_directories()
+
+    with _open_journal(meas_parameters, do_FFT, journal, resume, order = plan.order, output = output,
+                        num_frames = num_frames) as capture_journal, \
+            open_rigs(rigs, spi_registers, verbose) as devices, \
+            _open_store(hdf5_file, meas_parameters, devices[0].controller, capture_journal, do_FFT, resume, num_frames,
+                        averaging) as store, \
+            CaptureWriter(devices[0].controller.num_bits, devices[0].controller.is_bipolar, num_samples, window,
+                            num_writers if pipelined else 0, max_queue, stats = stats,
+                            dsp_workers = dsp_workers, metrics_file = metrics_file,
+                            journal = capture_journal, tracer = tracer, store = store) as writer, \
+            rig_executor(devices, settlers, overlap, num_samples, TRIGGER_NONE, num_frames, verbose, tracer) as executor:
+        controller = devices[0].controller
+        for device in devices:
+            device.fctrl.fast_hop = fast_hop
+        averager = FrameAverager(num_frames, averaging, keep_frames, controller.num_bits, window)
+        points = [(step.iteration, step.pair, step.freq) for step in plan.steps if not capture_journal.is_done(*step.key)]
+        predicted = predict(points, cost_model) / len(devices)
+        tracker = EtaTracker(points, cost_model, len(devices))
+        sweep_start = timer()
+        last = sweep_start
+        trim_offered = False
+        pbar = tqdm(total = tracker.total, leave= True)
+        for j in range(1,ite+1):
             ite_start = timer()
-            for (TX, RX) in tqdm(pairs, leave= False):
-                swm.set_pair(TX, RX)
-                pbar2 = tqdm( range(0,len(freq_range)) , leave= False)
-                for i in pbar2:
-                    f_cur = freq_range[i]
-                    fctrl.freq_set(freq = f_cur, verbose=verbose)
-                    pbar2.set_description("Tx - %i Rx - %i @ %s MHz" % (TX, RX, f_cur))
-                    data_file= _generate_file_path2(meas_parameters = meas_parameters, antenna_pair = "Tx {0:d} Rx {1:d}".format(TX,RX))
-                    if not os.path.exists(os.path.dirname(data_file.replace("ITE",str(j)))):
-                        os.makedirs(os.path.dirname(data_file.replace("ITE",str(j))))
-                    ch0,ch1 = controller.collect(num_samples, consts.TRIGGER_NONE)
-                    if do_plot:
-                        tqdm.write("\rPlotting for input frequency: {} MHz".format(f_cur), end="")
-                        rfft.plot_channels(controller.get_num_bits(), window,
-                                            ch0, ch1,
-                                            verbose=verbose)
-                    rfft.save_for_pscope(data_file.replace("FREQ",f_cur).replace("ITE",str(j)), controller.num_bits, controller.is_bipolar, num_samples,
-                                            'DC_1513B-AA', 'LTM9004', ch0, ch1,)
-                    if do_FFT:
-                        rfft.save_for_pscope_fft(data_file.replace(".adc",".fft").replace("FREQ",f_cur).replace("ITE",str(j)), controller.num_bits, controller.is_bipolar,num_samples,
-                                            'DC_1513B-AA', 'LTM9004', window, ch0, ch1)
+            steps = [step for step in plan.iteration_steps(j) if not capture_journal.is_done(*step.key)]
+            if len(devices) == 1 and getattr(devices[0].switch, "acked", False):
+                devices[0].switch.load_schedule([step.pair for step in steps])
+            for step, frames in executor.run(steps):
+                averager.reset()
+                for frame in frames:
+                    averager.add(*frame)
+                ch0,ch1 = frames[-1]
+                if do_plot:
+                    tqdm.write("\rPlotting for input frequency: {} MHz".format(step.freq), end="")
+                    rfft.plot_channels(controller.get_num_bits(), window,
+                                        ch0, ch1,
+                                        verbose=verbose)
+                averager.put(writer, step.adc_path, step.fft_path, key = step.key)
+                now = timer()
+                tracker.observe(step.key, now - last)
+                last = now
+                pbar.set_description("Iteration %i - Tx %i Rx %i @ %s MHz" % (j, step.tx, step.rx, step.freq), refresh = False)
+                pbar.set_postfix_str("ETA " + format_duration(tracker.eta()))
+                pbar.update()
+
+            if budget is not None and j < ite and not trim_offered:
+                elapsed = timer() - start
+                if elapsed + tracker.eta() > budget:
+                    trim_offered = True
+                    fitting, trimmed = _trim_iterations(plan, tracker, j, ite, budget, elapsed, trim)
+                    if trimmed is not None: # run dictionary only, as above
+                        meas_parameters["iter"] = ite = fitting
+                        meas_parameters["trimmed"] = trimmed
+                    pbar.total = pbar.n + tracker.remaining
+                    pbar.refresh()
 
             if save_json and j != ite:
                 ite_end = timer()
                 meas_parameters["iter_duration"] = ite_end - ite_start
-                _save_json_exp(meas_parameters = meas_parameters, iteration = j)
-
-    fctrl.freq_set(freq = "0", verbose=verbose)
+                with tracer.span("save_json", iter = j):
+                    _save_json_exp(meas_parameters = meas_parameters, iteration = j)
+            if store is not None:
+                store.set_parameters(meas_parameters)
+                store.flush()
+            if j == ite:
+                break
+        pbar.close()
+
+    sweep_end = timer()
+    for device, rig_settler in zip(devices, settlers):
+        with tracer.span("freq_set", freq = "0"):
+            rig_settler.freq_set(device.fctrl, "0", verbose, msg = plan.mute)
     end = timer()
     meas_parameters["meas_duration"] = str(end - start)
 
-    if save_json:
-        meas_parameters["end"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        _save_json_exp(meas_parameters = meas_parameters)
-
-def ant_sweep_alt(meas_parameters, window = 'hann', do_plot = False, do_FFT = False, save_json = True, display=False):
-    """Execute frequency sweep and data acquisition, recording files for time and frequency domain.
-
-    Performs narrow band system measurements by setting discrete input frequencies with the LTC6946 PLL Frequency Synthesizer
-    and acquiring data with the LTM9004 DC Receiver.
-
-    This function uses serial control for the frequency synthesizer and the
-    order frequency switching -> antenna pair switching.
-
-    Parameters
-    ----------
-    meas_parameters : dict
-        dictionary containing several measurement parameters for the experiment (see details after parameters)
-    window : str, optional
-        FFT window to be used (see fft_window module), by default 'hann'
-    do_plot : bool, optional
-        set True to plot the data on the terminal, by default False
-    do_FFT : bool, optional
-        set True to record the FFT, by default False
-    save_json : bool, optional
-        set True to save JSON dictionary file with experiment configuration, by default True
-
-    For the meas_parameters dictionary:
-    ----------------------------------------
-
-    freq_range: list or tuple of strings
-        list or tuple of strings containing the input frequency range in MHz, with underscores "_" replacing dots "."
-
-    data_file: str
-        string with generic file name and path for the time domain data file to be written,
-        using placeholders for several details such as "FREQ" for the current frequency
-
-    date: str
-        string in the format "yyyy_mm_dd" (placeholder in file names is "DATE")
+    meas_parameters["schedule"] = {"order" : plan.order, "predicted" : predicted, "achieved" : sweep_end - sweep_start,
+                                    "candidates" : plan.candidates, "setup" : sweep_start - setup_start}
+    tqdm.write("Schedule: {0} - predicted {1:.2f} s, achieved {2:.2f} s".format(plan.order, predicted, sweep_end - sweep_start))
 
-    Phantom: int
-        phantom number (placeholder in file names is "PHA")
+    if costs_file is not None and isinstance(cost_model, LearnedCostModel):
+        cost_model.learn(tracker.observations(), sweep_start - setup_start)
+        try:
+            cost_model.save(costs_file, profile)
+        except IOError as e: # learned costs only improve the estimates, the sweep files are already written
+            tqdm.write("Could not save the learned step costs to {0}: {1}".format(costs_file, e))
 
-    Angle: int
-        phantom rotation angle (placeholder in file names is "ANG")
+    if pipelined:
+        meas_parameters["pipeline_stats"] = stats.as_dict()
+        tqdm.write(stats.report())
 
-    Plug: int
-        plug number (placeholder in file names is "PLU")
+    if isinstance(executor, ShardedExecutor):
+        meas_parameters["rigs"] = executor.as_dict()
+        tqdm.write(executor.report())
 
-    rep: int
-        user determined number counting the repetitions of measurement after repositioning,
-        requires calling the function again for each repetition (placeholder in file names is "REP")
-
-    iter: int
-        number of iteations to be performed of full frequency sweeps (for checking repeatability of measurements)
-        (placeholder in file names is "ITE")
-
-    window: str
-        FFT window to be used, default is 'hann' (see fft_window module)
-    """
-
-    start = timer()
+    if settling is not None:
+        for rig_settler in settlers[1:]:
+            for key, value in rig_settler.stats.items():
+                settling.stats[key] += value
+        meas_parameters["settling_stats"] = dict(settling.stats)
+        tqdm.write(settling.report())
 
     if save_json:
-        meas_parameters["start"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        for key in ["cal_data_file", "cal_fft_file"]:
-            del meas_parameters[key]
-
-        meas_parameters["type"] =  "measurement configuration parameters"
+        meas_parameters["end"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with tracer.span("save_json"):
+            _save_json_exp(meas_parameters = meas_parameters)
 
-    ite = meas_parameters["iter"]
+    if store is not None:
+        write_parameters(store.path, meas_parameters)
 
-    pairs = meas_parameters["pairs"]
+    if trace:
+        tracer.save_chrome_trace(_generate_config_file_path(meas_parameters, "trace.json"))
+        tracer.save_json_lines(_generate_config_file_path(meas_parameters, "trace.jsonl"))
+        tqdm.write(tracer.report())
 
-    _generate_file_path(meas_parameters = meas_parameters)
+    _publish_results(caller_parameters, meas_parameters)
 
-    num_samples = meas_parameters["num_samples"]
-    spi_registers = meas_parameters["spi_registers"]
-    verbose = meas_parameters["verbose"]
+def ant_sweep(meas_parameters, window = 'hann', do_plot = False, do_FFT = False, save_json = True, display=False,
+                pipelined = False, num_writers = 1, max_queue = 16, dsp_workers = 0, rig = None, journal = True, resume = False,
+                trace = False, settling = None,
+                num_frames = 1, averaging = "time", keep_frames = False, output = "pscope", overlap = False,
+                fast_hop = False, dry_run = False, budget = None, trim = "ask", costs_file = None):
+    """Execute frequency sweep and data acquisition, recording files for time and frequency domain.
 
-    freq_range = meas_parameters["freq_range"]
+    Performs narrow band system measurements by setting discrete input frequencies with the LTC6946 PLL Frequency Synthesizer
+    and acquiring data with the LTM9004 DC Receiver.
 
-    window = meas_parameters["fft_window"]
+    This function performs in order: switch antenna pair -> switch frequency.
+    It is equivalent to sweep with order = "ant_sweep" (returning the estimate with dry_run = True), see sweep for the parameters and the meas_parameters dictionary.
+    """
 
-    fctrl = fsynth.DC590B()
+    return sweep(meas_parameters, window, do_plot, do_FFT, save_json, display, pipelined, num_writers, max_queue, dsp_workers,
+                    rig, journal, resume, trace, settling, num_frames, averaging, keep_frames, output, order = "ant_sweep",
+                    overlap = overlap, fast_hop = fast_hop, dry_run = dry_run, budget = budget, trim = trim,
+                    costs_file = costs_file)
 
-    with Dc1513bAa(spi_registers, verbose) as controller:
-        pbar = tqdm(range(1,ite+1), leave= True)
-        for j in pbar:
-            pbar.set_description("Iteration: %i" % j)
-            ite_start = timer()
-            for i in tqdm(range(0,len(freq_range))):
-                f_cur = freq_range[i]
-                fctrl.freq_set(freq = f_cur, verbose=verbose)
-                pbar2 = tqdm( pairs , leave= False)
-                for (TX, RX) in pbar2:
-                    swm.set_pair(TX, RX)
-                    pbar2.set_description("Tx - %i Rx - %i @ %s MHz" % (TX, RX, f_cur))
-                    data_file= _generate_file_path2(meas_parameters = meas_parameters, antenna_pair = "Tx {0:d} Rx {1:d}".format(TX,RX))
-                    if not os.path.exists(os.path.dirname(data_file.replace("ITE",str(j)))):
-                        os.makedirs(os.path.dirname(data_file.replace("ITE",str(j))))
-                    ch0,ch1 = controller.collect(num_samples, consts.TRIGGER_NONE)
-                    if do_plot:
-                        tqdm.write("\rPlotting for input frequency: {} MHz".format(f_cur), end="")
-                        rfft.plot_channels(controller.get_num_bits(), window,
-                                            ch0, ch1,
-                                            verbose=verbose)
-                    rfft.save_for_pscope(data_file.replace("FREQ",f_cur).replace("ITE",str(j)), controller.num_bits, controller.is_bipolar, num_samples,
-                                            'DC_1513B-AA', 'LTM9004', ch0, ch1,)
-                    if do_FFT:
-                        rfft.save_for_pscope_fft(data_file.replace(".adc",".fft").replace("FREQ",f_cur).replace("ITE",str(j)), controller.num_bits, controller.is_bipolar,num_samples,
-                                            'DC_1513B-AA', 'LTM9004', window, ch0, ch1)
+def ant_sweep_alt(meas_parameters, window = 'hann', do_plot = False, do_FFT = False, save_json = True, display=False,
+                    pipelined = False, num_writers = 1, max_queue = 16, dsp_workers = 0, rig = None, journal = True, resume = False,
+                    trace = False, settling = None,
+                    num_frames = 1, averaging = "time", keep_frames = False, output = "pscope", overlap = False,
+                    fast_hop = False, dry_run = False, budget = None, trim = "ask", costs_file = None):
+    """Execute frequency sweep and data acquisition, recording files for time and frequency domain.
 
-            if save_json and j != ite:
-                ite_end = timer()
-                meas_parameters["iter_duration"] = ite_end - ite_start
-                _save_json_exp(meas_parameters = meas_parameters, iteration = j)
+    Performs narrow band system measurements by setting discrete input frequencies with the LTC6946 PLL Frequency Synthesizer
+    and acquiring data with the LTM9004 DC Receiver.
 
-    fctrl.freq_set(freq = "0", verbose=verbose)
-    end = timer()
-    meas_parameters["meas_duration"] = str(end - start)
+    This function performs in order: switch frequency -> switch antenna pair.
+    It is equivalent to sweep with order = "ant_sweep_alt" (returning the estimate with dry_run = True), see sweep for the parameters and the meas_parameters dictionary.
+    """
 
-    if save_json:
-        meas_parameters["end"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        _save_json_exp(meas_parameters = meas_parameters)
+    return sweep(meas_parameters, window, do_plot, do_FFT, save_json, display, pipelined, num_writers, max_queue, dsp_workers,
+                    rig, journal, resume, trace, settling, num_frames, averaging, keep_frames, output, order = "ant_sweep_alt",
+                    overlap = overlap, fast_hop = fast_hop, dry_run = dry_run, budget = budget, trim = trim,
+                    costs_file = costs_file)
 
-def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False, save_json = True):
+def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False, save_json = True,
+                pipelined = False, num_writers = 1, max_queue = 16, rig = None, settling = None,
+                num_frames = 1, averaging = "time", keep_frames = False):
     """Execute calibration routine of a specified type, recording calibration data files.
 
     Records calibration data for the narrow band system, to be used for normalization by removing offsets from the measurements, such as the DC offset inherent to Direct Conversion Receivers.
@@ -354,6 +625,27 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
         set True to record the FFT, by default False
     save_json : bool, optional
         set True to save JSON dictionary file with experiment configuration, by default True
+    pipelined : bool, optional
+        set True to write files in background threads while the next point is acquired, by default False
+        writer statistics are saved to meas_parameters["pipeline_stats"]
+    num_writers : int, optional
+        number of background writer threads when pipelined = True, by default 1
+    max_queue : int, optional
+        number of captures that may wait to be written before acquisition blocks, by default 16
+    rig : object or None, optional
+        device factory with receiver(spi_registers, verbose), synthesizer() and switch,
+        by default None uses the hardware (HardwareRig), see session.HardwareSession to keep devices open across runs
+        and virtual_rig.VirtualRig for a simulated rig
+    settling : settling.Settler or None, optional
+        waits for PLL lock and switch settling before each capture, with sampled register verification
+        (see settling module), by default None (no waits). Settler statistics are saved to meas_parameters["settling_stats"]
+    num_frames : int, optional
+        number of consecutive captures averaged at each point, by default 1 (no averaging)
+        the averaged record is written with its variance (see averaging module)
+    averaging : str, optional
+        averaging mode when num_frames > 1: "time", "magnitude" or "complex", by default "time"
+    keep_frames : bool, optional
+        set True to also write the individual frames when num_frames > 1, by default False
 
     For the meas_parameters dictionary:
     ----------------------------------------
@@ -378,6 +670,12 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
 
     window: str
         FFT window to be used, default is 'hann' (see fft_window module)
+
+    Raises
+    ------
+    ValueError
+        for an unknown cal_type, a frequency without LTC6946 register settings or an invalid antenna pair (type 4),
+        before any device is opened (see sweep_plan.compile_plan)
     """
 
     start = timer()
@@ -388,8 +686,6 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
     spi_registers = meas_parameters["spi_registers"]
     verbose = meas_parameters["verbose"]
 
-    freq_range = meas_parameters["freq_range"]
-
     ite = meas_parameters["iter"]
     window = meas_parameters["fft_window"]
 
@@ -401,6 +697,21 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
                 del meas_parameters[key]
 
     data_file = _generate_cal_file_path(meas_parameters = meas_parameters, cal_type = cal_type)
+    plan = _compile_cal_plan(meas_parameters, cal_type, data_file, do_FFT)
+    plan.make_directories()
+
+    stats = WriterStats()
+
+    if rig is None:
+        rig = HardwareRig()
+    switch = rig.switch
+    settler = settling if settling is not None else NULL_SETTLER
+    if num_frames > 1:
+        meas_parameters["num_frames"] = num_frames
+        meas_parameters["averaging"] = averaging
+    else: # recorded by a previous averaged run on the same dictionary
+        meas_parameters.pop("num_frames", None)
+        meas_parameters.pop("averaging", None)
 
     if cal_type == 1:
         del meas_parameters["pairs"]
@@ -409,20 +720,17 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
         for j in pbar:
             pbar.set_description("Iteration: %i" % j)
             ite_start = timer()
-            if not os.path.exists(os.path.dirname(data_file.replace("ITE",str(j)))):
-                    os.makedirs(os.path.dirname(data_file.replace("ITE",str(j))))
-            with Dc1513bAa(spi_registers, verbose) as controller:
-                ch0,ch1 = controller.collect(num_samples, consts.TRIGGER_NONE)
+            step, = plan.iteration_steps(j)
+            with rig.receiver(spi_registers, verbose) as controller, CaptureWriter(controller.num_bits, controller.is_bipolar, num_samples, window,
+                                                                                num_writers if pipelined else 0, max_queue, stats = stats) as writer:
+                averager = FrameAverager(num_frames, averaging, keep_frames, controller.num_bits, window)
+                ch0,ch1 = averager.collect(controller, num_samples, TRIGGER_NONE)
                 if do_plot:
                     tqdm.write("\rPlotting calibration for grounded LO and RF:", end="")
                     rfft.plot_channels(controller.get_num_bits(), window,
                                         ch0, ch1,
                                         verbose=verbose)
-                rfft.save_for_pscope(data_file.replace("ITE",str(j)).replace(".adc"," LO GND RF GND.adc"), controller.num_bits, controller.is_bipolar, num_samples,
-                                        'DC_1513B-AA', 'LTM9004', ch0, ch1)
-                if do_FFT:
-                    rfft.save_for_pscope_fft(data_file.replace(".adc",".fft").replace("ITE",str(j)).replace(".fft"," LO GND RF GND.fft"), controller.num_bits, controller.is_bipolar, num_samples,
-                                        'DC_1513B-AA', 'LTM9004', window, ch0, ch1)
+                averager.put(writer, step.adc_path, step.fft_path)
 
             if save_json and j != ite:
                 ite_end = timer()
@@ -432,29 +740,26 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
 
     if cal_type == 2:
         del meas_parameters["pairs"]
-        fctrl = fsynth.DC590B()
+        fctrl = rig.synthesizer()
 
-        with Dc1513bAa(spi_registers, verbose) as controller:
+        with rig.receiver(spi_registers, verbose) as controller, CaptureWriter(controller.num_bits, controller.is_bipolar, num_samples, window,
+                                                                            num_writers if pipelined else 0, max_queue, stats = stats) as writer:
+            averager = FrameAverager(num_frames, averaging, keep_frames, controller.num_bits, window)
             pbar = tqdm(range(1,ite+1), leave= True)
             for j in pbar:
                 pbar.set_description("Iteration: %i" % j)
                 ite_start = timer()
-                pbar2 = tqdm( range(0,len(freq_range)) , leave= False)
-                for i in pbar2:
-                    f_cur = freq_range[i]
-                    fctrl.freq_set(freq = f_cur, verbose=verbose)
+                pbar2 = tqdm(plan.iteration_steps(j), leave= False)
+                for step in pbar2:
+                    f_cur = step.freq
+                    settler.freq_set(fctrl, f_cur, verbose, msg = step.burst)
                     pbar2.set_description("Calibration Type 2 @ %s MHz" % f_cur)
-                    if not os.path.exists(os.path.dirname(data_file.replace("ITE",str(j)))):
-                        os.makedirs(os.path.dirname(data_file.replace("ITE",str(j))))
-                    ch0,ch1 = controller.collect(num_samples, consts.TRIGGER_NONE)
+                    settler.wait()
+                    ch0,ch1 = averager.collect(controller, num_samples, TRIGGER_NONE)
                     if do_plot:
                         tqdm.write("\rPlotting calibration for RF grounded and LO with input frequency: {} MHz".format(f_cur), end="")
                         rfft.plot_channels(controller.get_num_bits(), window, ch0, ch1, verbose=verbose)
-                    rfft.save_for_pscope(data_file.replace("ITE",str(j)).replace(".adc"," LO FREQMHz RF GND.adc".replace("FREQ",f_cur)),
-                                        controller.num_bits, controller.is_bipolar, num_samples, 'DC_1513B-AA', 'LTM9004', ch0, ch1)
-                    if do_FFT:
-                        rfft.save_for_pscope_fft(data_file.replace(".adc",".fft").replace("ITE",str(j)).replace(".fft"," LO FREQMHz RF GND.fft".replace("FREQ",f_cur)),
-                                                controller.num_bits, controller.is_bipolar, num_samples, 'DC_1513B-AA', 'LTM9004', window, ch0, ch1)
+                    averager.put(writer, step.adc_path, step.fft_path)
 
                 if save_json and j != ite:
                     ite_end = timer()
@@ -464,31 +769,28 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
 
     if cal_type == 3:
         del meas_parameters["pairs"]
-        fctrl = fsynth.DC590B()
+        fctrl = rig.synthesizer()
 
-        with Dc1513bAa(spi_registers, verbose) as controller:
+        with rig.receiver(spi_registers, verbose) as controller, CaptureWriter(controller.num_bits, controller.is_bipolar, num_samples, window,
+                                                                            num_writers if pipelined else 0, max_queue, stats = stats) as writer:
+            averager = FrameAverager(num_frames, averaging, keep_frames, controller.num_bits, window)
             pbar = tqdm(range(1,ite+1), leave= True)
             for j in pbar:
                 pbar.set_description("Iteration: %i" % j)
                 ite_start = timer()
-                pbar2 = tqdm( range(0,len(freq_range)) , leave= False)
-                for i in pbar2:
-                    f_cur = freq_range[i]
-                    fctrl.freq_set(freq = f_cur, verbose=verbose)
+                pbar2 = tqdm(plan.iteration_steps(j), leave= False)
+                for step in pbar2:
+                    f_cur = step.freq
+                    settler.freq_set(fctrl, f_cur, verbose, msg = step.burst)
                     pbar2.set_description("Calibration Type 3 @ %s MHz" % f_cur)
-                    if not os.path.exists(os.path.dirname(data_file.replace("ITE",str(j)))):
-                        os.makedirs(os.path.dirname(data_file.replace("ITE",str(j))))
-                    ch0,ch1 = controller.collect(num_samples, consts.TRIGGER_NONE)
+                    settler.wait()
+                    ch0,ch1 = averager.collect(controller, num_samples, TRIGGER_NONE)
                     if do_plot:
                         tqdm.write("\rPlotting calibration for RF connected directly to Rx-Tx and LO with input frequency: {} MHz".format(f_cur), end="")
                         rfft.plot_channels(controller.get_num_bits(), window,
                                             ch0, ch1,
                                             verbose=verbose)
-                    rfft.save_for_pscope(data_file.replace("ITE",str(j)).replace(".adc"," LO FREQMHz RF RxTx.adc".replace("FREQ",f_cur)),
-                                        controller.num_bits, controller.is_bipolar, num_samples, 'DC_1513B-AA', 'LTM9004', ch0, ch1)
-                    if do_FFT:
-                        rfft.save_for_pscope_fft(data_file.replace(".adc",".fft").replace("ITE",str(j)).replace(".fft"," LO FREQMHz RF RxTx.fft".replace("FREQ",f_cur)),
-                                                controller.num_bits, controller.is_bipolar, num_samples, 'DC_1513B-AA', 'LTM9004', window, ch0, ch1)
+                    averager.put(writer, step.adc_path, step.fft_path)
 
                 if save_json and j != ite:
                     ite_end = timer()
@@ -497,35 +799,31 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
                     _save_json_cal(meas_parameters = meas_parameters, cal_type = cal_type, iteration = j)
 
     if cal_type == 4:
-        pairs = meas_parameters["pairs"]
-        fctrl = fsynth.DC590B()
+        fctrl = rig.synthesizer()
 
-        with Dc1513bAa(spi_registers, verbose) as controller:
+        with rig.receiver(spi_registers, verbose) as controller, CaptureWriter(controller.num_bits, controller.is_bipolar, num_samples, window,
+                                                                            num_writers if pipelined else 0, max_queue, stats = stats) as writer:
+            averager = FrameAverager(num_frames, averaging, keep_frames, controller.num_bits, window)
             pbar = tqdm(range(1,ite+1), leave= True)
             for j in pbar:
                 pbar.set_description("Iteration: %i" % j)
                 ite_start = timer()
-                for (TX, RX) in tqdm(pairs, leave= False):
-                    swm.set_pair(TX, RX)
-                    pbar2 = tqdm(range(0,len(freq_range)) , leave= False)
-                    for i in pbar2:
-                        f_cur = freq_range[i]
-                        fctrl.freq_set(freq = f_cur, verbose=verbose)
+                for k, pair in enumerate(tqdm(plan.pairs, leave= False)):
+                    TX, RX = pair
+                    settler.set_pair(switch, TX, RX)
+                    pbar2 = tqdm(plan.iteration_steps(j)[k*len(plan.freq_range):(k+1)*len(plan.freq_range)], leave= False)
+                    for step in pbar2:
+                        f_cur = step.freq
+                        settler.freq_set(fctrl, f_cur, verbose, msg = step.burst)
                         pbar2.set_description("Cal Type 4: Tx - %i Rx - %i @ %s MHz" % (TX, RX, f_cur))
-                        data_file= _generate_file_path2(meas_parameters = meas_parameters, antenna_pair = "Tx {0:d} Rx {1:d}".format(TX,RX), file_path_key="cal_ph_data_file")
-                        if not os.path.exists(os.path.dirname(data_file.replace("ITE",str(j)))):
-                            os.makedirs(os.path.dirname(data_file.replace("ITE",str(j))))
-                        ch0,ch1 = controller.collect(num_samples, consts.TRIGGER_NONE)
+                        settler.wait()
+                        ch0,ch1 = averager.collect(controller, num_samples, TRIGGER_NONE)
                         if do_plot:
                             tqdm.write("\rPlotting calibration for room noise with input frequency: {} MHz".format(f_cur), end="")
                             rfft.plot_channels(controller.get_num_bits(), window,
                                                 ch0, ch1,
                                                 verbose=verbose)
-                        rfft.save_for_pscope(data_file.replace("ITE",str(j)).replace("FREQ",f_cur),
-                                            controller.num_bits, controller.is_bipolar, num_samples, 'DC_1513B-AA', 'LTM9004', ch0, ch1)
-                        if do_FFT:
-                            rfft.save_for_pscope_fft(data_file.replace(".adc",".fft").replace("ITE",str(j)).replace("FREQ",f_cur),
-                                                    controller.num_bits, controller.is_bipolar, num_samples, 'DC_1513B-AA', 'LTM9004', window, ch0, ch1)
+                        averager.put(writer, step.adc_path, step.fft_path)
 
                 if save_json and j != ite:
                     ite_end = timer()
@@ -536,10 +834,50 @@ def cal_system(meas_parameters, do_plot = False, cal_type  = 1, do_FFT = False,
     end = timer()
     meas_parameters["cal_duration"] = end - start
 
+    if pipelined:
+        meas_parameters["pipeline_stats"] = stats.as_dict()
+        tqdm.write(stats.report())
+
+    if settling is not None:
+        meas_parameters["settling_stats"] = dict(settling.stats)
+        tqdm.write(settling.report())
+
     if save_json:
         meas_parameters["end"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         _save_json_cal(meas_parameters = meas_parameters, cal_type = cal_type)
 
+def _estimate_sweep(meas_parameters, order, do_FFT, cost_model, rigs, budget = None):
+    """Compile the plan of a copy of meas_parameters, print and return its estimator.Estimate (dry run of sweep)."""
+    meas_parameters = copy.deepcopy(meas_parameters)
+    _generate_file_path(meas_parameters = meas_parameters)
+    plan = compile_plan(meas_parameters, order = order, do_FFT = do_FFT, cost_model = cost_model)
+    points = [(step.iteration, step.pair, step.freq) for step in plan.steps]
+    result = estimate(points, cost_model, rigs, plan.order, plan.candidates, budget)
+    if budget is not None and result.total > budget:
+        result = result._replace(options = trim_options(plan.pairs, plan.freq_range, plan.iterations, order, cost_model,
+                                                            budget, rigs))
+    print(result.report())
+    return result
+
+def _trim_iterations(plan, tracker, iteration, iterations, budget, elapsed, trim):
+    """Offer to stop the sweep early when the ETA after iteration exceeds budget.
+
+    Return the number of iterations to run and the description of the trim applied (None if not trimmed).
+    """
+    per_iteration = tracker.eta() / (iterations - iteration)
+    fitting = max(iteration + int((budget - elapsed) / per_iteration), iteration) if per_iteration > 0 else iterations
+    tqdm.write("ETA {0} after {1} elapsed, over the budget of {2}.".format(format_duration(tracker.eta()),
+                format_duration(elapsed), format_duration(budget)))
+    if fitting >= iterations:
+        return iterations, None
+    option = choose_trim([TrimOption("stop after iteration {0:d} of {1:d}".format(fitting, iterations), fitting,
+                                        plan.freq_range, elapsed + per_iteration * (fitting - iteration))], trim, tqdm.write)
+    if option is None:
+        return iterations, None
+    for j in range(fitting + 1, iterations + 1):
+        tracker.discard([step.key for step in plan.iteration_steps(j)])
+    return fitting, option.description
+
 def _generate_file_path(meas_parameters):
     """Alter the dictionary value for the key "data_file" with current values for date, phantom, angle, plug and rep.
 
@@ -625,6 +963,193 @@ def _generate_cal_file_path(meas_parameters, cal_type = 1):
 
         return meas_parameters["cal_ph_data_file"]
 
+def _compile_cal_plan(meas_parameters, cal_type, data_file, do_FFT = False):
+    """Compile the calibration of cal_type into a sweep plan (see sweep_plan module), before any device is opened.
+
+    Frequencies without LTC6946 register settings and invalid antenna pairs raise ValueError up front, and the
+    steps carry their file paths and pre-encoded SPI bursts. Types 1 to 3 have no antenna pair: their steps use a
+    placeholder pair absent from the file names, with the single frequency "0" (output muted) for type 1.
+
+    Parameters
+    ----------
+    meas_parameters : dict
+        dictionary with "calibration configuration parameters"
+    cal_type : int
+        number describing the calibration type (see cal_system)
+    data_file : str
+        output of _generate_cal_file_path
+    do_FFT : bool, optional
+        set True to include the .fft file paths, by default False
+
+    Returns
+    ----------
+    sweep_plan.SweepPlan
+        steps in the order iteration -> pair -> frequency
+    """
+
+    parameters = {"iter" : meas_parameters["iter"], "freq_range" : meas_parameters["freq_range"], "pairs" : [(1, 2)]}
+    if cal_type == 1:
+        parameters["freq_range"] = ("0",)
+        parameters["data_file"] = data_file.replace(".adc"," LO GND RF GND.adc")
+    elif cal_type == 2:
+        parameters["data_file"] = data_file.replace(".adc"," LO FREQMHz RF GND.adc")
+    elif cal_type == 3:
+        parameters["data_file"] = data_file.replace(".adc"," LO FREQMHz RF RxTx.adc")
+    elif cal_type == 4:
+        parameters["data_file"] = data_file
+        parameters["pairs"] = meas_parameters["pairs"]
+    else:
+        raise ValueError("Calibration type must be 1, 2, 3 or 4, got {}.".format(cal_type))
+    return compile_plan(parameters, order = "ant_sweep", do_FFT = do_FFT)
+
+def _generate_config_file_path(meas_parameters, extension, config_folder = "Config/"):
+    """Output the path of a run-level file placed next to the JSON configuration files, creating the folder if needed.
+
+    The file name follows the final JSON configuration file name, with extension replacing ".json".
+
+    Parameters
+    ----------
+    meas_parameters : dict
+        dictionary with "measurement configuration parameters"
+    extension : str
+        string replacing the ".adc" extension of the data file name, e.g. "DSP metrics.jsonl"
+    config_folder: str, optional
+        sub-folder to place the file, by default "Config/"
+
+    Returns
+    ----------
+    str
+        file path in the configuration folder
+    """
+
+    out_path = meas_parameters["data_file"].partition("Phantom ")[0] + config_folder
+    file_name = os.path.basename(meas_parameters["data_file"]).replace("ANTPAIR FREQMHz","").replace("ITE", str(meas_parameters["iter"])).replace(".adc",extension)
+
+    if not os.path.exists(os.path.dirname(out_path)):
+        os.makedirs(os.path.dirname(out_path))
+
+    return out_path + file_name
+
+def _generate_hdf5_file_path(meas_parameters):
+    """Output the path of the HDF5 file of a sweep, placed next to the "Phantom" folder of the data files.
+
+    Parameters
+    ----------
+    meas_parameters : dict
+        dictionary with "measurement configuration parameters", after _generate_file_path
+
+    Returns
+    ----------
+    str
+        data_file path without the iteration, antenna pair and frequency, with the ".h5" extension
+    """
+
+    out_path = meas_parameters["data_file"].partition("Phantom ")[0]
+    file_name = os.path.basename(meas_parameters["data_file"]).replace(" ANTPAIR FREQMHz","").replace(" Iter ITE","").replace(".adc",".h5")
+
+    return out_path + file_name
+
+def _run_parameters(meas_parameters):
+    """Return the run dictionary of a sweep: a deep copy of meas_parameters without the results of previous runs."""
+    return copy.deepcopy(dict((key, value) for key, value in meas_parameters.items() if key not in SWEEP_RESULTS))
+
+def _publish_results(meas_parameters, run_parameters):
+    """Write the results of a sweep (SWEEP_RESULTS keys of run_parameters) to meas_parameters, removing those of
+    previous runs that this run did not produce."""
+    for key in SWEEP_RESULTS:
+        if key in run_parameters:
+            meas_parameters[key] = run_parameters[key]
+        else:
+            meas_parameters.pop(key, None)
+
+def _open_journal(meas_parameters, do_FFT = False, journal = True, resume = False, order = "ant_sweep", output = "pscope",
+                    num_frames = 1):
+    """Open the capture journal of a sweep, placed in the configuration folder.
+
+    The journal header holds the parameters defining the sweep points and file names, so that only a sweep
+    with the same parameters can be resumed.
+
+    Parameters
+    ----------
+    meas_parameters : dict
+        dictionary with "measurement configuration parameters", after _generate_file_path
+    do_FFT : bool, optional
+        True if .fft files are recorded, by default False
+    journal : bool or str, optional
+        set False to disable the journal, "checksum" to record the MD5 checksums of the files, by default True
+    resume : bool, optional
+        set True to continue an existing journal, by default False
+    order : str, optional
+        name of the sweep function, by default "ant_sweep"
+    output : str, optional
+        "pscope" or "hdf5" output of the sweep, by default "pscope"
+    num_frames : int, optional
+        number of frames averaged at each point, by default 1
+
+    Returns
+    ----------
+    CaptureJournal
+        journal (disabled if journal and resume are False)
+    """
+
+    if not (journal or resume):
+        return CaptureJournal(None, None)
+
+    params = {key : meas_parameters[key] for key in ["data_file", "num_samples", "freq_range", "pairs", "iter", "fft_window"]}
+    params["do_FFT"] = do_FFT
+    params["num_frames"] = num_frames
+    params["order"] = order
+    if output != "pscope":
+        params["output"] = output
+
+    capture_journal = CaptureJournal(_generate_config_file_path(meas_parameters, "capture journal.jsonl"), params, resume = resume,
+                                        checksums = journal == "checksum")
+    if resume:
+        meas_parameters["resumed_points"] = capture_journal.resumed
+        tqdm.write("Resuming sweep: {0:d} points already completed, {1:d} rejected (missing or modified files).".format(capture_journal.resumed,
+                                                                                                        capture_journal.rejected))
+    return capture_journal
+
+@contextmanager
+def _open_store(hdf5_file, meas_parameters, controller, capture_journal, do_FFT = False, resume = False, num_frames = 1,
+                averaging = "time"):
+    """Open the HDF5 sweep file hdf5_file, yield None when hdf5_file is None (PScope output).
+
+    When resuming, the points of the capture journal that are missing from the HDF5 file are captured again.
+
+    Parameters
+    ----------
+    hdf5_file : str or None
+        HDF5 file path of the sweep, None for the PScope output
+    meas_parameters : dict
+        run dictionary of the sweep with "measurement configuration parameters"
+    controller : object
+        open receiver, providing num_bits and is_bipolar
+    capture_journal : CaptureJournal
+        journal of the sweep
+    do_FFT : bool, optional
+        True if the FFT is recorded, by default False
+    resume : bool, optional
+        set True to continue an existing HDF5 file, by default False
+    num_frames : int, optional
+        number of frames averaged at each point, by default 1
+    averaging : str, optional
+        averaging mode when num_frames > 1, by default "time"
+    """
+
+    if hdf5_file is None:
+        yield None
+        return
+
+    spectral = num_frames > 1 and averaging != "time"
+    variance = None if num_frames == 1 else "fft" if spectral else "adc"
+    with SweepStore(hdf5_file, meas_parameters, do_FFT = do_FFT or spectral, averaged = num_frames > 1,
+                    variance = variance, resume = resume, num_bits = controller.num_bits, is_bipolar = controller.is_bipolar) as store:
+        if resume:
+            capture_journal.retain(store.is_written)
+            meas_parameters["resumed_points"] = capture_journal.resumed
+        yield store
+
 def _save_json_exp(meas_parameters, config_folder = "Config/", iteration = None):
     """Save "measurement configuration parameters" dictionary to JSON file.
 
@@ -0,0 +1,140 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module for tracing the stages of a sweep (synthesizer and switch commands, captures, file writes),
+        to find out where the measurement time goes on a given machine.
+
+        Spans are recorded with their start time, duration, thread and tags (e.g. iteration, pair and frequency)
+        and exported as a Chrome trace-event file (open in Perfetto or chrome://tracing, one track per thread)
+        and as JSON lines.
+
+        Main usage:
+
+        $ tracer = Tracer()
+        $ with tracer.span("collect", iter = j, tx = TX, rx = RX, freq = f_cur):
+        $     ch0, ch1 = controller.collect(num_samples, TRIGGER_NONE)
+        $ tracer.save_chrome_trace("trace.json")
+        $ print tracer.report()
+
+        NULL_TRACER has the same interface and records nothing, for negligible overhead when tracing is disabled.
+
+Class::
+        Tracer : records spans and exports them.
+
+        NullTracer : tracer that records nothing.
+"""
+# Standard library imports
+import json
+import os
+import threading
+from timeit import default_timer as timer
+
+
+class Tracer(object):
+    """Record timed spans from any thread."""
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = timer()
+
+    def span(self, name, **tags):
+        """Return a context manager recording a span called name with the given tags."""
+        return _Span(self, name, tags)
+
+    def add(self, name, start, duration, tags = None):
+        """Record a span measured by the caller (start from timeit.default_timer, both in seconds)."""
+        thread = threading.current_thread()
+        with self._lock:
+            self.events.append((name, start - self._origin, duration, thread.ident, thread.name, tags or {}))
+
+    def save_chrome_trace(self, out_path):
+        """Write spans to a Chrome trace-event JSON file (times in microseconds)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace = []
+        threads = {}
+        for name, start, duration, tid, thread_name, tags in events:
+            threads[tid] = thread_name
+            trace.append({"name" : name, "cat" : "sweep", "ph" : "X", "pid" : pid, "tid" : tid,
+                            "ts" : 1e6*start, "dur" : 1e6*duration, "args" : tags})
+        for tid, thread_name in threads.items():
+            trace.append({"name" : "thread_name", "ph" : "M", "pid" : pid, "tid" : tid, "args" : {"name" : thread_name}})
+        with open(out_path, 'w') as fp:
+            json.dump({"traceEvents" : trace, "displayTimeUnit" : "ms"}, fp)
+
+    def save_json_lines(self, out_path):
+        """Write spans as JSON lines with keys "name", "start", "duration" (seconds), "thread" and the span tags."""
+        with self._lock:
+            events = list(self.events)
+        with open(out_path, 'w') as fp:
+            for name, start, duration, tid, thread_name, tags in events:
+                record = dict(tags)
+                record.update({"name" : name, "start" : start, "duration" : duration, "thread" : thread_name})
+                fp.write(json.dumps(record, sort_keys=True) + "\n")
+
+    def summary(self):
+        """Return a dictionary with count, total, mean and max duration (seconds) per span name."""
+        out = {}
+        with self._lock:
+            for name, start, duration, tid, thread_name, tags in self.events:
+                count, total, longest = out.get(name, (0, 0.0, 0.0))
+                out[name] = (count + 1, total + duration, max(longest, duration))
+        return dict((name, {"count" : count, "total" : total, "mean" : total / count, "max" : longest})
+                        for name, (count, total, longest) in out.items())
+
+    def report(self):
+        """Return a human readable table of the summary, sorted by total time."""
+        summary = self.summary()
+        lines = ["Trace: {0:d} spans".format(sum(s["count"] for s in summary.values()))]
+        for name in sorted(summary, key = lambda name: -summary[name]["total"]):
+            lines.append("    {0:<20} {count:>7d} spans, mean {mean:.4f} s, max {max:.4f} s, total {total:.3f} s".format(name, **summary[name]))
+        return "\n".join(lines)
+
+
+class NullTracer(object):
+    """Tracer with the Tracer interface that records nothing."""
+
+    enabled = False
+
+    def span(self, name, **tags):
+        return _NULL_SPAN
+
+    def add(self, name, start, duration, tags = None):
+        pass
+
+
+class _Span(object):
+
+    __slots__ = ("tracer", "name", "tags", "start")
+
+    def __init__(self, tracer, name, tags):
+        self.tracer = tracer
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add(self.name, self.start, timer() - self.start, self.tags)
+
+
+class _NullSpan(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+_NULL_SPAN = _NullSpan()
+NULL_TRACER = NullTracer()
@@ -0,0 +1,625 @@
+# Python 2.7
+# 2026-10-17
+
+"""
+Description:
+        Module with a simulated narrow band system (receiver, frequency synthesizer and switching matrix) for
+        benchmarking and regression testing the sweep functions without the hardware attached.
+
+        The simulated devices are driven through the same code paths as the real ones:
+            - VirtualDC590B is the ltc6946_serial.DC590B driver talking to an emulated DC590B serial port, which
+              decodes the SPI commands into an LTC6946 register image (frequency, mute and lock flag).
+            - VirtualSwitchingMatrix writes the same SMC_SET_TXnn_RXnn commands to an emulated STM32 port.
+            - VirtualDc1513bAa returns synthetic I/Q tones for the current pair and programmed frequency, with
+              configurable SNR, DC offset and clipping. Captures taken before the PLL locked or the switch settled
+              are distorted, as on the bench. start_collect and read_collect split a capture into sampling and USB
+              transfer (see device_actors module).
+
+        Every operation waits a modelled latency (serial byte time, PLL lock, switch settle, USB capture time),
+        scaled by RigLatencies.time_scale, and is accounted in VirtualRig.stats.
+
+        Main usage:
+
+        $ rig = VirtualRig(RigLatencies(time_scale = 0.1), SignalModel(snr_db = 40))
+        $ nbsys.ant_sweep(meas_parameters = MeasParameters, rig = rig)
+        $ print rig.report()
+
+Class::
+        RigLatencies : per-operation latencies of the virtual rig.
+
+        SignalModel : synthetic I/Q signal generator.
+
+        VirtualRig : device factory with the same interface as system.HardwareRig.
+
+        VirtualDc1513bAa, VirtualDC590B, VirtualSwitchingMatrix : simulated devices.
+
+        VirtualDC590BPort, VirtualSwitchingMatrixPort : emulated serial ports of the control boards.
+"""
+# Standard library imports
+import math
+import random
+import re
+import threading
+import time
+from timeit import default_timer as timer
+
+# Third-party imports
+import numpy as np
+
+# Local application imports
+from Transmitter_LTC6946 import ltc6946_serial as fsynth
+
+F_REF = 12.5 # MHz, reference implied by the register tables (R = 25 for a 500 kHz PFD)
+SAMPLE_RATE = 125e6 # Hz, LTM9004 sampling rate
+
+
+class RigLatencies(object):
+    """Per-operation latencies (in seconds) of the virtual rig.
+
+    Defaults are rough bench values and should be adjusted to the rig being modelled.
+
+    Parameters
+    ----------
+    baud_rate : int, optional
+        DC590B serial link speed, 10 bits per byte, by default 9600
+    read_timeout : float, optional
+        DC590B port read timeout, spent whenever fewer bytes than requested are available, by default 0.5
+    serial_overhead : float, optional
+        USB round trip of each DC590B port write and read call, by default 1e-3
+    pll_lock : float, optional
+        time after the SPI burst until the LTC6946 reports lock (VCO calibration and loop settling), by default 1e-3
+    switch_command : float, optional
+        switching matrix USB command latency, by default 1e-3
+    switch_settle : float, optional
+        time after a switching matrix command until the RF path is settled, by default 2e-3
+    usb_overhead : float, optional
+        fixed DC890 capture overhead (trigger and readout setup), by default 20e-3
+    usb_rate : float, optional
+        DC890 USB transfer rate in bytes per second, by default 4e6
+    fpga_load : float, optional
+        receiver FPGA load when entering the receiver context, by default 2.0
+    port_open : float, optional
+        DC590B port scan and open, by default 1.0
+    time_scale : float, optional
+        factor applied to every wait, 0 for no waiting (modelled times are still accounted), by default 1.0
+    """
+
+    def __init__(self, baud_rate = 9600, read_timeout = 0.5, pll_lock = 1e-3, switch_command = 1e-3, switch_settle = 2e-3,
+                    usb_overhead = 20e-3, usb_rate = 4e6, fpga_load = 2.0, port_open = 1.0, time_scale = 1.0, serial_overhead = 1e-3):
+        self.baud_rate = baud_rate
+        self.read_timeout = read_timeout
+        self.serial_overhead = serial_overhead
+        self.pll_lock = pll_lock
+        self.switch_command = switch_command
+        self.switch_settle = switch_settle
+        self.usb_overhead = usb_overhead
+        self.usb_rate = usb_rate
+        self.fpga_load = fpga_load
+        self.port_open = port_open
+        self.time_scale = time_scale
+
+    @property
+    def byte_time(self):
+        return 10.0 / self.baud_rate
+
+    def usb_capture(self, num_samples, num_channels = 2):
+        """Return the modelled time of one capture of num_samples per channel (2 bytes per sample)."""
+        return self.usb_overhead + 2.0 * num_samples * num_channels / self.usb_rate
+
+
+class SignalModel(object):
+    """Synthetic I/Q signal generator for the virtual receiver.
+
+    Each (Tx, Rx, frequency) combination gets a fixed pseudo-random path gain and phase, so repeated sweeps are
+    reproducible and pairs/frequencies are distinguishable.
+
+    Parameters
+    ----------
+    amplitude_dbfs : float, optional
+        tone amplitude for a path with 0 dB gain, by default -6.0
+    snr_db : float, optional
+        signal to noise ratio for a path with 0 dB gain (the noise floor is the same for every path), by default 50.0
+    dc_offset : tuple of float, optional
+        DC offset of each channel in ADC codes, by default (150.0, -90.0)
+    clip_level : float, optional
+        fraction of full scale where the front end clips, by default 1.0 (ADC limits only)
+    tone_frequency : float, optional
+        baseband tone frequency in Hz, by default 1e6
+    path_spread_db : float, optional
+        path gains are drawn uniformly from [-path_spread_db, 0] dB, by default 20.0
+    num_bits : int, optional
+        ADC resolution, by default 14
+    seed : int or None, optional
+        seed for the noise generator, by default None
+    """
+
+    def __init__(self, amplitude_dbfs = -6.0, snr_db = 50.0, dc_offset = (150.0, -90.0), clip_level = 1.0,
+                    tone_frequency = 1e6, path_spread_db = 20.0, num_bits = 14, seed = None):
+        self.amplitude_dbfs = amplitude_dbfs
+        self.snr_db = snr_db
+        self.dc_offset = dc_offset
+        self.clip_level = clip_level
+        self.tone_frequency = tone_frequency
+        self.path_spread_db = path_spread_db
+        self.num_bits = num_bits
+        self._rng = np.random.RandomState(seed)
+        self._lock = threading.Lock()
+
+    def path(self, tx, rx, freq):
+        """Return (linear gain, phase) of the path for pair (tx, rx) at freq (MHz)."""
+        gen = random.Random(hash((tx, rx, round(freq, 4))))
+        gain_db = -self.path_spread_db * gen.random()
+        return 10**(gain_db/20.0), 2*math.pi*gen.random()
+
+    def capture(self, num_samples, tx, rx, freq, settled = True):
+        """Return (ch0, ch1) int16 arrays for one capture.
+
+        freq is None when the synthesizer is muted or not programmed (only DC offset and noise are present).
+        When settled is False, the tone has a random amplitude and frequency error, as during PLL lock or switching.
+        """
+        full_scale = 2**(self.num_bits-1)
+        amplitude = 10**(self.amplitude_dbfs/20.0) * full_scale
+        noise_std = amplitude / math.sqrt(2) / 10**(self.snr_db/20.0)
+
+        with self._lock:
+            noise = self._rng.normal(0.0, noise_std, (2, num_samples))
+            if freq is None or tx is None:
+                gain, phase, tone = 0.0, 0.0, self.tone_frequency
+            else:
+                gain, phase = self.path(tx, rx, freq)
+                tone = self.tone_frequency
+                if not settled:
+                    gain *= self._rng.uniform(0.2, 1.0)
+                    tone += self._rng.uniform(-0.5, 0.5) * self.tone_frequency
+
+        arg = 2*math.pi*tone/SAMPLE_RATE * np.arange(num_samples) + phase
+        data = noise
+        data[0] += gain*amplitude*np.cos(arg) + self.dc_offset[0]
+        data[1] += gain*amplitude*np.sin(arg) + self.dc_offset[1]
+
+        limit = self.clip_level * full_scale
+        np.clip(data, -limit, limit, out = data)
+        np.clip(np.round(data, out = data), -full_scale, full_scale - 1, out = data)
+        data = data.astype(np.int16)
+        return data[0], data[1]
+
+
+class VirtualRig(object):
+    """Simulated narrow band system, with the same interface as system.HardwareRig.
+
+    Parameters
+    ----------
+    latencies : RigLatencies or None, optional
+        operation latencies, by default None for RigLatencies()
+    signal : SignalModel or None, optional
+        synthetic signal generator, by default None for SignalModel()
+    name : str or None, optional
+        rig name in multi-rig statistics, by default None
+    """
+
+    def __init__(self, latencies = None, signal = None, name = None):
+        self.name = name
+        self.latencies = latencies if latencies is not None else RigLatencies()
+        self.signal = signal if signal is not None else SignalModel()
+        self.stats = {}
+        self.unsettled = 0 # captures started before the PLL locked or the switch settled
+        self._lock = threading.Lock()
+
+        self.tx = None
+        self.rx = None
+        self.switch_settled_at = 0.0
+        self.registers = [0] * 12 # LTC6946 register image h00 to h0B
+        self.lock_at = None
+
+        self.switch = VirtualSwitchingMatrix(VirtualSwitchingMatrixPort(self))
+
+    def receiver(self, spi_registers = None, verbose = False):
+        return VirtualDc1513bAa(self, spi_registers, verbose)
+
+    def synthesizer(self):
+        return VirtualDC590B(VirtualDC590BPort(self))
+
+    def delay(self, operation, seconds):
+        """Account the modelled time of an operation and wait for it (scaled by latencies.time_scale)."""
+        with self._lock:
+            count, total = self.stats.get(operation, (0, 0.0))
+            self.stats[operation] = (count + 1, total + seconds)
+        wait = seconds * self.latencies.time_scale
+        if wait > 0:
+            time.sleep(wait)
+
+    def deadline(self, seconds):
+        """Return the wall clock time at which a state change taking seconds (modelled) completes."""
+        return timer() + seconds * self.latencies.time_scale
+
+    def set_pair(self, tx, rx):
+        self.tx, self.rx = tx, rx
+        self.switch_settled_at = self.deadline(self.latencies.switch_settle)
+
+    def retune(self):
+        self.lock_at = self.deadline(self.latencies.pll_lock)
+
+    @property
+    def locked(self):
+        return self.lock_at is not None and timer() >= self.lock_at
+
+    @property
+    def frequency(self):
+        """Programmed output frequency in MHz from the register image, None if muted or not programmed."""
+        regs = self.registers
+        n_div = regs[5] << 8 | regs[6]
+        r_div = (regs[3] & 0x03) << 8 | regs[4]
+        o_div = regs[8] & 0x07
+        if self.lock_at is None or regs[2] & 0x02 or not (n_div and r_div and o_div):
+            return None
+        return n_div * F_REF / r_div / o_div
+
+    @property
+    def settled(self):
+        return self.locked and timer() >= self.switch_settled_at
+
+    def report(self):
+        """Return a summary of the modelled time spent per operation."""
+        lines = []
+        for operation in sorted(self.stats):
+            count, total = self.stats[operation]
+            lines.append("{0:<16} {1:>8d} ops {2:>10.3f} s modelled ({3:.2f} ms/op)".format(operation, count, total, 1e3*total/count))
+        return "\n".join(lines)
+
+
+class VirtualDc1513bAa(object):
+    """Simulated DC890 demo board with the DC1513B-AA, providing the Dc1513bAa methods used by the sweep functions."""
+
+    def __init__(self, rig, spi_registers = None, verbose = False):
+        self.rig = rig
+        self.dc_number = 'DC_1513B-AA'
+        self.num_channels = 2
+        self.num_bits = 14
+        self.is_bipolar = True
+        self.verbose = verbose
+        self._sampled = None
+
+    def __enter__(self):
+        self.rig.delay("fpga_load", self.rig.latencies.fpga_load)
+        return self
+
+    def __exit__(self, a, b, c):
+        pass
+
+    def get_num_bits(self):
+        return self.num_bits
+
+    def collect(self, num_samples, trigger, timeout = 5, is_randomized = False, is_alternate_bit = False):
+        self.start_collect(num_samples, trigger)
+        return self.read_collect()
+
+    def start_collect(self, num_samples, trigger, timeout = 5):
+        """Sample the signal with the current pair and frequency, the data is returned by read_collect."""
+        rig = self.rig
+        settled = rig.settled
+        if not settled:
+            rig.unsettled += 1
+        self._sampled = (num_samples, rig.tx, rig.rx, rig.frequency, settled)
+
+    def read_collect(self):
+        """Transfer the data sampled by start_collect over USB, return the channel data."""
+        num_samples, tx, rx, freq, settled = self._sampled
+        self._sampled = None
+        self.rig.delay("collect", self.rig.latencies.usb_capture(num_samples, self.num_channels))
+        return self.rig.signal.capture(num_samples, tx, rx, freq, settled)
+
+
+class VirtualDC590BPort(object):
+    """Emulated DC590B serial port, decoding the QuikEval SPI commands used by ltc6946_serial into the rig register image.
+
+    Commands: 'x'/'X' chip select low/high, 'Snn' send byte, 'R' receive byte (2 hex characters),
+    'i'/'I' controller/target board ID, 'M' followed by a mode character. Other characters are ignored.
+    The first byte sent after 'x' is the LTC6946 address byte (7-bit address and read bit), followed by
+    auto-incremented register data. 'R' before the address byte returns the status register h00.
+    """
+
+    ID_STRING = "USBSPI,PIC,01,01,DC,DC590B,----------------------\n"
+    TARGET_STRING = "LTC6946-2,Cls,D6946,01,01,DC,DC1705C,------------\n"
+
+    def __init__(self, rig):
+        self.rig = rig
+        self.portstr = "VIRTUAL-DC590B"
+        self.timeout = rig.latencies.read_timeout
+        self.is_open = True
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+        self._out = ""
+        self._pending = ""
+        self._addr = None
+        self._read = False
+        self._retune = False
+
+    @property
+    def in_waiting(self):
+        return len(self._out)
+
+    def reset_input_buffer(self):
+        self._out = ""
+
+    def write(self, data):
+        self.rig.delay("serial_write", self.rig.latencies.serial_overhead + len(data) * self.rig.latencies.byte_time)
+        self.bytes_written += len(data)
+        for char in data:
+            self._command(char)
+        return len(data)
+
+    def readline(self):
+        end = self._out.find("\n") + 1
+        return self.read(end if end else len(self._out) + 1)
+
+    def read(self, size = 1):
+        if len(self._out) < size:
+            self.rig.delay("serial_timeout", self.timeout)
+        else:
+            self.rig.delay("serial_read", self.rig.latencies.serial_overhead + size * self.rig.latencies.byte_time)
+        data, self._out = self._out[:size], self._out[size:]
+        self.bytes_read += len(data)
+        return data
+
+    def close(self):
+        self.is_open = False
+
+    def _command(self, char):
+        if self._pending:
+            self._pending += char
+            if self._pending[0] == 'M':
+                self._pending = ""
+            elif len(self._pending) == 3:
+                byte, self._pending = int(self._pending[1:], 16), ""
+                self._send(byte)
+        elif char in 'SM':
+            self._pending = char
+        elif char == 'x':
+            self._addr = None
+        elif char == 'X':
+            self._addr = None
+            if self._retune:
+                self._retune = False
+                self.rig.retune()
+        elif char == 'R':
+            self._receive()
+        elif char == 'i':
+            self._out += self.ID_STRING
+        elif char == 'I':
+            self._out += self.TARGET_STRING
+
+    def _send(self, byte):
+        if self._addr is None:
+            self._addr, self._read = byte >> 1, bool(byte & 1)
+        else:
+            if not self._read and 0 < self._addr < 11:
+                self.rig.registers[self._addr] = byte
+                self._retune = self._retune or self._addr >= 3
+            self._addr += 1
+
+    def _receive(self):
+        if self._addr is None:
+            value = self._status()
+            self._addr, self._read = 0, False
+        else:
+            value = self._status() if self._addr == 0 else self.rig.registers[self._addr] if self._addr < 12 else 0
+            self._addr += 1
+        self._out += "{0:02X}".format(value)
+
+    def _status(self):
+        return 0x04 if self.rig.locked else 0x00
+
+
+class VirtualDC590B(fsynth.DC590B):
+    """ltc6946_serial.DC590B driver connected to an emulated DC590B serial port instead of scanning COM ports."""
+
+    def __init__(self, port, verbose = False):
+        self._virtual_port = port
+        fsynth.DC590B.__init__(self, verbose)
+
+    def open(self, verbose = False, port = None):
+        """Open the emulated port and check the DC590B ID string, as DC590B.open does for a real port."""
+        self._virtual_port.rig.delay("port_open", self._virtual_port.rig.latencies.port_open)
+        self.port = self._virtual_port
+        if not fsynth.identify(self.port):
+            raise IOError("Virtual DC590B did not answer the ID query.")
+        self.port.write('MS')
+        return self
+
+
+class VirtualSwitchingMatrixPort(object):
+    """Emulated STM32 switching matrix serial port, decoding the SMC/HEF set and LED toggle commands."""
+
+    _COMMAND = re.compile(r"(SMC|HEF)_SET_TX(\d\d)_RX(\d\d)|toggle_(red|blue|green|orange)_led")
+
+    def __init__(self, rig):
+        self.rig = rig
+        self.portstr = "VIRTUAL-SWM"
+        self.is_open = True
+        self.bytes_written = 0
+        self.commands = 0
+        self._buffer = ""
+
+    def write(self, data):
+        self.rig.delay("switch_command", self.rig.latencies.switch_command)
+        self.bytes_written += len(data)
+        self._buffer += data
+        match = self._COMMAND.search(self._buffer)
+        while match is not None:
+            self.commands += 1
+            if match.group(1) is not None:
+                self.rig.set_pair(int(match.group(2)), int(match.group(3)))
+            self._buffer = self._buffer[match.end():]
+            match = self._COMMAND.search(self._buffer)
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+class VirtualSwitchingMatrix(object):
+    """Simulated switching matrix with the switching_matrix module interface (set_pair, toggle_led and is_open)."""
+
+    def __init__(self, port):
+        self.port = port
+
+    def set_pair(self, TX, RX):
+        self.port.write("SMC_SET_TX%02d_RX%02d" % (TX, RX))
+
+    def is_open(self):
+        return self.port.is_open
+
+    def toggle_led(self, color = 'red'):
+        colors = ['red', 'blue', 'green', 'orange']
+        if color == 'all':
+            for c in colors:
+                self.port.write("toggle_%s_led" % c)
+        elif color in colors:
+            self.port.write("toggle_%s_led" % color)
+
+
+if __name__ == '__main__':
+
+    # Throughput benchmark of ant_sweep on the virtual rig, with inline and pipelined writers, with overlapped device
+    # commands and with the HDF5 output.
+
+    import os
+    import shutil
+    import tempfile
+
+    import system as nbsys
+
+    root = tempfile.mkdtemp()
+
+    def meas_parameters(folder = root, iterations = 1):
+        return {"num_samples" : 1024,
+                "spi_registers" : [],
+                "verbose" : False,
+                "fft_window" : "hann",
+                "data_file" : os.path.join(folder, "DATE/Phantom PHA/ANG deg/Plug PLU/Rep REP/Iter ITE/Phantom PHA Plug PLU ANG deg Rep REP Iter ITE ANTPAIR FREQMHz.adc"),
+                "cal_data_file" : None,
+                "cal_fft_file" : None,
+                "date" : "virtual",
+                "Phantom" : 1, "Angle" : 0, "Plug" : 2, "rep" : 1, "iter" : iterations,
+                "freq_range" : ("2000", "2050", "2100", "2150", "2200"),
+                "pairs" : [(1,2), (2,3), (3,4), (4,5)],
+                "system" : "narrow band",
+                "type" : "measurement configuration parameters"}
+
+    for pipelined, overlap, output in ((False, False, "pscope"), (True, False, "pscope"), (True, True, "pscope"), (True, False, "hdf5")):
+        rig = VirtualRig(RigLatencies(fpga_load = 0.0, port_open = 0.0), SignalModel(seed = 0))
+        start = timer()
+        nbsys.ant_sweep(meas_parameters(), do_FFT = True, save_json = False, pipelined = pipelined, rig = rig, output = output,
+                        overlap = overlap)
+        duration = timer() - start
+        captures = rig.stats["collect"][0]
+        print("Pipelined: {0} - overlap: {1} - output: {2} - {3:d} captures in {4:.2f} s ({5:.1f} captures/s)".format(pipelined,
+                overlap, output, captures, duration, captures/duration))
+        print(rig.report())
+
+    shutil.rmtree(root)
+
+    # Resume of an interrupted sweep: the resumed run must capture only the points missing from the capture journal
+    # (or whose file was damaged), and leave the same directories, files and JSON configurations as an uninterrupted run.
+
+    import json
+
+    from pscope_reader import read_pscope
+
+    class Interrupted(Exception):
+        pass
+
+    class InterruptedSignal(SignalModel):
+        """SignalModel raising Interrupted after a number of captures."""
+        def __init__(self, captures, **kwargs):
+            SignalModel.__init__(self, **kwargs)
+            self.remaining = captures
+
+        def capture(self, *args):
+            if self.remaining == 0:
+                raise Interrupted()
+            self.remaining -= 1
+            return SignalModel.capture(self, *args)
+
+    def sweep_files(folder):
+        return dict((os.path.relpath(os.path.join(path, name), folder), os.path.join(path, name))
+                    for path, _, names in os.walk(folder) for name in names)
+
+    reference_root, resumed_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+    nbsys.ant_sweep(meas_parameters(reference_root, iterations = 2), do_FFT = True,
+                    rig = VirtualRig(RigLatencies(fpga_load = 0.0, port_open = 0.0), SignalModel(seed = 0)))
+    try:
+        nbsys.ant_sweep(meas_parameters(resumed_root, iterations = 2), do_FFT = True,
+                        rig = VirtualRig(RigLatencies(fpga_load = 0.0, port_open = 0.0), InterruptedSignal(30, seed = 0)))
+    except Interrupted:
+        pass
+    damaged = sorted(path for path in sweep_files(resumed_root).values() if path.endswith(".adc"))[0]
+    with open(damaged, 'r+b') as f: # file cut short by the interruption, rejected by its recorded size
+        f.truncate(100)
+    rig = VirtualRig(RigLatencies(fpga_load = 0.0, port_open = 0.0), SignalModel(seed = 0))
+    resumed = meas_parameters(resumed_root, iterations = 2)
+    nbsys.ant_sweep(resumed, do_FFT = True, rig = rig, resume = True)
+    assert rig.stats["collect"][0] == 40 - 30 + 1 and resumed["resumed_points"] == 30 - 1
+
+    reference, result = sweep_files(reference_root), sweep_files(resumed_root)
+    assert sorted(reference) == sorted(result)
+    for name in reference:
+        if name.endswith(".json"):
+            with open(reference[name]) as f, open(result[name]) as g:
+                expected, actual = json.load(f), json.load(g)
+            for key in nbsys.SWEEP_RESULTS:
+                expected.pop(key, None)
+                actual.pop(key, None)
+            actual["data_file"] = actual["data_file"].replace(resumed_root, reference_root)
+            assert expected == actual
+        elif name.endswith((".adc", ".fft")): # values differ, the signal noise being drawn in another order
+            assert read_pscope(reference[name])[0].shape == read_pscope(result[name])[0].shape
+    print("Resume: {0:d} files, {1:d} points captured again ({2:d} resumed), same layout and JSON configurations".format(
+            len(result), rig.stats["collect"][0], resumed["resumed_points"]))
+    shutil.rmtree(reference_root)
+    shutil.rmtree(resumed_root)
+
+    # Per-retune serial traffic and latency of DC590B.freq_set over the 2000-2200 MHz grid, full bursts vs fast hop.
+
+    from Transmitter_LTC6946.register_mapping import regs, register_values_list
+
+    freq_grid = sorted((freq for freq in regs if freq != "0" and 2000 <= float(freq.replace("_", ".")) <= 2200),
+                        key = lambda freq: float(freq.replace("_", ".")))
+    for fast_hop in (False, True):
+        rig = VirtualRig(RigLatencies(port_open = 0.0), SignalModel(seed = 0))
+        fctrl = rig.synthesizer()
+        fctrl.fast_hop = fast_hop
+        fctrl.freq_set(freq_grid[0])
+        written = fctrl.port.bytes_written
+        start = timer()
+        for freq in freq_grid[1:] + freq_grid[-2::-1]: # up and down the grid
+            fctrl.freq_set(freq)
+        duration = timer() - start
+        retunes = 2 * (len(freq_grid) - 1)
+        print("Fast hop: {0} - {1:d} retunes, {2:.1f} bytes/retune, {3:.1f} ms/retune - {4}".format(fast_hop, retunes,
+                float(fctrl.port.bytes_written - written) / retunes, 1e3 * duration / retunes, fctrl.hop_stats))
+
+    # Per-retune serial transfers and latency of a verified retune (frequency burst then register read-back), with a
+    # separate read-back round trip vs the read-back pipelined in the transfer of the burst (CommandQueue).
+
+    for pipelined in (False, True):
+        rig = VirtualRig(RigLatencies(port_open = 0.0), SignalModel(seed = 0))
+        fctrl = rig.synthesizer()
+        writes, reads = rig.stats["serial_write"][0], rig.stats["serial_read"][0]
+        mismatched = 0
+        start = timer()
+        for freq in freq_grid:
+            if pipelined:
+                with fctrl.queue.batch():
+                    fctrl.freq_set(freq)
+                    readback = fctrl.queue.spi_read(1, fsynth.NUM_REGS - 1)
+                values = readback.result()
+            else:
+                fctrl.freq_set(freq)
+                values = fctrl.read_registers()[1:]
+            mismatched += values != register_values_list(freq)
+        duration = timer() - start
+        print("Pipelined read-back: {0} - {1:d} retunes, {2:.1f} writes/retune, {3:.1f} reads/retune, {4:.1f} ms/retune, {5:d} mismatched".format(
+                pipelined, len(freq_grid), float(rig.stats["serial_write"][0] - writes) / len(freq_grid),
+                float(rig.stats["serial_read"][0] - reads) / len(freq_grid), 1e3 * duration / len(freq_grid), mismatched))
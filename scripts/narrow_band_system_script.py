@@ -28,6 +28,7 @@ sys.path.insert(1, str(Path(__file__).resolve().parents[1])) # adds path of two
 
 # Local application imports
 import NarrowBand.system as nbsys
+from NarrowBand.session import HardwareSession
 
 now = datetime.now()
 
@@ -147,70 +148,79 @@ MeasParameters["obs"] = "Baseline-Tumour Progress with plug re-position only."
 
 AntPair = "Tx 15 Rx 16"
 
+# Step costs learned from previous sweeps, for the duration estimate and live ETA (None to disable).
+CostsFile = "{}/OneDrive - McGill University/Documents McGill/Data/PScope/narrowband_costs.json".format(os.environ['USERPROFILE'])
 
-""" First calibration round:
+# Devices are opened once (COM port scan and FPGA load) and shared by all calibration and measurement calls below.
 
-	Both LO and RF grounded with 50 ohm terminators.
-	"""
+with HardwareSession(MeasParameters["spi_registers"]) as session: # mutes the LTC6946 and closes the devices on errors too
+    print session.health_check()
 
-MeasParameters["attLO"] = "grounded"
-MeasParameters["attRF"] = "grounded"
+    """ First calibration round:
 
-nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 1, do_plot = False, do_FFT = False, save_json = True)
+        Both LO and RF grounded with 50 ohm terminators.
+        """
 
-""" Second calibration round:
+    MeasParameters["attLO"] = "grounded"
+    MeasParameters["attRF"] = "grounded"
 
-	RF grounded with 50 ohm terminator, LO connected to frequency synthesizer.
-	LO can use 20 dB attenuator.
-    Remember to use 50-ohm terminator on splitter Tx.
-	"""
+    nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 1, do_plot = False, do_FFT = False, save_json = True, rig = session)
 
-#MeasParameters["attLO"] = 20
-#MeasParameters["attRF"] = "grounded"
-#MeasParameters["freq_range"] = freq_cal
+    """ Second calibration round:
 
-#nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 2, do_plot = False, do_FFT = False, save_json = True)
+        RF grounded with 50 ohm terminator, LO connected to frequency synthesizer.
+        LO can use 20 dB attenuator.
+        Remember to use 50-ohm terminator on splitter Tx.
+        """
 
-""" Third calibration round:
+    #MeasParameters["attLO"] = 20
+    #MeasParameters["attRF"] = "grounded"
+    #MeasParameters["freq_range"] = freq_cal
 
-	RF connected to Rx-Tx directly by cables (bypassing antennas) and LO connected to frequency syntesizer.
-	Use RF with 25 dB attenuator, LO can use 20 dB attenuator.
-	"""
+    #nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 2, do_plot = False, do_FFT = False, save_json = True, rig = session)
 
-#MeasParameters["attLO"] = 20
-#MeasParameters["attRF"] = 22
-#MeasParameters["freq_range"] = freq_cal
+    """ Third calibration round:
 
-#nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 3, do_plot = False, do_FFT = False, save_json = True)
+        RF connected to Rx-Tx directly by cables (bypassing antennas) and LO connected to frequency syntesizer.
+        Use RF with 25 dB attenuator, LO can use 20 dB attenuator.
+        """
 
-""" Fourth calibration round:
+    #MeasParameters["attLO"] = 20
+    #MeasParameters["attRF"] = 22
+    #MeasParameters["freq_range"] = freq_cal
 
-    Environmental noise scan. Tx after splitter with 50-ohm terminator, switching matrix Tx also terminated.
+    #nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 3, do_plot = False, do_FFT = False, save_json = True, rig = session)
 
-	RF connected to Rx antennas and LO connected to frequency syntesizer.
-	Phantom 1: Use RF with 9 dB attenuator, LO can use 20 dB attenuator.
+    """ Fourth calibration round:
 
-	Phantoms with skin: Use RF without attenuator, LO can use 20 dB attenuator
-	"""
+        Environmental noise scan. Tx after splitter with 50-ohm terminator, switching matrix Tx also terminated.
 
-#MeasParameters["attLO"] = 20
-#MeasParameters["attRF"] = 9 # skinless phantoms (1)
-#MeasParameters["attRF"] = 0 # phantoms with skin
+        RF connected to Rx antennas and LO connected to frequency syntesizer.
+        Phantom 1: Use RF with 9 dB attenuator, LO can use 20 dB attenuator.
 
-#MeasParameters["obs"] = "Baseline room interference measurement without microwave oven."
+        Phantoms with skin: Use RF without attenuator, LO can use 20 dB attenuator
+        """
 
-#nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 4, do_plot = False, do_FFT = False, save_json = True)
+    #MeasParameters["attLO"] = 20
+    #MeasParameters["attRF"] = 9 # skinless phantoms (1)
+    #MeasParameters["attRF"] = 0 # phantoms with skin
 
-""" Actual measurements:
+    #MeasParameters["obs"] = "Baseline room interference measurement without microwave oven."
 
-	RF connected to Rx antennas and LO connected to frequency syntesizer.
-	Phantom 1: Use RF with 9 dB attenuator, LO can use 20 dB attenuator.
+    #nbsys.cal_system(meas_parameters = MeasParameters, cal_type  = 4, do_plot = False, do_FFT = False, save_json = True, rig = session)
 
-	Phantoms with skin: Use RF without attenuator, LO can use 20 dB attenuator.
-	"""
+    """ Actual measurements:
 
-#MeasParameters["attLO"] = 20
-#MeasParameters["attRF"] = 9 # skinless phantoms (1)
-#MeasParameters["attRF"] = 0 # phantoms with skin
+        RF connected to Rx antennas and LO connected to frequency syntesizer.
+        Phantom 1: Use RF with 9 dB attenuator, LO can use 20 dB attenuator.
+
+        Phantoms with skin: Use RF without attenuator, LO can use 20 dB attenuator.
+        """
+
+    #MeasParameters["attLO"] = 20
+    #MeasParameters["attRF"] = 9 # skinless phantoms (1)
+    #MeasParameters["attRF"] = 0 # phantoms with skin
+
+    #nbsys.ant_sweep(meas_parameters = MeasParameters, do_plot = False, do_FFT = False, save_json = True, display = False, rig = session,
+    #                costs_file = CostsFile)
 
-#nbsys.ant_sweep(meas_parameters = MeasParameters, do_plot = False, do_FFT = False, save_json = True, display = False)